@@ -0,0 +1,63 @@
+import hashlib
+import pickle
+
+import cache
+from db import get_db_connection
+
+# Announcements change only through the three admin write routes, so readers
+# share a cached copy; writes call invalidate() and the TTL bounds staleness
+# for anything the invalidation can't reach (e.g. memory backends in other workers).
+
+CACHE_PREFIX = 'announcements:'
+FEED_LIMIT = 20
+_ttl = 300
+
+
+def init_app(app):
+    global _ttl
+    _ttl = app.config['ANNOUNCEMENTS_TTL']
+
+
+def _load(active_only):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if active_only:
+            cursor.execute("""
+            SELECT id, title, content, is_active, created_at FROM announcements
+            WHERE is_active = TRUE
+            ORDER BY created_at DESC
+            LIMIT %s
+            """, (FEED_LIMIT,))
+        else:
+            cursor.execute("""
+            SELECT id, title, content, is_active, created_at FROM announcements
+            ORDER BY created_at DESC
+            """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_feed(active_only=True):
+    # Returns {'items': [...], 'version': <content hash>}; the version doubles as an ETag
+    key = CACHE_PREFIX + ('active' if active_only else 'all')
+    backend = cache.get_backend()
+    feed = backend.get(key)
+    if feed is None:
+        items = _load(active_only)
+        feed = {
+            'items': items,
+            'version': hashlib.sha1(pickle.dumps(items)).hexdigest()[:16]
+        }
+        backend.set(key, feed, _ttl)
+    return feed
+
+
+def get_announcements(active_only=True):
+    return get_feed(active_only)['items']
+
+
+def invalidate():
+    cache.get_backend().delete_prefix(CACHE_PREFIX)
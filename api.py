@@ -0,0 +1,298 @@
+import datetime
+import decimal
+import hashlib
+import json
+from functools import wraps
+
+from flask import Blueprint, Response, request, session
+
+import roster
+import stats
+from db import get_db_connection
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Versioned read API for kiosks and dashboard scripts. Every list supports
+# ?fields= selection and keyset ?cursor= pagination; responses carry an ETag
+# and single sessions a Last-Modified so clients can revalidate cheaply. Lists
+# get no Last-Modified: a row leaving the list doesn't move the newest
+# updated_at of the rows still in it.
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Public field name -> SQL expression
+SESSION_FIELDS = {
+    'id': 's.id',
+    'student_id': 's.student_id',
+    'lab_room': 's.lab_room',
+    'date_time': 's.date_time',
+    'duration': 's.duration',
+    'programming_language': 's.programming_language',
+    'purpose': 's.purpose',
+    'status': 's.status',
+    'approval_status': 's.approval_status',
+    'check_in_time': 's.check_in_time',
+    'check_out_time': 's.check_out_time',
+    'created_at': 's.created_at',
+    'updated_at': 's.updated_at',
+    'idno': 'st.idno',
+    'firstname': 'st.firstname',
+    'lastname': 'st.lastname',
+    'course': 'st.course',
+}
+
+# View name -> (extra WHERE clause, ordering columns, direction)
+SESSION_VIEWS = {
+    'all': ('', ['date_time', 'id'], 'DESC'),
+    'pending': ("s.approval_status = 'pending'", ['date_time', 'id'], 'ASC'),
+    'active': ("s.status = 'active' AND s.approval_status = 'approved'", ['date_time', 'id'], 'DESC'),
+    'current': ("s.status = 'active' AND s.check_in_time IS NOT NULL AND s.check_out_time IS NULL",
+                ['check_in_time', 'id'], 'DESC'),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@bp.errorhandler(ApiError)
+def handle_api_error(error):
+    return json_response({'error': error.message}, status=error.status, conditional=False)
+
+
+def api_admin_required(f):
+    # Same check as admin_required, but answers with JSON instead of a redirect
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or session.get('user_type') != 'admin':
+            raise ApiError('Admin access required', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f'Cannot serialise {type(value).__name__}')
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(data, status=200, last_modified=None, conditional=True):
+    body = dumps(data)
+    response = Response(body, status=status, mimetype='application/json')
+    if conditional:
+        response.set_etag(hashlib.sha1(body).hexdigest())
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return response
+
+
+def parse_fields(allowed, required=()):
+    # ?fields=a,b,c -> validated list; always includes the fields pagination needs
+    requested = request.args.get('fields')
+    if not requested:
+        return list(allowed)
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    for field in required:
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+def parse_limit():
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _cursor_values(row, columns):
+    # Datetimes go into the cursor in MySQL's literal format
+    return [str(row[column]) if isinstance(row[column], datetime.datetime) else row[column]
+            for column in columns]
+
+
+def _trim(rows, fields):
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def list_sessions(view):
+    where, order_columns, direction = SESSION_VIEWS[view]
+    fields = parse_fields(SESSION_FIELDS)
+    limit = parse_limit()
+
+    # Pagination needs these columns even if the client didn't ask for them
+    selected = list(dict.fromkeys(fields + order_columns))
+    conditions = [where] if where else []
+    params = []
+
+    for name in ('status', 'approval_status', 'lab_room', 'student_id'):
+        value = request.args.get(name)
+        if value:
+            conditions.append(f"s.{name} = %s")
+            params.append(value)
+
+    after = request.args.get('cursor')
+    if after:
+        try:
+            values = roster.decode_cursor(after)
+        except ValueError as e:
+            raise ApiError(str(e))
+        if len(values) != len(order_columns):
+            raise ApiError('Invalid cursor')
+        comparison = '>' if direction == 'ASC' else '<'
+        columns = ', '.join(SESSION_FIELDS[column] for column in order_columns)
+        conditions.append(f"({columns}) {comparison} ({', '.join(['%s'] * len(values))})")
+        params.extend(values)
+
+    where_sql = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+    order_sql = ', '.join(f"{SESSION_FIELDS[column]} {direction}" for column in order_columns)
+    select_sql = ', '.join(f"{SESSION_FIELDS[field]} AS {field}" for field in selected)
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+        SELECT {select_sql}
+        FROM sessions s
+        JOIN students st ON s.student_id = st.id
+        {where_sql}
+        ORDER BY {order_sql}
+        LIMIT %s
+        """, tuple(params) + (limit + 1,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = roster.encode_cursor(_cursor_values(rows[-1], order_columns))
+    return json_response({'data': _trim(rows, fields), 'next_cursor': next_cursor})
+
+
+@bp.route('/sessions', methods=['GET'])
+@api_admin_required
+def sessions_index():
+    return list_sessions('all')
+
+
+@bp.route('/sessions/pending', methods=['GET'])
+@api_admin_required
+def sessions_pending():
+    return list_sessions('pending')
+
+
+@bp.route('/sessions/active', methods=['GET'])
+@api_admin_required
+def sessions_active():
+    return list_sessions('active')
+
+
+@bp.route('/sessions/current', methods=['GET'])
+@api_admin_required
+def sessions_current():
+    return list_sessions('current')
+
+
+@bp.route('/sessions/<int:session_id>', methods=['GET'])
+@api_admin_required
+def session_detail(session_id):
+    fields = parse_fields(SESSION_FIELDS)
+    selected = list(dict.fromkeys(fields + ['updated_at']))
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+        SELECT {', '.join(f"{SESSION_FIELDS[field]} AS {field}" for field in selected)}
+        FROM sessions s
+        JOIN students st ON s.student_id = st.id
+        WHERE s.id = %s
+        """, (session_id,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if not row:
+        raise ApiError('Session not found', 404)
+    return json_response({'data': _trim([row], fields)[0]}, last_modified=row['updated_at'])
+
+
+@bp.route('/students', methods=['GET'])
+@api_admin_required
+def students_index():
+    allowed = roster.ROSTER_COLUMNS + ['active_sessions']
+    fields = parse_fields(allowed)
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        students, next_cursor = roster.fetch_roster_page(
+            cursor,
+            search=request.args.get('q', ''),
+            course=request.args.get('course'),
+            sort=request.args.get('sort', 'name'),
+            direction=request.args.get('direction', 'asc'),
+            after=request.args.get('cursor'),
+            limit=parse_limit()
+        )
+    except ValueError as e:
+        raise ApiError(str(e))
+    finally:
+        cursor.close()
+        conn.close()
+    return json_response({'data': _trim(students, fields), 'next_cursor': next_cursor})
+
+
+@bp.route('/students/<int:student_id>', methods=['GET'])
+@api_admin_required
+def student_detail(student_id):
+    fields = parse_fields(roster.ROSTER_COLUMNS)
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {', '.join(fields)} FROM students WHERE id = %s", (student_id,))
+        student = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if not student:
+        raise ApiError('Student not found', 404)
+    return json_response({'data': student})
+
+
+@bp.route('/statistics', methods=['GET'])
+@api_admin_required
+def statistics():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        language_stats, lab_stats, feedback_stats = stats.load_dashboard_stats(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return json_response({'data': {
+        'languages': language_stats,
+        'labs': lab_stats,
+        'feedback': feedback_stats
+    }})
@@ -1,12 +1,36 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-import mysql.connector
-from datetime import timedelta
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, send_file
+from datetime import datetime, timedelta
 import logging
 from functools import wraps
 import os
-from werkzeug.utils import secure_filename
-import uuid
+import mysql.connector
+
+import db
+import migrations
+from schema import schema_cache
+import stats
+import roster
+import reports
+import loaders
+import cache
+import events
+import bulk
+import quota
+import labs
+import scheduler
+import credentials
+import auth
+import session_store
+import profiles
+import pictures
+import metrics
+import profiling
+import fragments
+import announcements as announcements_feed
+import api
+from db import get_db_connection
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='static')
 app.secret_key = 'your_very_secure_secret_key_here'
@@ -20,201 +44,82 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Database connection
-def get_db_connection():
-    try:
-        # First try to connect without specifying a database
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # replace with your XAMPP MySQL username
-            password=''   # replace with your XAMPP MySQL password
-        )
-        cursor = connection.cursor()
-        
-        # Create the database if it doesn't exist
-        cursor.execute("CREATE DATABASE IF NOT EXISTS students")
-        cursor.execute("USE students")
-        connection.commit()
-        cursor.close()
-        
-        # Now reconnect with the database specified
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',  # replace with your XAMPP MySQL username
-            password='',  # replace with your XAMPP MySQL password
-            database='students'  # now we can safely use this database
-        )
-        return connection
-    except Exception as e:
-        print(f"Database connection error: {str(e)}")
-        raise e
+# Database connection settings (defaults match a stock XAMPP install)
+app.config['DB_HOST'] = os.environ.get('DB_HOST', 'localhost')
+app.config['DB_USER'] = os.environ.get('DB_USER', 'root')  # replace with your XAMPP MySQL username
+app.config['DB_PASSWORD'] = os.environ.get('DB_PASSWORD', '')  # replace with your XAMPP MySQL password
+app.config['DB_NAME'] = os.environ.get('DB_NAME', 'students')
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+app.config['DB_POOL_PING_INTERVAL'] = float(os.environ.get('DB_POOL_PING_INTERVAL', 30))  # ping connections idle longer than this
+app.config['REPORT_DIR'] = os.environ.get('REPORT_DIR', 'report_artifacts')  # generated XLSX/PDF reports
+app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+app.config['REPORT_TTL'] = int(os.environ.get('REPORT_TTL', 24 * 60 * 60))  # seconds to keep finished reports
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')  # or sqlite:///path/to/cache.sqlite3 to share across workers
+app.config['ANNOUNCEMENTS_TTL'] = int(os.environ.get('ANNOUNCEMENTS_TTL', 300))  # seconds
+app.config['SSE_MAX_SUBSCRIBERS'] = int(os.environ.get('SSE_MAX_SUBSCRIBERS', 10))  # live monitor streams per worker process; 0 means no limit
+app.config['SSE_MAX_STREAM_SECONDS'] = int(os.environ.get('SSE_MAX_STREAM_SECONDS', 300))  # a stream is closed after this and the browser reconnects
+app.config['SCHEDULER_INTERVAL'] = float(os.environ.get('SCHEDULER_INTERVAL', 60))  # seconds between session sweeps; 0 disables
+app.config['SWEEP_BATCH_SIZE'] = int(os.environ.get('SWEEP_BATCH_SIZE', 500))  # rows per sweep transaction
+app.config['NO_SHOW_GRACE_MINUTES'] = int(os.environ.get('NO_SHOW_GRACE_MINUTES', 30))
+app.config['PASSWORD_HASH_ITERATIONS'] = int(os.environ.get('PASSWORD_HASH_ITERATIONS', credentials.DEFAULT_PBKDF2_ITERATIONS))  # PBKDF2 cost
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))  # hashing processes; 0 hashes on the request thread
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 0))  # max hashes queued or running; 0 means 4 per worker
+app.config['LOGIN_LIMIT_PER_USERNAME'] = int(os.environ.get('LOGIN_LIMIT_PER_USERNAME', 5))  # failed attempts per window
+app.config['LOGIN_LIMIT_PER_IP'] = int(os.environ.get('LOGIN_LIMIT_PER_IP', 50))
+app.config['LOGIN_LIMIT_WINDOW'] = int(os.environ.get('LOGIN_LIMIT_WINDOW', 300))  # seconds
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlite:///sessions.sqlite3')  # where login sessions live; must be shared by every worker process
+app.config['PICTURE_WORKERS'] = int(os.environ.get('PICTURE_WORKERS', 1))  # image processes for profile pictures; 0 resizes on the request thread
+app.config['SLOW_QUERY_SECONDS'] = float(os.environ.get('SLOW_QUERY_SECONDS', 0.5))  # SQL statements slower than this are logged
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', '')  # file for the slow-query log; empty logs to stderr
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')  # bearer token for /metrics; without one only localhost and admins may read it
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profile_artifacts')  # cProfile dumps of profiled admin requests
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # share of admin requests profiled without asking
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 50))  # newest profiles kept on disk
+app.config['FRAGMENT_CACHE_TTL'] = int(os.environ.get('FRAGMENT_CACHE_TTL', 300))  # seconds a rendered dashboard fragment may be reused
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR', 'template_cache')  # compiled templates; empty disables
+app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', '0') == '1'  # apply pending migrations on startup instead of refusing to start
 
-# Initialize database tables
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create students table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        idno VARCHAR(20) UNIQUE NOT NULL,
-        lastname VARCHAR(50) NOT NULL,
-        firstname VARCHAR(50) NOT NULL,
-        middlename VARCHAR(50),
-        course VARCHAR(100) NOT NULL,
-        year_level VARCHAR(20) NOT NULL,
-        email VARCHAR(100) UNIQUE NOT NULL,
-        username VARCHAR(50) UNIQUE NOT NULL,
-        password VARCHAR(255) NOT NULL,
-        profile_picture VARCHAR(255) DEFAULT 'default.jpg',
-        sessions_used INT DEFAULT 0,
-        max_sessions INT DEFAULT 25,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Check if sessions_used and max_sessions columns exist, add them if they don't
-    try:
-        # Check if sessions_used column exists
-        cursor.execute("SHOW COLUMNS FROM students LIKE 'sessions_used'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE students ADD COLUMN sessions_used INT DEFAULT 0")
-            
-        # Check if max_sessions column exists
-        cursor.execute("SHOW COLUMNS FROM students LIKE 'max_sessions'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE students ADD COLUMN max_sessions INT DEFAULT 25")
-            
-        # Update max_sessions based on course for existing users
-        cursor.execute("""
-        UPDATE students 
-        SET max_sessions = CASE 
-            WHEN course IN ('1', '2', '3') THEN 30 
-            ELSE 25 
-        END
-        WHERE max_sessions IS NULL OR (course IN ('1', '2', '3') AND max_sessions = 25) OR (course NOT IN ('1', '2', '3') AND max_sessions = 30)
-        """)
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Error checking/adding columns: {str(e)}")
-        conn.rollback()
-    
-    # Create admin table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS admins (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        username VARCHAR(50) UNIQUE NOT NULL,
-        password VARCHAR(255) NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create sit-in sessions table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS sessions (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        student_id INT NOT NULL,
-        lab_room VARCHAR(50) NOT NULL,
-        date_time DATETIME NOT NULL,
-        duration INT NOT NULL,
-        programming_language VARCHAR(50),
-        purpose TEXT,
-        status VARCHAR(20) DEFAULT 'pending',
-        check_in_time DATETIME,
-        check_out_time DATETIME,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
-    )
-    ''')
-    
-    # Check if approval_status column exists in sessions table, add it if it doesn't
-    try:
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'approval_status'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE sessions ADD COLUMN approval_status VARCHAR(20) DEFAULT 'pending'")
-        
-        # Check if programming_language column exists in sessions table, add it if it doesn't
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'programming_language'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE sessions ADD COLUMN programming_language VARCHAR(50)")
-        
-        # Check if purpose column exists in sessions table, add it if it doesn't
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'purpose'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE sessions ADD COLUMN purpose TEXT")
-        
-        # Check if check_in_time column exists in sessions table, add it if it doesn't
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'check_in_time'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE sessions ADD COLUMN check_in_time DATETIME")
-        
-        # Check if check_out_time column exists in sessions table, add it if it doesn't
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'check_out_time'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE sessions ADD COLUMN check_out_time DATETIME")
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Error checking/adding columns to sessions table: {str(e)}")
-        conn.rollback()
-    
-    # Create feedback table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS feedback (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        session_id INT NOT NULL,
-        student_id INT NOT NULL,
-        rating INT NOT NULL, /* 1-5 star rating */
-        comments TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
-        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
-    )
-    ''')
-    
-    # Create announcements table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS announcements (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        title VARCHAR(100) NOT NULL,
-        content TEXT NOT NULL,
-        is_active BOOLEAN DEFAULT TRUE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create programming languages table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS programming_languages (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(50) UNIQUE NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Insert default programming languages if they don't exist
-    default_languages = ['PHP', 'Java', 'Python', 'JavaScript', 'C++', 'C#', 'Ruby', 'Swift']
-    for language in default_languages:
-        cursor.execute("SELECT * FROM programming_languages WHERE name = %s", (language,))
-        if not cursor.fetchone():
-            cursor.execute("INSERT INTO programming_languages (name) VALUES (%s)", (language,))
-    
-    # Insert default admin if not exists
-    cursor.execute("SELECT * FROM admins WHERE username = 'admin'")
-    admin = cursor.fetchone()
-    if not admin:
-        hashed_password = generate_password_hash('admin')
-        cursor.execute("INSERT INTO admins (username, password) VALUES (%s, %s)", 
-                      ('admin', hashed_password))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+def init_extensions(app):
+    # Create the database once and set up the connection pool
+    db.init_app(app)
+
+    # Time every request and SQL statement; exported at /metrics
+    metrics.init_app(app)
 
-# Initialize the database on startup
-init_db()
+    # Profile admin requests on demand (X-Profile header, ?_profile=1 or sampling)
+    profiling.init_app(app)
+
+    # Refuse to start on an outdated schema (run `flask db upgrade` to migrate)
+    migrations.init_app(app)
+
+    credentials.init_app(app)
+    auth.init_app(app)
+    stats.init_app(app)
+    cache.init_app(app)
+    session_store.init_app(app)
+    fragments.init_app(app)
+    announcements_feed.init_app(app)
+    events.init_app(app)
+    reports.init_app(app)
+    pictures.init_app(app)
+    quota.init_app(app)
+    labs.init_app(app)
+
+    # Close expired sessions and mark no-shows in the background (from the first request on)
+    scheduler.init_app(app)
+
+    # Versioned JSON read API under /api/v1
+    app.register_blueprint(api.bp)
+
+    # Load table/column metadata once so routes don't probe it per request
+    schema_cache.load()
+
+# Pool workers forked from the forkserver (spawned on Windows) re-import this
+# file as __mp_main__ when it is run with `python app.py`; they need none of
+# the database, migration or session setup above
+if __name__ != '__mp_main__':
+    init_extensions(app)
 
 # Helper function to check if file extension is allowed
 def allowed_file(filename):
@@ -240,6 +145,16 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Admin actions answer fetch() calls with JSON and plain form posts with a redirect
+def wants_json():
+    return request.is_json or request.accept_mimetypes.best == 'application/json'
+
+def admin_action_response(message, category, event=None, status=200):
+    if wants_json():
+        return jsonify({'ok': category == 'success', 'message': message, 'event': event}), status
+    flash(message, category)
+    return redirect(url_for('admin_dashboard'))
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -266,14 +181,14 @@ def register():
         # BSIT (1), BSCS (2), BSCE (3) get 30 sessions, others get 25
         max_sessions = 30 if course in ['1', '2', '3'] else 25
         
-        # Hash the password
-        hashed_password = generate_password_hash(password)
+        # Hash the password (in the hashing pool, off the request thread)
+        try:
+            hashed_password = credentials.hash_password(password)
+        except credentials.CredentialServiceBusy as e:
+            flash(str(e), 'error')
+            return redirect(url_for('index'))
         
         try:
-            # Make sure the database and tables exist
-            with app.app_context():
-                init_db()
-                
             conn = get_db_connection()
             cursor = conn.cursor()
             
@@ -322,71 +237,48 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        # Refuse addresses/usernames with too many recent failures before spending any hashing time
+        retry_after = auth.login_limiter.check(username, request.remote_addr)
+        if retry_after:
+            flash(f'Too many login attempts. Please try again in {retry_after} seconds.', 'error')
+            return redirect(url_for('index'))
         
-        # Check if it's an admin login
-        if username == 'admin':
-            cursor.execute("SELECT * FROM admins WHERE username = %s", (username,))
-            user = cursor.fetchone()
-            
-            if user and check_password_hash(user['password'], password):
-                session.permanent = True
-                session['user_id'] = user['id']
-                session['username'] = user['username']
-                session['user_type'] = 'admin'
-                flash('Welcome, Admin!', 'success')
-                return redirect(url_for('admin_dashboard'))
-            else:
-                flash('Invalid admin credentials', 'error')
-                return redirect(url_for('index'))
+        # One indexed lookup across admins and students
+        user = auth.find_account(username)
         
-        # Check if it's a student login
-        cursor.execute("SELECT * FROM students WHERE username = %s", (username,))
-        user = cursor.fetchone()
+        try:
+            valid = credentials.verify_password(user['password'] if user else None, password)
+        except credentials.CredentialServiceBusy as e:
+            flash(str(e), 'error')
+            return redirect(url_for('index'))
         
-        cursor.close()
-        conn.close()
+        if not valid:
+            auth.login_limiter.failed(username, request.remote_addr)
+            flash('Invalid username or password', 'error')
+            return redirect(url_for('index'))
         
-        if user and check_password_hash(user['password'], password):
-            # Ensure sessions_used and max_sessions exist
-            if 'sessions_used' not in user or user['sessions_used'] is None:
-                # Update the user record to include sessions_used if it doesn't exist
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                # Set max_sessions based on course
-                max_sessions = 30 if user['course'] in ['1', '2', '3'] else 25
-                
-                cursor.execute("""
-                UPDATE students 
-                SET sessions_used = 0, max_sessions = %s
-                WHERE id = %s
-                """, (max_sessions, user['id']))
-                
-                conn.commit()
-                cursor.close()
-                conn.close()
-                
-                # Update the user object
-                user['sessions_used'] = 0
-                user['max_sessions'] = max_sessions
-            
-            session.permanent = True
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['user_type'] = 'student'
-            session['student_info'] = {
-                'id': user['id'],
-                'idno': user['idno'],
-                'name': f"{user['firstname']} {user['lastname']}",
-                'profile_picture': user['profile_picture']
-            }
-            flash(f'Welcome, {user["firstname"]}!', 'success')
-            return redirect(url_for('student_dashboard'))
+        auth.login_limiter.succeeded(username)
+        auth.upgrade_password_hash(user, password)
         
-        flash('Invalid username or password', 'error')
-        return redirect(url_for('index'))
+        # Fresh session id on login so an id handed out before it can't be reused
+        session.regenerate()
+        session.permanent = True
+        session['user_id'] = user['id']
+        session['username'] = user['username']
+        session['user_type'] = user['user_type']
+        
+        if user['user_type'] == 'admin':
+            flash('Welcome, Admin!', 'success')
+            return redirect(url_for('admin_dashboard'))
+        
+        session['student_info'] = {
+            'id': user['id'],
+            'idno': user['idno'],
+            'name': f"{user['firstname']} {user['lastname']}",
+            'profile_picture': user['profile_picture']
+        }
+        flash(f'Welcome, {user["firstname"]}!', 'success')
+        return redirect(url_for('student_dashboard'))
 
 @app.route('/logout')
 def logout():
@@ -401,93 +293,52 @@ def student_dashboard():
         flash('Access denied', 'error')
         return redirect(url_for('index'))
     
+    page = request.args.get('page', 1, type=int)
+    
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
-    # Get student information
-    cursor.execute("SELECT * FROM students WHERE id = %s", (session['user_id'],))
-    student = cursor.fetchone()
+    # Get the student, their recent feedback and one page of sessions
+    data = loaders.load_student_dashboard(cursor, session['user_id'], page)
     
-    if not student:
+    if not data:
         flash('Student not found', 'error')
         cursor.close()
         conn.close()
         return redirect(url_for('logout'))
     
-    # Ensure sessions_used and max_sessions exist
-    if 'sessions_used' not in student or student['sessions_used'] is None:
-        # Set max_sessions based on course
-        max_sessions = 30 if student['course'] in ['1', '2', '3'] else 25
-        
-        cursor.execute("""
-        UPDATE students 
-        SET sessions_used = 0, max_sessions = %s
-        WHERE id = %s
-        """, (max_sessions, student['id']))
-        
-        conn.commit()
-        
-        # Update the student object
-        student['sessions_used'] = 0
-        student['max_sessions'] = max_sessions
-    
-    # Make sure BSIT, BSCS, BSCE students have 30 sessions
-    if student['course'] in ['1', '2', '3'] and student['max_sessions'] != 30:
-        cursor.execute("""
-        UPDATE students 
-        SET max_sessions = 30
-        WHERE id = %s
-        """, (student['id'],))
-        
-        conn.commit()
-        
-        # Update the student object
-        student['max_sessions'] = 30
-    
-    # Get student's sessions
-    cursor.execute("""
-    SELECT * FROM sessions 
-    WHERE student_id = %s 
-    ORDER BY date_time DESC
-    """, (session['user_id'],))
-    sessions = cursor.fetchall()
-    
-    # If sessions is None, set it to an empty list
-    if sessions is None:
-        sessions = []
-    
-    # Get student's feedback
-    try:
-        cursor.execute("""
-        SELECT f.*, s.lab_room 
-        FROM feedback f
-        JOIN sessions s ON f.session_id = s.id
-        WHERE f.student_id = %s
-        ORDER BY f.created_at DESC
-        """, (session['user_id'],))
-        feedback_list = cursor.fetchall()
-    except:
-        feedback_list = []
-    
-    # Get active announcements
-    try:
-        cursor.execute("""
-        SELECT * FROM announcements 
-        WHERE is_active = TRUE 
-        ORDER BY created_at DESC
-        """)
-        announcements = cursor.fetchall()
-    except:
-        announcements = []
-    
     cursor.close()
     conn.close()
     
+    # Get active announcements (shared cache, invalidated by the admin write routes)
+    announcements = announcements_feed.get_feed()
+    
     return render_template('student_dashboard.html', 
-                          student=student, 
-                          sessions=sessions,
-                          feedback_list=feedback_list,
-                          announcements=announcements)
+                          student=data['student'], 
+                          sessions=data['sessions'],
+                          page=data['page'],
+                          has_more_sessions=data['has_more_sessions'],
+                          feedback_list=data['feedback_list'],
+                          announcements=announcements['items'],
+                          announcements_version=announcements['version'],
+                          labs=labs.get_labs(active_only=True))
+
+# Feedback list with student and session details; the dashboard template only
+# calls this when its cached feedback fragment is missing or out of date
+def load_feedback_list():
+    try:
+        with db.connection_cursor(dictionary=True) as (conn, cursor):
+            cursor.execute("""
+            SELECT f.*, s.lab_room, st.firstname, st.lastname, st.idno
+            FROM feedback f
+            JOIN sessions s ON f.session_id = s.id
+            JOIN students st ON f.student_id = st.id
+            ORDER BY f.created_at DESC
+            """)
+            return cursor.fetchall()
+    except mysql.connector.Error:
+        logger.exception('Could not load the feedback list')
+        return []
 
 @app.route('/admin-dashboard')
 @admin_required
@@ -495,21 +346,12 @@ def admin_dashboard():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
-    # Get all students
-    cursor.execute("""
-    SELECT s.*, 
-           (SELECT COUNT(*) FROM sessions WHERE student_id = s.id AND status = 'active') as active_sessions
-    FROM students s
-    ORDER BY lastname, firstname
-    """)
-    students = cursor.fetchall()
+    # Get the first page of the student roster; further pages load on demand
+    students, students_next_cursor = roster.fetch_roster_page(cursor)
+    student_counts = roster.fetch_course_counts(cursor)
     
     # Check if approval_status column exists in sessions table
-    try:
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'approval_status'")
-        has_approval_status = cursor.fetchone() is not None
-    except:
-        has_approval_status = False
+    has_approval_status = schema_cache.has_column('sessions', 'approval_status')
     
     # Get active sessions (approved but not completed)
     if has_approval_status:
@@ -593,111 +435,19 @@ def admin_dashboard():
     """)
     recent_activity = cursor.fetchall()
     
-    # Get programming language statistics
-    try:
-        cursor.execute("""
-        SELECT 
-            programming_language,
-            COUNT(*) as count,
-            (COUNT(*) * 100.0 / (SELECT COUNT(*) FROM sessions WHERE programming_language IS NOT NULL)) as percentage
-        FROM sessions
-        WHERE programming_language IS NOT NULL
-        GROUP BY programming_language
-        ORDER BY count DESC
-        """)
-        language_stats = cursor.fetchall()
-        
-        # Ensure we have data for all default languages
-        default_languages = ['PHP', 'Java', 'Python', 'JavaScript', 'C++', 'C#', 'Ruby', 'Swift']
-        existing_languages = [lang['programming_language'] for lang in language_stats]
-        
-        # Add missing languages with count 0
-        for lang in default_languages:
-            if lang not in existing_languages:
-                language_stats.append({
-                    'programming_language': lang,
-                    'count': 0,
-                    'percentage': 0
-                })
-    except Exception as e:
-        print(f"Error getting language stats: {str(e)}")
-        language_stats = []
-    
-    # Get lab room usage statistics
-    try:
-        cursor.execute("""
-        SELECT 
-            lab_room,
-            COUNT(*) as count,
-            (COUNT(*) * 100.0 / (SELECT COUNT(*) FROM sessions)) as percentage,
-            SUM(duration) as total_hours
-        FROM sessions
-        GROUP BY lab_room
-        ORDER BY count DESC
-        """)
-        lab_stats = cursor.fetchall()
-        
-        # Ensure we have data for all lab rooms
-        default_labs = ['Lab 1', 'Lab 2', 'Lab 3', 'Lab 4', 'Lab 5', 'Lab 6', 'Lab 7', 'Lab 8', 'Lab 9', 'Lab 10', 'Lab 11']
-        existing_labs = [lab['lab_room'] for lab in lab_stats]
-        
-        # Add missing labs with count 0
-        for lab in default_labs:
-            if lab not in existing_labs:
-                lab_stats.append({
-                    'lab_room': lab,
-                    'count': 0,
-                    'percentage': 0,
-                    'total_hours': 0
-                })
-    except Exception as e:
-        print(f"Error getting lab stats: {str(e)}")
-        lab_stats = []
-    
-    # Get feedback statistics
-    try:
-        cursor.execute("""
-        SELECT 
-            COUNT(*) as total_feedback,
-            AVG(rating) as average_rating,
-            SUM(CASE WHEN rating >= 4 THEN 1 ELSE 0 END) as positive_feedback,
-            SUM(CASE WHEN rating <= 2 THEN 1 ELSE 0 END) as negative_feedback
-        FROM feedback
-        """)
-        feedback_stats = cursor.fetchone()
-    except:
-        feedback_stats = {
-            'total_feedback': 0,
-            'average_rating': 0,
-            'positive_feedback': 0,
-            'negative_feedback': 0
-        }
-    
-    # Get feedback list with student and session details
-    try:
-        cursor.execute("""
-        SELECT f.*, s.lab_room, st.firstname, st.lastname, st.idno
-        FROM feedback f
-        JOIN sessions s ON f.session_id = s.id
-        JOIN students st ON f.student_id = st.id
-        ORDER BY f.created_at DESC
-        """)
-        feedback_list = cursor.fetchall()
-    except:
-        feedback_list = []
-    
-    # Get announcements
-    try:
-        cursor.execute("SELECT * FROM announcements ORDER BY created_at DESC")
-        announcements = cursor.fetchall()
-    except:
-        announcements = []
+    # Get language, lab room and feedback statistics from the summary tables
+    language_stats, lab_stats, feedback_stats = stats.load_dashboard_stats(cursor)
     
     cursor.close()
     conn.close()
     
+    # Get announcements (the version keys the cached announcements fragment)
+    announcements = announcements_feed.get_feed(active_only=False)
+    
     return render_template('admin_dashboard.html', 
                           students=students, 
+                          students_next_cursor=students_next_cursor,
+                          student_counts=student_counts,
                           active_sessions=active_sessions,
                           pending_sessions=pending_sessions,
                           current_sit_ins=current_sit_ins,
@@ -705,8 +455,37 @@ def admin_dashboard():
                           language_stats=language_stats,
                           lab_stats=lab_stats,
                           feedback_stats=feedback_stats,
-                          feedback_list=feedback_list,
-                          announcements=announcements)
+                          load_feedback_list=load_feedback_list,
+                          announcements=announcements['items'],
+                          announcements_version=announcements['version'],
+                          lab_rooms=labs.lab_labels())
+
+@app.route('/admin/students', methods=['GET'])
+@admin_required
+def list_students():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        students, next_cursor = roster.fetch_roster_page(
+            cursor,
+            search=request.args.get('q', ''),
+            course=request.args.get('course'),
+            sort=request.args.get('sort', 'name'),
+            direction=request.args.get('direction', 'asc'),
+            after=request.args.get('cursor'),
+            limit=request.args.get('limit', roster.DEFAULT_PAGE_SIZE, type=int)
+        )
+        for student in students:
+            student['profile_thumb'] = pictures.thumbnail(student['profile_picture'])
+        return jsonify({'students': students, 'next_cursor': next_cursor})
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+        
+    finally:
+        cursor.close()
+        conn.close()
 
 @app.route('/export-report/<format>')
 @admin_required
@@ -715,142 +494,63 @@ def export_report(format):
         flash('Invalid export format', 'error')
         return redirect(url_for('admin_dashboard'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Get all sessions
-    cursor.execute("""
-    SELECT s.*, st.firstname, st.lastname, st.idno, st.course
-    FROM sessions s
-    JOIN students st ON s.student_id = st.id
-    ORDER BY s.date_time DESC
-    """)
-    sessions = cursor.fetchall()
+    try:
+        filters = reports.parse_report_filters(request.args)
+    except ValueError:
+        flash('Invalid date range, use YYYY-MM-DD', 'error')
+        return redirect(url_for('admin_dashboard'))
     
-    cursor.close()
-    conn.close()
+    if format in reports.REPORT_FORMATS:
+        # XLSX and PDF files are built by a background job; the Reports tab polls for them
+        job = reports.submit_job(format, filters)
+        flash(f"Your report is being generated. Download it from {url_for('download_report', job_id=job['id'])} when it is ready.", 'info')
+        return redirect(url_for('admin_dashboard'))
     
-    if format == 'csv':
-        # Generate CSV
-        import csv
-        from io import StringIO
-        import datetime
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['ID', 'Student ID', 'Student Name', 'Course', 'Lab Room', 'Date & Time', 
-                         'Duration', 'Programming Language', 'Purpose', 'Status'])
-        
-        # Map lab room codes to actual room numbers
-        lab_room_mapping = {
-            'Lab 1': 'Lab 524 (Lab 1)',
-            'Lab 2': 'Lab 526 (Lab 2)',
-            'Lab 3': 'Lab 528 (Lab 3)',
-            'Lab 4': 'Lab 530 (Lab 4)',
-            'Lab 5': 'Lab 532 (Lab 5)',
-            'Lab 6': 'Lab 534 (Lab 6)',
-            'Lab 7': 'Lab 536 (Lab 7)',
-            'Lab 8': 'Lab 538 (Lab 8)',
-            'Lab 9': 'Lab 540 (Lab 9)',
-            'Lab 10': 'Lab 542 (Lab 10)',
-            'Lab 11': 'Lab 544 (Lab 11)'
-        }
-        
-        # Write data
-        for session in sessions:
-            course_name = ''
-            if session['course'] == '1':
-                course_name = 'BSIT'
-            elif session['course'] == '2':
-                course_name = 'BSCS'
-            elif session['course'] == '3':
-                course_name = 'BSCE'
-            else:
-                course_name = session['course']
-            
-            # Get the actual lab room name with number
-            lab_room_display = lab_room_mapping.get(session['lab_room'], session['lab_room'])
-                
-            writer.writerow([
-                session['id'],
-                session['idno'],
-                f"{session['firstname']} {session['lastname']}",
-                course_name,
-                lab_room_display,
-                session['date_time'].strftime('%Y-%m-%d %H:%M') if isinstance(session['date_time'], datetime.datetime) else session['date_time'],
-                session['duration'],
-                session.get('programming_language', 'Not specified'),
-                session.get('purpose', 'Not specified')[:50] + '...' if session.get('purpose') and len(session.get('purpose')) > 50 else session.get('purpose', 'Not specified'),
-                session['status']
-            ])
-        
-        output.seek(0)
-        
-        from flask import Response
-        return Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-disposition": "attachment; filename=sit_in_sessions_report.csv"}
-        )
+    # Stream rows to the browser as they come off the server instead of building the whole file
+    conn = get_db_connection()
+    return Response(
+        stream_with_context(reports.stream_csv(conn, filters)),
+        mimetype="text/csv",
+        headers={"Content-disposition": "attachment; filename=sit_in_sessions_report.csv"}
+    )
+
+@app.route('/admin/reports', methods=['POST'])
+@admin_required
+def create_report():
+    format = request.form.get('format')
+    if format not in reports.REPORT_FORMATS:
+        return jsonify({'error': 'Invalid report format'}), 400
     
-    elif format == 'excel':
-        # For Excel, we'd typically use a library like openpyxl or xlsxwriter
-        # For simplicity, we'll just return a CSV with an Excel mimetype
-        import csv
-        from io import StringIO
-        import datetime
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['ID', 'Student ID', 'Student Name', 'Course', 'Lab Room', 'Date & Time', 
-                         'Duration', 'Programming Language', 'Purpose', 'Status'])
-        
-        # Write data
-        for session in sessions:
-            course_name = ''
-            if session['course'] == '1':
-                course_name = 'BSIT'
-            elif session['course'] == '2':
-                course_name = 'BSCS'
-            elif session['course'] == '3':
-                course_name = 'BSCE'
-            else:
-                course_name = session['course']
-            
-            # Get the actual lab room name with number
-            lab_room_display = lab_room_mapping.get(session['lab_room'], session['lab_room'])
-                
-            writer.writerow([
-                session['id'],
-                session['idno'],
-                f"{session['firstname']} {session['lastname']}",
-                course_name,
-                lab_room_display,
-                session['date_time'].strftime('%Y-%m-%d %H:%M') if isinstance(session['date_time'], datetime.datetime) else session['date_time'],
-                session['duration'],
-                session.get('programming_language', 'Not specified'),
-                session.get('purpose', 'Not specified')[:50] + '...' if session.get('purpose') and len(session.get('purpose')) > 50 else session.get('purpose', 'Not specified'),
-                session['status']
-            ])
-        
-        output.seek(0)
-        
-        from flask import Response
-        return Response(
-            output.getvalue(),
-            mimetype="application/vnd.ms-excel",
-            headers={"Content-disposition": "attachment; filename=sit_in_sessions_report.xls"}
-        )
+    try:
+        filters = reports.parse_report_filters(request.form)
+    except ValueError:
+        return jsonify({'error': 'Invalid date range, use YYYY-MM-DD'}), 400
     
-    elif format == 'pdf':
-        # For PDF generation, we'd typically use a library like ReportLab or WeasyPrint
-        # This is a placeholder that would be implemented with a proper PDF library
-        flash('PDF export is not implemented yet', 'info')
+    job = reports.submit_job(format, filters)
+    return jsonify(dict(job, status_url=url_for('report_status', job_id=job['id']))), 202
+
+@app.route('/admin/reports/<job_id>', methods=['GET'])
+@admin_required
+def report_status(job_id):
+    job = reports.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Report not found'}), 404
+    
+    if job['status'] == 'done':
+        job['download_url'] = url_for('download_report', job_id=job_id)
+    return jsonify(job)
+
+@app.route('/admin/reports/<job_id>/download', methods=['GET'])
+@admin_required
+def download_report(job_id):
+    job = reports.get_job(job_id)
+    if not job or job['status'] != 'done':
+        flash('Report not found or not ready yet', 'error')
         return redirect(url_for('admin_dashboard'))
+    
+    extension, mimetype = reports.REPORT_FORMATS[job['format']]
+    return send_file(reports.artifact_path(job), mimetype=mimetype, as_attachment=True,
+                     download_name=f"sit_in_sessions_report.{extension}")
 
 @app.route('/edit-profile', methods=['GET', 'POST'])
 @login_required
@@ -869,17 +569,21 @@ def edit_profile():
         middlename = request.form.get('middlename', '')
         email = request.form['email']
         
-        # Handle profile picture upload
+        # Handle profile picture upload (resized and stored under its content hash)
         profile_picture = None
         if 'profile_picture' in request.files:
             file = request.files['profile_picture']
             if file and file.filename != '' and allowed_file(file.filename):
-                # Generate unique filename
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
-                profile_picture = unique_filename
+                try:
+                    profile_picture = pictures.save_upload(file)
+                except pictures.PictureError as e:
+                    cursor.close()
+                    conn.close()
+                    flash(str(e), 'error')
+                    return redirect(url_for('edit_profile'))
+        
+        current = profiles.get_profile(session['user_id'])
+        old_picture = current['profile_picture'] if current else None
         
         try:
             # Update student information
@@ -890,8 +594,6 @@ def edit_profile():
                 WHERE id = %s
                 ''', (lastname, firstname, middlename, email, profile_picture, session['user_id']))
                 
-                # Update session data with new profile picture
-                session['student_info']['profile_picture'] = profile_picture
             else:
                 cursor.execute('''
                 UPDATE students 
@@ -900,25 +602,36 @@ def edit_profile():
                 ''', (lastname, firstname, middlename, email, session['user_id']))
             
             conn.commit()
+            profiles.invalidate(session['user_id'])
+            fragments.bump('feedback')  # the feedback list shows student names
+            
+            # Drop the replaced picture's files unless another student uses the same image
+            if profile_picture and old_picture != profile_picture:
+                pictures.release(cursor, old_picture)
             
-            # Update session data
-            session['student_info']['name'] = f"{firstname} {lastname}"
+            # Update session data (reassigned so the session store sees the change)
+            student_info = dict(session['student_info'], name=f"{firstname} {lastname}")
+            if profile_picture:
+                student_info['profile_picture'] = profile_picture
+            session['student_info'] = student_info
             
             flash('Profile updated successfully', 'success')
             return redirect(url_for('student_dashboard'))
             
         except Exception as e:
             conn.rollback()
+            # The new picture was stored before the UPDATE; collect it unless another student uses it
+            if profile_picture and profile_picture != old_picture:
+                pictures.release_later(profile_picture)
             flash(f'Profile update failed: {str(e)}', 'error')
             return redirect(url_for('edit_profile'))
     
-    # Get student information for the form
-    cursor.execute("SELECT * FROM students WHERE id = %s", (session['user_id'],))
-    student = cursor.fetchone()
-    
     cursor.close()
     conn.close()
     
+    # Get student information for the form
+    student = profiles.get_profile(session['user_id'])
+    
     if not student:
         flash('Student not found', 'error')
         return redirect(url_for('logout'))
@@ -942,71 +655,43 @@ def add_session():
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Check if student has available sessions
-        cursor.execute("SELECT sessions_used, max_sessions FROM students WHERE id = %s", (session['user_id'],))
-        student = cursor.fetchone()
-        
-        if student['sessions_used'] >= student['max_sessions']:
-            flash('You have used all your available sessions', 'error')
+        # Check if student has available sessions; locks this student's row until commit
+        try:
+            quota.check_request(cursor, session['user_id'])
+        except quota.QuotaError as e:
+            flash(str(e), 'error')
             return redirect(url_for('student_dashboard'))
         
-        # Check if programming_language column exists
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'programming_language'")
-        has_programming_language = cursor.fetchone() is not None
-        
-        # Check if purpose column exists
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'purpose'")
-        has_purpose = cursor.fetchone() is not None
-        
-        # Check if approval_status column exists
-        cursor.execute("SHOW COLUMNS FROM sessions LIKE 'approval_status'")
-        has_approval_status = cursor.fetchone() is not None
+        # Check the lab has a free seat for the whole booking; locks the lab's row until commit
+        try:
+            start = datetime.strptime(date_time, '%Y-%m-%dT%H:%M')
+            labs.reserve_seat(cursor, lab_room, start, int(duration))
+        except ValueError:
+            flash('Invalid date, time or duration', 'error')
+            return redirect(url_for('student_dashboard'))
+        except labs.AvailabilityError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('student_dashboard'))
         
-        # Add new session with pending status
-        if has_programming_language and has_purpose and has_approval_status:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, purpose, status, approval_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, programming_language, purpose, 'pending', 'pending'))
-        elif has_programming_language and has_approval_status:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, status, approval_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, programming_language, 'pending', 'pending'))
-        elif has_purpose and has_approval_status:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, purpose, status, approval_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, purpose, 'pending', 'pending'))
-        elif has_approval_status:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, status, approval_status)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, 'pending', 'pending'))
-        elif has_programming_language and has_purpose:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, purpose, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, programming_language, purpose, 'pending'))
-        elif has_programming_language:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, status)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, programming_language, 'pending'))
-        elif has_purpose:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, purpose, status)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, purpose, 'pending'))
-        else:
-            cursor.execute("""
-            INSERT INTO sessions (student_id, lab_room, date_time, duration, status)
-            VALUES (%s, %s, %s, %s, %s)
-            """, (session['user_id'], lab_room, date_time, duration, 'pending'))
+        # Add new session with pending status, using only the columns this schema has
+        insert_sql, params = schema_cache.build_insert('sessions', {
+            'student_id': session['user_id'],
+            'lab_room': lab_room,
+            'date_time': date_time,
+            'duration': duration,
+            'programming_language': programming_language,
+            'purpose': purpose,
+            'status': 'pending',
+            'approval_status': 'pending'
+        })
+        cursor.execute(insert_sql, params)
+        new_session_id = cursor.lastrowid
+        stats.record_session_added(cursor, lab_room, programming_language, duration)
         
         # Note: We don't increment sessions_used until the session is approved
         
         conn.commit()
+        events.publish_session_event('requested', new_session_id)
         flash('Session request submitted successfully. Waiting for admin approval.', 'success')
         
     except Exception as e:
@@ -1019,6 +704,38 @@ def add_session():
         
     return redirect(url_for('student_dashboard'))
 
+@app.route('/make-reservation')
+@login_required
+def make_reservation():
+    if session.get('user_type') != 'student':
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
+    return render_template('make_reservation.html',
+                          labs=labs.get_labs(active_only=True),
+                          max_duration=labs.MAX_DURATION_HOURS)
+
+@app.route('/labs/free-slots')
+@login_required
+def lab_free_slots():
+    # ?lab=Lab+1&date=YYYY-MM-DD&duration=N -> start times with at least one free seat
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+        duration = int(request.args.get('duration', 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid date or duration'}), 400
+    if not 1 <= duration <= labs.MAX_DURATION_HOURS:
+        return jsonify({'error': f'Duration must be between 1 and {labs.MAX_DURATION_HOURS} hours'}), 400
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        return jsonify(labs.free_slots(cursor, request.args.get('lab', ''), day, duration))
+    except labs.AvailabilityError as e:
+        return jsonify({'error': str(e)}), 404
+    finally:
+        cursor.close()
+        conn.close()
+
 @app.route('/cancel-session/<int:session_id>', methods=['POST'])
 @login_required
 def cancel_session(session_id):
@@ -1030,30 +747,19 @@ def cancel_session(session_id):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Check if session belongs to the student
-        cursor.execute("""
-        SELECT * FROM sessions 
-        WHERE id = %s AND student_id = %s
-        """, (session_id, session['user_id']))
-        sit_in_session = cursor.fetchone()
+        # Only approved sessions give their quota back
+        result = quota.cancel_session(cursor, session_id, session['user_id'])
         
-        if not sit_in_session:
+        if result == 'not_found':
             flash('Session not found or not authorized', 'error')
             return redirect(url_for('student_dashboard'))
         
-        # Cancel session
-        cursor.execute("""
-        UPDATE sessions SET status = 'cancelled'
-        WHERE id = %s
-        """, (session_id,))
-        
-        # Update sessions used
-        cursor.execute("""
-        UPDATE students SET sessions_used = sessions_used - 1
-        WHERE id = %s
-        """, (session['user_id'],))
+        if result == 'not_cancellable':
+            flash('This session can no longer be cancelled', 'error')
+            return redirect(url_for('student_dashboard'))
         
         conn.commit()
+        events.publish_session_event('cancelled', session_id)
         flash('Session cancelled successfully', 'success')
         
     except Exception as e:
@@ -1080,17 +786,17 @@ def complete_session(session_id):
         """, (session_id,))
         
         conn.commit()
-        flash('Session marked as completed', 'success')
         
     except Exception as e:
         conn.rollback()
-        flash(f'Failed to update session: {str(e)}', 'error')
+        return admin_action_response(f'Failed to update session: {str(e)}', 'error', status=500)
         
     finally:
         cursor.close()
         conn.close()
-        
-    return redirect(url_for('admin_dashboard'))
+    
+    event = events.publish_session_event('completed', session_id, force=wants_json())
+    return admin_action_response('Session marked as completed', 'success', event)
 
 @app.route('/admin/end-student-session/<int:student_id>', methods=['POST'])
 @admin_required
@@ -1100,12 +806,18 @@ def end_student_session(student_id):
     
     try:
         # Get student information
-        cursor.execute("SELECT * FROM students WHERE id = %s", (student_id,))
+        cursor.execute("SELECT id FROM students WHERE id = %s", (student_id,))
         student = cursor.fetchone()
         
         if not student:
-            flash('Student not found', 'error')
-            return redirect(url_for('admin_dashboard'))
+            return admin_action_response('Student not found', 'error', status=404)
+        
+        # Remember which sessions are ending so the live monitor can drop them
+        cursor.execute("""
+        SELECT id FROM sessions
+        WHERE student_id = %s AND status = 'active'
+        """, (student_id,))
+        ended_ids = [row[0] for row in cursor.fetchall()]
         
         # Mark all active sessions for this student as completed
         cursor.execute("""
@@ -1114,17 +826,18 @@ def end_student_session(student_id):
         """, (student_id,))
         
         conn.commit()
-        flash(f'All active sessions for student {student_id} have been ended', 'success')
         
     except Exception as e:
         conn.rollback()
-        flash(f'Failed to end sessions: {str(e)}', 'error')
+        return admin_action_response(f'Failed to end sessions: {str(e)}', 'error', status=500)
         
     finally:
         cursor.close()
         conn.close()
-        
-    return redirect(url_for('admin_dashboard'))
+    
+    for session_id in ended_ids:
+        events.publish_session_event('completed', session_id)
+    return admin_action_response(f'All active sessions for student {student_id} have been ended', 'success')
 
 @app.route('/admin/get-student-info/<int:student_id>', methods=['GET'])
 @admin_required
@@ -1182,47 +895,42 @@ def get_student_info(student_id):
         cursor.close()
         conn.close()
 
+APPROVAL_ERRORS = {
+    'not_found': ('Session not found', 404),
+    'not_pending': ('Session is no longer pending', 409),
+    'quota_exceeded': ('Student has no sessions left', 409),
+}
+
 @app.route('/admin/approve-session/<int:session_id>', methods=['POST'])
 @admin_required
 def approve_session(session_id):
+    # Retried clicks send the same Idempotency-Key and get the first answer back
+    idempotency_key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key') or None
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Get session information
-        cursor.execute("SELECT * FROM sessions WHERE id = %s", (session_id,))
-        session_data = cursor.fetchone()
-        
-        if not session_data:
-            flash('Session not found', 'error')
-            return redirect(url_for('admin_dashboard'))
-        
-        # Update session status to approved
-        cursor.execute("""
-        UPDATE sessions 
-        SET approval_status = 'approved', status = 'active'
-        WHERE id = %s
-        """, (session_id,))
-        
-        # Increment sessions_used for the student
-        cursor.execute("""
-        UPDATE students 
-        SET sessions_used = sessions_used + 1
-        WHERE id = %s
-        """, (session_data['student_id'],))
-        
+        result = quota.approve_session(cursor, session_id, idempotency_key)
         conn.commit()
-        flash('Session approved successfully', 'success')
+        
+    except quota.QuotaError as e:
+        conn.rollback()
+        return admin_action_response(str(e), 'error', status=409)
         
     except Exception as e:
         conn.rollback()
-        flash(f'Failed to approve session: {str(e)}', 'error')
+        return admin_action_response(f'Failed to approve session: {str(e)}', 'error', status=500)
         
     finally:
         cursor.close()
         conn.close()
-        
-    return redirect(url_for('admin_dashboard'))
+    
+    if result not in quota.APPROVED_RESULTS:
+        message, status = APPROVAL_ERRORS[result]
+        return admin_action_response(message, 'error', status=status)
+    
+    event = events.publish_session_event('approved', session_id, force=wants_json())
+    return admin_action_response('Session approved successfully', 'success', event)
 
 @app.route('/admin/reject-session/<int:session_id>', methods=['POST'])
 @admin_required
@@ -1231,25 +939,24 @@ def reject_session(session_id):
     cursor = conn.cursor()
     
     try:
-        # Update session status to rejected
-        cursor.execute("""
-        UPDATE sessions 
-        SET approval_status = 'rejected', status = 'cancelled'
-        WHERE id = %s
-        """, (session_id,))
-        
+        # Only pending requests can be rejected; approved sessions hold quota and are cancelled instead
+        result = quota.reject_session(cursor, session_id)
         conn.commit()
-        flash('Session rejected', 'success')
         
     except Exception as e:
         conn.rollback()
-        flash(f'Failed to reject session: {str(e)}', 'error')
+        return admin_action_response(f'Failed to reject session: {str(e)}', 'error', status=500)
         
     finally:
         cursor.close()
         conn.close()
-        
-    return redirect(url_for('admin_dashboard'))
+    
+    if result != 'rejected':
+        message, status = APPROVAL_ERRORS[result]
+        return admin_action_response(message, 'error', status=status)
+    
+    event = events.publish_session_event('rejected', session_id, force=wants_json())
+    return admin_action_response('Session rejected', 'success', event)
 
 @app.route('/admin/check-in/<int:session_id>', methods=['POST'])
 @admin_required
@@ -1266,17 +973,17 @@ def check_in_student(session_id):
         """, (session_id,))
         
         conn.commit()
-        flash('Student checked in successfully', 'success')
         
     except Exception as e:
         conn.rollback()
-        flash(f'Failed to check in student: {str(e)}', 'error')
+        return admin_action_response(f'Failed to check in student: {str(e)}', 'error', status=500)
         
     finally:
         cursor.close()
         conn.close()
-        
-    return redirect(url_for('admin_dashboard'))
+    
+    event = events.publish_session_event('checked_in', session_id, force=wants_json())
+    return admin_action_response('Student checked in successfully', 'success', event)
 
 @app.route('/admin/check-out/<int:session_id>', methods=['POST'])
 @admin_required
@@ -1293,17 +1000,75 @@ def check_out_student(session_id):
         """, (session_id,))
         
         conn.commit()
-        flash('Student checked out successfully', 'success')
         
     except Exception as e:
         conn.rollback()
-        flash(f'Failed to check out student: {str(e)}', 'error')
+        return admin_action_response(f'Failed to check out student: {str(e)}', 'error', status=500)
         
     finally:
         cursor.close()
         conn.close()
-        
-    return redirect(url_for('admin_dashboard'))
+    
+    event = events.publish_session_event('checked_out', session_id, force=wants_json())
+    return admin_action_response('Student checked out successfully', 'success', event)
+
+@app.route('/admin/sessions/bulk/<action>', methods=['POST'])
+@admin_required
+def bulk_session_action(action):
+    # Body: {"ids": [...]} as JSON, or repeated session_ids form fields
+    handler = bulk.BULK_HANDLERS.get(action)
+    if handler is None:
+        return jsonify({'ok': False, 'message': f'Unknown bulk action: {action}'}), 404
+
+    if request.is_json:
+        values = (request.get_json(silent=True) or {}).get('ids') or []
+    else:
+        values = request.form.getlist('session_ids')
+    try:
+        ids = bulk.parse_ids(values)
+    except ValueError as e:
+        return jsonify({'ok': False, 'message': str(e)}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        updated, results = handler(cursor, ids)
+        conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'ok': False, 'message': f'Bulk {action} failed: {str(e)}'}), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    event_list = events.publish_session_events(bulk.BULK_EVENTS[action], updated, force=True)
+    return jsonify({
+        'ok': True,
+        'message': f'{len(updated)} of {len(ids)} session(s) updated',
+        'results': results,
+        'events': event_list
+    })
+
+@app.route('/admin/events', methods=['GET'])
+@admin_required
+def admin_events():
+    # Server-Sent Events stream of session state changes for the live monitor
+    try:
+        subscriber, missed = events.hub.subscribe(request.headers.get('Last-Event-ID'))
+    except events.TooManySubscribers:
+        return Response('Too many live monitors are open; retrying shortly.', status=503,
+                        mimetype='text/plain', headers={'Retry-After': '30'})
+    response = Response(
+        stream_with_context(events.hub.stream(subscriber, missed)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Frees the slot even if the response is closed before the stream starts
+    response.call_on_close(lambda: events.hub.unsubscribe(subscriber))
+    return response
 
 @app.route('/submit-feedback/<int:session_id>', methods=['POST'])
 @login_required
@@ -1334,10 +1099,12 @@ def submit_feedback(session_id):
             flash('Session not found or not authorized', 'error')
             return redirect(url_for('student_dashboard'))
         
-        # Check if feedback already exists
+        # Check if feedback already exists; the row stays locked until commit so a
+        # concurrent edit can't apply its stats delta from the same old rating
         cursor.execute("""
-        SELECT * FROM feedback 
+        SELECT rating FROM feedback 
         WHERE session_id = %s AND student_id = %s
+        FOR UPDATE
         """, (session_id, session['user_id']))
         
         existing_feedback = cursor.fetchone()
@@ -1348,6 +1115,7 @@ def submit_feedback(session_id):
             SET rating = %s, comments = %s
             WHERE session_id = %s AND student_id = %s
             """, (rating, comments, session_id, session['user_id']))
+            stats.record_feedback(cursor, rating, previous_rating=existing_feedback[0])
             flash('Feedback updated successfully', 'success')
         else:
             # Insert new feedback
@@ -1355,9 +1123,11 @@ def submit_feedback(session_id):
             INSERT INTO feedback (session_id, student_id, rating, comments)
             VALUES (%s, %s, %s, %s)
             """, (session_id, session['user_id'], rating, comments))
+            stats.record_feedback(cursor, rating)
             flash('Feedback submitted successfully', 'success')
         
         conn.commit()
+        fragments.bump('feedback')
         
     except Exception as e:
         conn.rollback()
@@ -1372,14 +1142,7 @@ def submit_feedback(session_id):
 @app.route('/admin/announcements', methods=['GET'])
 @admin_required
 def view_announcements():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    cursor.execute("SELECT * FROM announcements ORDER BY created_at DESC")
-    announcements = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
+    announcements = announcements_feed.get_announcements(active_only=False)
     
     return render_template('admin_announcements.html', announcements=announcements)
 
@@ -1403,6 +1166,7 @@ def add_announcement():
         """, (title, content))
         
         conn.commit()
+        announcements_feed.invalidate()
         flash('Announcement added successfully', 'success')
         
     except Exception as e:
@@ -1429,6 +1193,7 @@ def toggle_announcement(announcement_id):
         """, (announcement_id,))
         
         conn.commit()
+        announcements_feed.invalidate()
         flash('Announcement status updated', 'success')
         
     except Exception as e:
@@ -1451,6 +1216,7 @@ def delete_announcement(announcement_id):
         cursor.execute("DELETE FROM announcements WHERE id = %s", (announcement_id,))
         
         conn.commit()
+        announcements_feed.invalidate()
         flash('Announcement deleted successfully', 'success')
         
     except Exception as e:
@@ -1470,31 +1236,30 @@ def student_announcements():
         flash('Access denied', 'error')
         return redirect(url_for('index'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     # Get student information
-    cursor.execute("SELECT * FROM students WHERE id = %s", (session['user_id'],))
-    student = cursor.fetchone()
+    student = profiles.get_profile(session['user_id'])
     
     if not student:
         flash('Student not found', 'error')
-        cursor.close()
-        conn.close()
         return redirect(url_for('logout'))
     
     # Get active announcements
-    try:
-        cursor.execute("SELECT * FROM announcements WHERE is_active = TRUE ORDER BY created_at DESC")
-        announcements = cursor.fetchall()
-    except:
-        announcements = []
-    
-    cursor.close()
-    conn.close()
+    announcements = announcements_feed.get_announcements()
     
     return render_template('student_announcements.html', student=student, announcements=announcements)
 
+@app.route('/announcements/feed', methods=['GET'])
+@login_required
+def announcements_feed_json():
+    feed = announcements_feed.get_feed()
+    
+    # The feed version is a content hash, so browsers can revalidate with If-None-Match
+    response = jsonify([dict(a, created_at=a['created_at'].isoformat()) for a in feed['items']])
+    response.set_etag(feed['version'])
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/admin/delete-student/<int:student_id>', methods=['POST'])
 @admin_required
 def delete_student(student_id):
@@ -1503,13 +1268,16 @@ def delete_student(student_id):
     
     try:
         # Check if student exists
-        cursor.execute("SELECT * FROM students WHERE id = %s", (student_id,))
+        cursor.execute("SELECT id, firstname, lastname, profile_picture FROM students WHERE id = %s", (student_id,))
         student = cursor.fetchone()
         
         if not student:
             flash('Student not found', 'error')
             return redirect(url_for('admin_dashboard'))
         
+        # Take the student's sessions and feedback out of the dashboard statistics
+        stats.record_student_deleted(cursor, student_id)
+        
         # Delete student's sessions
         cursor.execute("DELETE FROM sessions WHERE student_id = %s", (student_id,))
         
@@ -1520,6 +1288,9 @@ def delete_student(student_id):
         cursor.execute("DELETE FROM students WHERE id = %s", (student_id,))
         
         conn.commit()
+        profiles.invalidate(student_id)
+        fragments.bump('feedback')
+        pictures.release(cursor, student['profile_picture'])
         flash(f'Student {student["firstname"]} {student["lastname"]} has been deleted successfully', 'success')
         
     except Exception as e:
@@ -1532,9 +1303,30 @@ def delete_student(student_id):
         
     return redirect(url_for('admin_dashboard'))
 
-# Make sure to run init_db() when the app starts
-with app.app_context():
-    init_db()
+@app.route('/admin/db-pool-stats', methods=['GET'])
+@admin_required
+def db_pool_stats():
+    return jsonify(db.get_pool().stats())
+
+@app.route('/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    return jsonify([dict(p, download_url=url_for('download_profile', profile_id=p['id']))
+                    for p in profiling.list_profiles()])
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(profiling.profile_path(profile_id), mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f"{profile['endpoint']}-{profile_id}.prof")
+
+@app.route('/admin/scheduler-stats', methods=['GET'])
+@admin_required
+def scheduler_stats():
+    return jsonify(scheduler.sweep_stats.snapshot())
 
 if __name__ == '__main__':
     app.run(debug=True)
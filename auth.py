@@ -0,0 +1,131 @@
+import collections
+import math
+import threading
+import time
+
+import credentials
+from db import connection_cursor
+
+# Account lookup and login throttling. Admins and students share one login
+# form, so a single UNION query over the two unique username indexes finds
+# whichever account matches; the rate limiter runs before any hashing so
+# bursts of guesses are turned away without costing CPU.
+
+# Admin accounts win if the same username exists in both tables
+ACCOUNT_LOOKUP = """
+SELECT 'admin' AS user_type, id, username, password,
+       NULL AS idno, NULL AS firstname, NULL AS lastname, NULL AS profile_picture
+FROM admins WHERE username = %s
+UNION ALL
+SELECT 'student' AS user_type, id, username, password,
+       idno, firstname, lastname, profile_picture
+FROM students WHERE username = %s
+ORDER BY user_type
+"""
+
+ACCOUNT_TABLES = {'admin': 'admins', 'student': 'students'}
+
+
+def find_account(username):
+    with connection_cursor(dictionary=True) as (conn, cursor):
+        cursor.execute(ACCOUNT_LOOKUP, (username, username))
+        rows = cursor.fetchall()
+    return rows[0] if rows else None
+
+
+def upgrade_password_hash(account, password):
+    # Re-hash with the current cost after a successful login if the parameters changed
+    if not credentials.needs_rehash(account['password']):
+        return
+    try:
+        new_hash = credentials.hash_password(password)
+    except credentials.CredentialServiceBusy:
+        return  # try again on the next login
+    table = ACCOUNT_TABLES[account['user_type']]
+    with connection_cursor() as (conn, cursor):
+        cursor.execute(f"UPDATE {table} SET password = %s WHERE id = %s AND password = %s",
+                       (new_hash, account['id'], account['password']))
+        conn.commit()
+
+
+class SlidingWindowLimiter:
+    """At most `limit` hits per key within the last `window` seconds.
+
+    Keeps one deque of timestamps per key in memory, so limits apply per
+    worker process. Keys idle for a whole window are dropped on the next prune.
+    """
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def _expire(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+
+    def _prune(self, now):
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self.window]:
+            del self._hits[key]
+        self._next_prune = now + self.window
+
+    def retry_after(self, key, now=None):
+        """0 if another hit is allowed now, else seconds until one would be."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return 0
+            self._expire(hits, now)
+            if len(hits) < self.limit:
+                return 0
+            return max(1, math.ceil(hits[0] + self.window - now))
+
+    def hit(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now >= self._next_prune or len(self._hits) >= self.max_keys:
+                self._prune(now)
+            hits = self._hits.setdefault(key, collections.deque())
+            self._expire(hits, now)
+            hits.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+class LoginRateLimiter:
+    # Counts failed attempts only: a lab full of students behind one NAT address
+    # signing in at once must not trip the per-IP limit
+    def __init__(self, per_username=5, per_ip=50, window=300):
+        self.usernames = SlidingWindowLimiter(per_username, window)
+        self.addresses = SlidingWindowLimiter(per_ip, window)
+
+    def check(self, username, remote_addr):
+        """Returns 0 if this attempt may proceed, else seconds to wait."""
+        return max(self.addresses.retry_after(remote_addr or 'unknown'),
+                   self.usernames.retry_after(username.strip().lower()))
+
+    def failed(self, username, remote_addr):
+        self.addresses.hit(remote_addr or 'unknown')
+        self.usernames.hit(username.strip().lower())
+
+    def succeeded(self, username):
+        # A correct password clears the username's count; the per-IP window still applies
+        self.usernames.reset(username.strip().lower())
+
+
+login_limiter = LoginRateLimiter()
+
+
+def init_app(app):
+    global login_limiter
+    login_limiter = LoginRateLimiter(
+        per_username=app.config['LOGIN_LIMIT_PER_USERNAME'],
+        per_ip=app.config['LOGIN_LIMIT_PER_IP'],
+        window=app.config['LOGIN_LIMIT_WINDOW'],
+    )
@@ -0,0 +1,174 @@
+"""Show EXPLAIN plans for the hot session/feedback queries before and after the managed indexes.
+
+Seeds a throwaway database (default `students_bench`, dropped and recreated),
+migrates it to the version just before the index migration, prints plans and
+timings, applies the index migration and prints them again.
+
+    python benchmarks/explain_indexes.py --students 2000 --sessions 100000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+
+LABS = [f'Lab {n}' for n in range(1, 12)]
+LANGUAGES = ['PHP', 'Java', 'Python', 'JavaScript', 'C++', 'C#', 'Ruby', 'Swift']
+
+# (label, query, params) for the queries the dashboards and exports run
+QUERIES = [
+    ('active sessions', """
+    SELECT s.*, st.firstname, st.lastname, st.idno, st.course
+    FROM sessions s
+    JOIN students st ON s.student_id = st.id
+    WHERE s.status = 'active' AND s.approval_status = 'approved'
+    ORDER BY s.date_time DESC
+    """, ()),
+    ('pending requests', """
+    SELECT s.*, st.firstname, st.lastname, st.idno, st.course
+    FROM sessions s
+    JOIN students st ON s.student_id = st.id
+    WHERE s.approval_status = 'pending'
+    ORDER BY s.date_time ASC
+    """, ()),
+    ('current sit-ins', """
+    SELECT s.*, st.firstname, st.lastname, st.idno, st.course
+    FROM sessions s
+    JOIN students st ON s.student_id = st.id
+    WHERE s.status = 'active' AND s.check_in_time IS NOT NULL AND s.check_out_time IS NULL
+    ORDER BY s.check_in_time DESC
+    """, ()),
+    ('recent check-ins', """
+    SELECT s.id, s.check_in_time FROM sessions s
+    WHERE s.check_in_time IS NOT NULL
+    ORDER BY s.check_in_time DESC
+    LIMIT 5
+    """, ()),
+    ('recent requests', """
+    SELECT s.id, s.created_at FROM sessions s
+    ORDER BY s.created_at DESC
+    LIMIT 5
+    """, ()),
+    ('student history', """
+    SELECT * FROM sessions
+    WHERE student_id = %s
+    ORDER BY date_time DESC
+    """, (1,)),
+    ('feedback probe', """
+    SELECT rating FROM feedback
+    WHERE session_id = %s AND student_id = %s
+    """, (1, 1)),
+    ('export date range', """
+    SELECT s.id FROM sessions s
+    WHERE s.date_time >= %s AND s.date_time < %s
+    ORDER BY s.date_time DESC
+    """, (datetime.datetime(2025, 3, 1), datetime.datetime(2025, 3, 8))),
+]
+
+
+def seed(conn, students, sessions, feedback_ratio, rng):
+    cursor = conn.cursor()
+    cursor.executemany("""
+    INSERT INTO students (idno, lastname, firstname, course, year_level, email, username, password, max_sessions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [(f'2025{n:06d}', f'Last{n % 997}', f'First{n}', str(rng.randint(1, 5)), str(rng.randint(1, 4)),
+           f'student{n}@example.com', f'student{n}', 'x', 30) for n in range(1, students + 1)])
+    conn.commit()
+
+    start = datetime.datetime(2025, 1, 6, 7, 30)
+    batch = []
+    for n in range(1, sessions + 1):
+        date_time = start + datetime.timedelta(minutes=rng.randint(0, 150 * 24 * 60))
+        approval = rng.choices(['approved', 'pending', 'rejected'], [85, 10, 5])[0]
+        status = {'pending': 'pending', 'rejected': 'cancelled'}.get(approval) or rng.choices(['completed', 'active'], [95, 5])[0]
+        check_in = date_time if approval == 'approved' and rng.random() < 0.9 else None
+        check_out = check_in + datetime.timedelta(hours=2) if check_in and status == 'completed' else None
+        batch.append((rng.randint(1, students), rng.choice(LABS), date_time, rng.randint(1, 3),
+                      rng.choice(LANGUAGES), 'Practice', status, approval, check_in, check_out, date_time))
+        if len(batch) == 5000 or n == sessions:
+            cursor.executemany("""
+            INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, purpose,
+                                  status, approval_status, check_in_time, check_out_time, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, batch)
+            conn.commit()
+            batch = []
+
+    cursor.execute("""
+    INSERT INTO feedback (session_id, student_id, rating, comments)
+    SELECT id, student_id, 1 + (id % 5), 'Seeded' FROM sessions
+    WHERE status = 'completed' AND RAND(%s) < %s
+    """, (rng.randint(0, 10 ** 6), feedback_ratio))
+    conn.commit()
+    cursor.execute("ANALYZE TABLE students, sessions, feedback")
+    cursor.fetchall()
+    cursor.close()
+
+
+def explain_all(conn, title):
+    print(f"\n=== {title} ===")
+    cursor = conn.cursor(dictionary=True)
+    for label, query, params in QUERIES:
+        cursor.execute("EXPLAIN " + query, params)
+        plan = cursor.fetchall()
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"\n{label}: {elapsed:.1f} ms")
+        for row in plan:
+            print(f"  table={row['table']} type={row['type']} key={row['key']} "
+                  f"rows={row['rows']} extra={row['Extra']}")
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--feedback-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=os.environ.get('BENCH_DB_NAME', 'students_bench'))
+    args = parser.parse_args()
+
+    config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+    }
+    server = mysql.connector.connect(**config)
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.close()
+    server.close()
+
+    conn = mysql.connector.connect(database=args.database, **config)
+    index_version = next(version for version, _, fn in migrations.MIGRATIONS
+                         if fn is migrations.add_query_indexes)
+    migrations.upgrade(conn, target=index_version - 1)
+
+    print(f"Seeding {args.students} students and {args.sessions} sessions...")
+    started = time.perf_counter()
+    seed(conn, args.students, args.sessions, args.feedback_ratio, random.Random(args.seed))
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    explain_all(conn, 'Before managed indexes')
+    migrations.upgrade(conn, target=index_version)
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE TABLE students, sessions, feedback")
+    cursor.fetchall()
+    cursor.close()
+    explain_all(conn, 'After managed indexes')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
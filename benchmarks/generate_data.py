@@ -0,0 +1,332 @@
+"""Generate a semester-scale dataset: students, sit-in sessions and feedback.
+
+Seeds a throwaway database (default `students_bench`, dropped and recreated)
+with deterministic data for the given --seed: an 18-week semester ending
+--future-days after today, Monday to Saturday, busiest mid-morning and
+early afternoon, a few labs and languages taking most of the bookings, and
+a minority of students doing most of the sit-ins. Past sessions are mostly
+completed (some no-shows, cancellations and rejections), upcoming ones are
+pending or approved, and feedback is left on completed sessions with mostly
+good ratings. sessions_used and the dashboard statistics are recomputed at
+the end. Apart from the students' (salted) password hash, the same seed
+gives the same rows on the same day.
+
+Rows are written as large multi-row INSERTs (the default), or with
+--method infile through LOAD DATA LOCAL INFILE, which is faster but needs
+`local_infile` enabled on the server.
+
+    python benchmarks/generate_data.py --students 20000 --sessions 500000 --feedback 100000
+    python benchmarks/generate_data.py --sessions 1000000 --method infile
+"""
+import argparse
+import bisect
+import datetime
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import credentials  # noqa: E402
+import labs  # noqa: E402
+import migrations  # noqa: E402
+import stats  # noqa: E402
+
+PASSWORD = 'password'
+SEMESTER_DAYS = 18 * 7
+
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Angel', 'John', 'Kristine', 'Paolo', 'Nicole',
+               'Carlo', 'Camille', 'Miguel', 'Patricia', 'Rafael', 'Andrea', 'Gabriel', 'Jasmine', 'Joshua',
+               'Bea', 'Christian', 'Sofia', 'Daniel', 'Erika', 'Kenneth', 'Hannah', 'Vincent', 'Alyssa',
+               'Adrian', 'Trisha', 'Ryan', 'Mae', 'Francis', 'Joy', 'Kevin', 'Grace', 'Jerome', 'Faith']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Ocampo', 'Garcia', 'Mendoza', 'Torres', 'Tomas',
+              'Andrada', 'Castillo', 'Flores', 'Villanueva', 'Ramos', 'Castro', 'Rivera', 'Aquino', 'Navarro',
+              'Salazar', 'Mercado', 'Gonzales', 'Lopez', 'Dela Cruz', 'Fernandez', 'Alcantara', 'Pascual',
+              'Manalo', 'Cabrera', 'Soriano', 'Gutierrez', 'Tan', 'Lim', 'Yap', 'Go', 'Sy', 'Chua']
+# Course codes as stored by the registration form (1 BSIT, 2 BSCS, 3 BSCE) plus a few others
+COURSES = [('1', 45), ('2', 30), ('3', 15), ('BSIS', 6), ('BSEMC', 4)]
+YEAR_LEVELS = [('1', 32), ('2', 28), ('3', 22), ('4', 18)]
+LANGUAGES = [('Python', 26), ('Java', 20), ('C++', 14), ('JavaScript', 12), ('PHP', 10), ('C#', 8),
+             ('C', 6), ('Swift', 2), ('Ruby', 2)]
+PURPOSES = [('Programming exercise', 40), ('Project work', 25), ('Research', 15), ('Review', 12),
+            ('Online exam', 8)]
+# Start hours 8:00-19:00, busiest mid-morning and early afternoon
+START_HOURS = [(8, 7), (9, 12), (10, 14), (11, 9), (12, 5), (13, 12), (14, 13), (15, 11), (16, 8),
+               (17, 5), (18, 3), (19, 1)]
+DURATIONS = [(1, 55), (2, 32), (3, 10), (4, 3)]
+RATINGS = [(5, 42), (4, 31), (3, 15), (2, 8), (1, 4)]
+COMMENTS = ['Great lab, fast computers', 'Aircon was too cold', 'Smooth check-in', 'Internet was slow',
+            'Helpful lab assistant', 'Some keyboards are broken', 'Quiet and clean', None, None, None]
+
+STUDENT_COLUMNS = ['id', 'idno', 'lastname', 'firstname', 'middlename', 'course', 'year_level', 'email',
+                   'username', 'password', 'max_sessions', 'created_at']
+SESSION_COLUMNS = ['id', 'student_id', 'lab_room', 'date_time', 'duration', 'programming_language', 'purpose',
+                   'status', 'approval_status', 'check_in_time', 'check_out_time', 'created_at']
+FEEDBACK_COLUMNS = ['id', 'session_id', 'student_id', 'rating', 'comments', 'created_at']
+
+
+def weighted(rng, choices, k):
+    values = [value for value, _ in choices]
+    return rng.choices(values, cum_weights=list(itertools.accumulate(w for _, w in choices)), k=k)
+
+
+# Times arrive already formatted as 'YYYY-MM-DD HH:MM:SS' strings (see Clock)
+
+def sql_literal(value):
+    # Every value is generated here (no user input), but quote strings properly anyway
+    if value is None:
+        return 'NULL'
+    if value.__class__ is int:
+        return str(value)
+    return "'" + value.replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def infile_field(value):
+    if value is None:
+        return '\\N'
+    if value.__class__ is int:
+        return str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+class InsertWriter:
+    """Writes rows as multi-row INSERT statements of `batch_size` rows."""
+
+    def __init__(self, conn, table, columns, batch_size):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        self.batch_size = batch_size
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append('(' + ','.join(map(sql_literal, row)) + ')')
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.cursor.execute(self.prefix + ','.join(self.rows))
+            self.conn.commit()
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.cursor.close()
+
+
+class InfileWriter:
+    """Writes rows to a tab-separated temp file and loads it with LOAD DATA LOCAL INFILE."""
+
+    def __init__(self, conn, table, columns, batch_size):
+        self.conn = conn
+        self.table = table
+        self.columns = columns
+        self.file = tempfile.NamedTemporaryFile('w', suffix='.tsv', newline='', delete=False)
+
+    def add(self, row):
+        self.file.write('\t'.join(map(infile_field, row)) + '\n')
+
+    def close(self):
+        self.file.close()
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {self.table}
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'
+            ({', '.join(self.columns)})
+            """, (self.file.name,))
+            self.conn.commit()
+        finally:
+            cursor.close()
+            os.remove(self.file.name)
+
+
+WRITERS = {'insert': InsertWriter, 'infile': InfileWriter}
+
+
+def generate_students(writer, count, rng, clock, password_hash):
+    # One hash for every student: hashing is salted, so it is the only value not fixed by the seed
+    courses = weighted(rng, COURSES, count)
+    years = weighted(rng, YEAR_LEVELS, count)
+    for n in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        middle = rng.choice(LAST_NAMES) if rng.random() < 0.8 else None
+        created_at = clock.stamp(-int(rng.random() * 3 * 365 * 24 * 60))
+        writer.add((n, f'{20 + int(years[n - 1]):02d}{n:07d}', last, first, middle, courses[n - 1], years[n - 1],
+                    f'student{n}@example.com', f'student{n}', password_hash, 30, created_at))
+    writer.close()
+
+
+class Clock:
+    """Times as whole minutes since the semester start, formatted once per distinct minute."""
+
+    def __init__(self, start):
+        self.start = start
+        self._formatted = {}
+
+    def minutes(self, moment):
+        return int((moment - self.start).total_seconds() // 60)
+
+    def stamp(self, minutes):
+        text = self._formatted.get(minutes)
+        if text is None:
+            text = self._formatted[minutes] = f'{self.start + datetime.timedelta(minutes=minutes):%Y-%m-%d %H:%M:%S}'
+        return text
+
+
+def generate_sessions(writer, count, students, rng, clock, now, batch_size):
+    """Writes the sessions and returns (id, student_id, check-out minute) of the completed ones."""
+    lab_codes = [code for code, _ in labs.DEFAULT_LABS]
+    # A few labs take most bookings
+    lab_weights = [(code, 1.0 / (rank + 1) ** 0.8) for rank, code in enumerate(lab_codes)]
+    # A minority of students do most of the sit-ins; capped so the busiest does a few times the average
+    activity = list(itertools.accumulate(min(rng.lognormvariate(0, 0.8), 6) for _ in range(students)))
+    day_starts = [day * 24 * 60 for day in range(SEMESTER_DAYS)
+                  if (clock.start + datetime.timedelta(days=day)).weekday() != 6]
+    now_minute = clock.minutes(now)
+    stamp, random_ = clock.stamp, rng.random  # this loop runs once per row
+
+    completed = []
+    for start in range(0, count, batch_size):
+        k = min(batch_size, count - start)
+        student_ids = [bisect.bisect_left(activity, random_() * activity[-1]) + 1 for _ in range(k)]
+        lab_rooms = weighted(rng, lab_weights, k)
+        languages = weighted(rng, LANGUAGES, k)
+        purposes = weighted(rng, PURPOSES, k)
+        hours = weighted(rng, START_HOURS, k)
+        durations = weighted(rng, DURATIONS, k)
+        for i in range(k):
+            session_id = start + i + 1
+            hour = hours[i]
+            begins = day_starts[int(random_() * len(day_starts))] + hour * 60 + (30 if random_() < 0.5 else 0)
+            duration = min(durations[i], 20 - hour)  # labs close at 21:00
+            created_at = begins - 30 - int(random_() * (7 * 24 * 60 - 30))
+            check_in = check_out = None
+            if begins > now_minute:
+                status, approval = ('pending', 'pending') if random_() < 0.6 else ('active', 'approved')
+            else:
+                outcome = random_()
+                if outcome < 0.86:
+                    status, approval = 'completed', 'approved'
+                    checked_in = begins - 10 + int(random_() * 31)
+                    checked_out = checked_in + 30 + int(random_() * (duration * 60 - 29))
+                    check_in, check_out = stamp(checked_in), stamp(checked_out)
+                    completed.append((session_id, student_ids[i], checked_out))
+                elif outcome < 0.91:
+                    status, approval = 'no_show', 'approved'
+                elif outcome < 0.95:
+                    status, approval = 'cancelled', 'approved'
+                else:
+                    status, approval = 'cancelled', 'rejected'
+            writer.add((session_id, student_ids[i], lab_rooms[i], stamp(begins), duration, languages[i],
+                        purposes[i], status, approval, check_in, check_out, stamp(created_at)))
+    writer.close()
+    return completed
+
+
+def generate_feedback(writer, count, completed, rng, clock):
+    sampled = rng.sample(completed, min(count, len(completed)))
+    sampled.sort()
+    ratings = weighted(rng, RATINGS, len(sampled))
+    for n, (session_id, student_id, checked_out) in enumerate(sampled, start=1):
+        created_at = checked_out + 1 + int(rng.random() * 3 * 24 * 60)
+        writer.add((n, session_id, student_id, ratings[n - 1], rng.choice(COMMENTS), clock.stamp(created_at)))
+    writer.close()
+
+
+def finish(conn):
+    cursor = conn.cursor()
+    # Approved sessions (completed, no-show or upcoming) count against the quota
+    cursor.execute("""
+    UPDATE students st
+    JOIN (
+        SELECT student_id, COUNT(*) AS used
+        FROM sessions
+        WHERE approval_status = 'approved' AND status != 'cancelled'
+        GROUP BY student_id
+    ) s ON s.student_id = st.id
+    SET st.sessions_used = s.used, st.max_sessions = GREATEST(st.max_sessions, s.used)
+    """)
+    stats.rebuild(cursor)
+    conn.commit()
+    cursor.execute("ANALYZE TABLE students, sessions, feedback")
+    cursor.fetchall()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=500000)
+    parser.add_argument('--feedback', type=int, default=100000)
+    parser.add_argument('--future-days', type=int, default=14, help='days of upcoming bookings after today')
+    parser.add_argument('--method', choices=sorted(WRITERS), default='insert')
+    parser.add_argument('--batch-size', type=int, default=2000, help='rows per INSERT statement')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=os.environ.get('BENCH_DB_NAME', 'students_bench'))
+    args = parser.parse_args()
+
+    config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+    }
+    server = mysql.connector.connect(**config)
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.close()
+    server.close()
+
+    conn = mysql.connector.connect(database=args.database, allow_local_infile=args.method == 'infile', **config)
+    migrations.upgrade(conn)
+    cursor = conn.cursor()
+    # Ids are generated here and every reference is valid; skip the per-row checks
+    cursor.execute("SET foreign_key_checks = 0, unique_checks = 0")
+    cursor.close()
+
+    rng = random.Random(args.seed)
+    # Dates are relative to today at midnight, so the same seed gives the same rows all day
+    now = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    clock = Clock(now + datetime.timedelta(days=args.future_days - SEMESTER_DAYS))
+    make_writer = WRITERS[args.method]
+
+    timings = []
+    started = time.perf_counter()
+    generate_students(make_writer(conn, 'students', STUDENT_COLUMNS, args.batch_size), args.students, rng, clock,
+                      credentials.hash_password(PASSWORD))
+    timings.append(('students', args.students, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    completed = generate_sessions(make_writer(conn, 'sessions', SESSION_COLUMNS, args.batch_size), args.sessions,
+                                  args.students, rng, clock, now, args.batch_size)
+    timings.append(('sessions', args.sessions, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    generate_feedback(make_writer(conn, 'feedback', FEEDBACK_COLUMNS, args.batch_size), args.feedback, completed,
+                      rng, clock)
+    timings.append(('feedback', min(args.feedback, len(completed)), time.perf_counter() - started))
+
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.execute("SET foreign_key_checks = 1, unique_checks = 1")
+    cursor.close()
+    finish(conn)
+    timings.append(('quota and statistics', None, time.perf_counter() - started))
+    conn.close()
+
+    for label, rows, elapsed in timings:
+        rate = f' ({rows / elapsed:,.0f} rows/s)' if rows and elapsed else ''
+        print(f"{label:<22} {elapsed:7.1f}s{rate}")
+    print(f"Student passwords are '{PASSWORD}'")
+    credentials.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Measure password-check throughput of the credential service by worker count.
+
+Simulates a login burst: many request threads verify passwords at once
+through credentials.verify_password. Worker count 0 hashes on the calling
+thread (the old behaviour); the others use the process pool. Also reports
+how long an unknown username takes compared with a real one. No database
+is needed.
+
+    python benchmarks/hash_throughput.py --workers 0 1 2 4 8 --logins 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import credentials  # noqa: E402
+
+
+def run_burst(stored_hash, logins, client_threads):
+    latencies = []
+    lock = threading.Lock()
+
+    def login(_):
+        started = time.perf_counter()
+        assert credentials.verify_password(stored_hash, 'correct horse')
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=client_threads) as pool:
+        list(pool.map(login, range(logins)))
+    return time.perf_counter() - started, latencies
+
+
+def time_checks(stored_hash, rounds):
+    known, unknown = [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        credentials.verify_password(stored_hash, 'wrong password')
+        known.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        credentials.verify_password(None, 'wrong password')
+        unknown.append(time.perf_counter() - started)
+    return statistics.median(known) * 1000, statistics.median(unknown) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--client-threads', type=int, default=32, help='concurrent request threads')
+    parser.add_argument('--iterations', type=int, default=credentials.DEFAULT_PBKDF2_ITERATIONS)
+    args = parser.parse_args()
+
+    print(f"PBKDF2-SHA256 with {args.iterations} iterations, {args.logins} logins from "
+          f"{args.client_threads} threads, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8} {'logins/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'known ms':>9} {'unknown ms':>11}")
+    for workers in sorted(set(args.workers)):
+        credentials.configure(iterations=args.iterations, workers=workers, queue_limit=args.logins)
+        stored_hash = credentials.hash_password('correct horse')  # also starts the pool
+        elapsed, latencies = run_burst(stored_hash, args.logins, args.client_threads)
+        latencies.sort()
+        known, unknown = time_checks(stored_hash, 5)
+        print(f"{workers:>8} {args.logins / elapsed:>10.1f} {latencies[len(latencies) // 2] * 1000:>9.1f} "
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:>9.1f} {known:>9.1f} {unknown:>11.1f}")
+    credentials.shutdown()
+
+
+if __name__ == '__main__':
+    main()
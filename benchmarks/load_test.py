@@ -0,0 +1,367 @@
+"""Load-test the sit-in workflow routes and write the results to JSON.
+
+Seeds a throwaway database (default `students_bench`, dropped and recreated)
+with students and sessions, then drives the real routes: student login,
+session requests, the admin dashboard, approvals and the CSV export. Each
+scenario runs twice: in process through the Flask test client (one request
+at a time, so the numbers are the app's own cost) and over HTTP against a
+threaded local server with several concurrent clients. Queries per request
+come from the Server-Timing header added by metrics.py; for the streamed CSV
+export they cover only the work done before the first row is sent.
+
+    python benchmarks/load_test.py --students 2000 --sessions 50000 --output before.json
+    python benchmarks/load_test.py --compare before.json --output after.json
+
+With --compare the run exits non-zero if any scenario's p95 latency is more
+than --tolerance slower than in the earlier run. No results are checked in:
+latencies only compare between runs on the same machine and dataset, so
+record the reference run yourself before a change.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import credentials  # noqa: E402
+
+PASSWORD = 'password'
+ADMIN = ('admin', 'admin')  # created by the initial migration
+LANGUAGES = ['PHP', 'Java', 'Python', 'JavaScript', 'C++', 'C#', 'Ruby', 'Swift']
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+SESSION_COOKIE = re.compile(r'(?:^|[,\s])session=([^;]*)')
+
+
+def seed(conn, students, sessions, pending, lab_codes, rng):
+    # One hash for every student so seeding doesn't pay PBKDF2 per row; the
+    # cost matches the app's default so logins don't trigger a rehash
+    password_hash = credentials.hash_password(PASSWORD)
+    cursor = conn.cursor()
+    cursor.executemany("""
+    INSERT INTO students (idno, lastname, firstname, course, year_level, email, username, password, max_sessions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [(f'2025{n:06d}', f'Last{n % 997}', f'First{n}', str(rng.randint(1, 5)), str(rng.randint(1, 4)),
+           f'student{n}@example.com', f'student{n}', password_hash, 1000) for n in range(1, students + 1)])
+    conn.commit()
+
+    start = datetime.datetime.now().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(days=120)
+    batch = []
+    for n in range(1, sessions + pending + 1):
+        if n > sessions:
+            # Pending requests for the approval scenario, in the coming weeks
+            date_time = datetime.datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + \
+                datetime.timedelta(days=rng.randint(1, 28))
+            status, approval, check_in, check_out = 'pending', 'pending', None, None
+        else:
+            date_time = start + datetime.timedelta(days=rng.randint(0, 119), hours=rng.randint(8, 18))
+            status, approval = 'completed', 'approved'
+            check_in = date_time
+            check_out = date_time + datetime.timedelta(hours=1)
+        batch.append((rng.randint(1, students), rng.choice(lab_codes), date_time, 1, rng.choice(LANGUAGES),
+                      'Practice', status, approval, check_in, check_out, date_time))
+        if len(batch) == 5000 or n == sessions + pending:
+            cursor.executemany("""
+            INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, purpose,
+                                  status, approval_status, check_in_time, check_out_time, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, batch)
+            conn.commit()
+            batch = []
+
+    cursor.execute("UPDATE students st SET sessions_used = "
+                   "(SELECT COUNT(*) FROM sessions s WHERE s.student_id = st.id AND s.approval_status = 'approved')")
+    cursor.execute("SELECT id FROM sessions WHERE approval_status = 'pending' ORDER BY id")
+    pending_ids = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    cursor.close()
+    return pending_ids
+
+
+class FlaskClientDriver:
+    """Sends requests in process through app.test_client()."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, headers=None):
+        response = self.client.open(path, method=method, data=form, headers=headers or {})
+        response.get_data()  # drain streamed responses
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class HttpDriver:
+    """Sends requests to the local server, keeping the session cookie."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, form=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookie:
+            headers['Cookie'] = f'session={self.cookie}'
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        finally:
+            conn.close()
+        for value in response.headers.get_all('Set-Cookie') or []:
+            match = SESSION_COOKIE.search(value)
+            if match:
+                self.cookie = match.group(1) or None
+        return response.status, response.headers.get('Server-Timing', '')
+
+
+def login(driver, username, password):
+    status, _ = driver.request('POST', '/login', {'username': username, 'password': password})
+    if status != 302:
+        raise RuntimeError(f'login as {username} failed with HTTP {status}')
+
+
+class Scenarios:
+    """Builds (method, path, form, headers) for each scenario; shared by both drivers."""
+
+    def __init__(self, students, pending_ids, lab_codes, rng):
+        self.students = students
+        self.pending = queue.Queue()
+        for session_id in pending_ids:
+            self.pending.put(session_id)
+        self.lab_codes = lab_codes
+        self.rng = rng
+        self.lock = threading.Lock()
+
+    def student(self):
+        with self.lock:
+            return f'student{self.rng.randint(1, self.students)}'
+
+    def login(self):
+        return 'POST', '/login', {'username': self.student(), 'password': PASSWORD}, None
+
+    def add_session(self):
+        with self.lock:
+            day = datetime.date.today() + datetime.timedelta(days=self.rng.randint(1, 28))
+            start = datetime.datetime.combine(day, datetime.time(8)) + \
+                datetime.timedelta(minutes=30 * self.rng.randint(0, 18))
+            form = {'lab_room': self.rng.choice(self.lab_codes), 'date_time': start.strftime('%Y-%m-%dT%H:%M'),
+                    'duration': '1', 'programming_language': self.rng.choice(LANGUAGES), 'purpose': 'Practice'}
+        return 'POST', '/add-session', form, None
+
+    def admin_dashboard(self):
+        return 'GET', '/admin-dashboard', None, None
+
+    def approve_session(self):
+        session_id = self.pending.get_nowait()
+        return 'POST', f'/admin/approve-session/{session_id}', {}, {'Accept': 'application/json'}
+
+    def export_csv(self):
+        return 'GET', '/export-report/csv', None, None
+
+
+# (scenario, account each client logs in as before timing starts: 'student', 'admin' or None)
+SCENARIOS = [
+    ('login', None),
+    ('add_session', 'student'),
+    ('admin_dashboard', 'admin'),
+    ('approve_session', 'admin'),
+    ('export_csv', 'admin'),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+def run_scenario(make_driver, scenarios, name, role, requests, threads):
+    build = getattr(scenarios, name)
+    latencies, query_counts, errors = [], [], []
+    lock = threading.Lock()
+
+    def client(count):
+        driver = make_driver()
+        if role == 'student':
+            login(driver, scenarios.student(), PASSWORD)
+        elif role == 'admin':
+            login(driver, *ADMIN)
+        for _ in range(count):
+            try:
+                method, path, form, headers = build()
+            except queue.Empty:
+                return  # ran out of pending sessions to approve
+            started = time.perf_counter()
+            status, timing = driver.request(method, path, form, headers)
+            elapsed = time.perf_counter() - started
+            match = QUERY_COUNT.search(timing)
+            with lock:
+                latencies.append(elapsed)
+                if match:
+                    query_counts.append(int(match.group(1)))
+                if status >= 400:
+                    errors.append(status)
+
+    shares = [requests // threads + (1 if i < requests % threads else 0) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(client, share) for share in shares if share]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    if not latencies:
+        return {'requests': 0}
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'threads': threads,
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+    }
+
+
+def print_results(driver_name, results):
+    print(f"\n{driver_name}")
+    print(f"{'scenario':<17} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}")
+    for name, r in results.items():
+        if not r['requests']:
+            print(f"{name:<17} {0:>6}")
+            continue
+        queries = '-' if r['queries_per_request'] is None else f"{r['queries_per_request']:.1f}"
+        print(f"{name:<17} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {queries:>8}")
+
+
+def compare(earlier, current, tolerance):
+    regressions = []
+    print(f"\nCompared with the run from {earlier.get('created_at', '?')} (p95, tolerance {tolerance:.0%})")
+    for driver_name, scenarios in current['drivers'].items():
+        for name, r in scenarios.items():
+            before = earlier.get('drivers', {}).get(driver_name, {}).get(name)
+            if not before or not before.get('requests') or not r['requests']:
+                continue
+            change = r['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+            flag = ''
+            if change > tolerance:
+                flag = '  REGRESSION'
+                regressions.append(f'{driver_name}/{name}')
+            print(f"  {driver_name:<12} {name:<17} {before['p95_ms']:>9.1f} -> {r['p95_ms']:>9.1f} ms "
+                  f"({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and driver')
+    parser.add_argument('--export-requests', type=int, default=5, help='requests for the CSV export scenario')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clients for the HTTP driver')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='load_results.json')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown before failing')
+    parser.add_argument('--database', default=os.environ.get('BENCH_DB_NAME', 'students_bench'))
+    args = parser.parse_args()
+
+    config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+    }
+    server = mysql.connector.connect(**config)
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.close()
+    server.close()
+
+    # The app reads its settings at import time; point it at the bench database
+    os.environ['DB_NAME'] = args.database
+    os.environ['SCHEDULER_INTERVAL'] = '0'
+    os.environ['AUTO_MIGRATE'] = '1'
+    os.environ.setdefault('DB_POOL_SIZE', str(max(10, args.threads * 2)))
+    from app import app
+    import labs
+    import stats
+    from werkzeug.serving import make_server
+
+    # Approvals need one pending request each, for both drivers
+    approvals = args.requests * 2
+    rng = random.Random(args.seed)
+    lab_codes = labs.lab_codes()
+    conn = mysql.connector.connect(database=args.database, **config)
+    print(f"Seeding {args.students} students and {args.sessions} sessions...")
+    started = time.perf_counter()
+    pending_ids = seed(conn, args.students, args.sessions, approvals, lab_codes, rng)
+    cursor = conn.cursor()
+    stats.rebuild(cursor)
+    conn.commit()
+    cursor.execute("ANALYZE TABLE students, sessions")
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    scenarios = Scenarios(args.students, pending_ids, lab_codes, random.Random(args.seed))
+    http_server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+
+    drivers = [
+        ('test_client', lambda: FlaskClientDriver(app), 1),
+        ('http', lambda: HttpDriver(args.port), args.threads),
+    ]
+    results = {'drivers': {}}
+    try:
+        for driver_name, make_driver, threads in drivers:
+            driver_results = {}
+            for name, role in SCENARIOS:
+                requests = args.export_requests if name == 'export_csv' else args.requests
+                driver_results[name] = run_scenario(make_driver, scenarios, name, role, requests, threads)
+            results['drivers'][driver_name] = driver_results
+            print_results(driver_name, driver_results)
+    finally:
+        http_server.shutdown()
+        credentials.shutdown()
+
+    results.update({
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'dataset': {'students': args.students, 'sessions': args.sessions, 'seed': args.seed},
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+    })
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            earlier = json.load(f)
+        regressions = compare(earlier, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} scenario(s) slower than in {args.compare}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Hammer the quota engine from many threads and check no student ends up over quota.
+
+Seeds a throwaway database (default `students_bench`, dropped and recreated),
+gives every student more pending requests than their quota, then fires
+single approvals (some replayed with the same idempotency key, some double
+clicked without one), bulk approvals and new session requests concurrently.
+Afterwards it verifies that:
+
+- no student's sessions_used exceeds max_sessions,
+- sessions_used matches the number of approved sessions,
+- every student with enough requests got exactly their quota approved,
+- concurrent new requests never queued more than the remaining quota,
+- every replayed idempotency key got the same answer each time.
+
+    python benchmarks/quota_stress.py --students 200 --quota 5 --threads 32
+"""
+import argparse
+import collections
+import datetime
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk  # noqa: E402
+import migrations  # noqa: E402
+import quota  # noqa: E402
+
+DEADLOCK_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+MAX_ATTEMPTS = 5
+
+
+def seed(conn, students, fresh_students, quota_size, requests_per_student):
+    cursor = conn.cursor()
+    total = students + fresh_students
+    cursor.executemany("""
+    INSERT INTO students (idno, lastname, firstname, course, year_level, email, username, password, max_sessions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [(f'2025{n:06d}', f'Last{n}', f'First{n}', '4', '1', f'student{n}@example.com', f'student{n}', 'x',
+           quota_size) for n in range(1, total + 1)])
+
+    # Only the first `students` get pre-seeded requests; the fresh ones request during the run
+    date_time = datetime.datetime(2025, 3, 3, 8, 0)
+    cursor.executemany("""
+    INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, purpose,
+                          status, approval_status)
+    VALUES (%s, 'Lab 1', %s, 1, 'Python', 'Stress', 'pending', 'pending')
+    """, [(student_id, date_time) for student_id in range(1, students + 1)
+          for _ in range(requests_per_student)])
+    conn.commit()
+    cursor.execute("SELECT id FROM sessions ORDER BY id")
+    session_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return session_ids, list(range(students + 1, total + 1))
+
+
+def build_workload(session_ids, fresh_student_ids, quota_size, replay_ratio, bulk_size, rng):
+    ops = []
+    for session_id in session_ids:
+        key = uuid.uuid4().hex
+        ops.append(('approve', session_id, key))
+        if rng.random() < replay_ratio:
+            ops.append(('approve', session_id, key))  # retried request
+        if rng.random() < replay_ratio:
+            ops.append(('approve', session_id, None))  # double click without a key
+    shuffled = session_ids[:]
+    rng.shuffle(shuffled)
+    for start in range(0, len(shuffled), bulk_size):
+        ops.append(('bulk_approve', shuffled[start:start + bulk_size], None))
+    for student_id in fresh_student_ids:
+        ops.extend(('request', student_id, None) for _ in range(quota_size * 3))
+    rng.shuffle(ops)
+    return ops
+
+
+def run_op(cursor, op):
+    kind, target, key = op
+    if kind == 'approve':
+        return quota.approve_session(cursor, target, key)
+    if kind == 'bulk_approve':
+        approved, _ = bulk.approve_sessions(cursor, target)
+        return f'bulk:{len(approved)}'
+    try:
+        quota.check_request(cursor, target)
+    except quota.QuotaError:
+        return 'request_refused'
+    cursor.execute("""
+    INSERT INTO sessions (student_id, lab_room, date_time, duration, programming_language, purpose,
+                          status, approval_status)
+    VALUES (%s, 'Lab 1', NOW(), 1, 'Python', 'Stress', 'pending', 'pending')
+    """, (target,))
+    return 'request_accepted'
+
+
+def worker(config, ops, outcomes, latencies, counters, lock):
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        while True:
+            try:
+                op = ops.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            for attempt in range(MAX_ATTEMPTS):
+                try:
+                    result = run_op(cursor, op)
+                    conn.commit()
+                    break
+                except mysql.connector.Error as e:
+                    conn.rollback()
+                    if e.errno not in DEADLOCK_ERRORS or attempt == MAX_ATTEMPTS - 1:
+                        result = f'error:{e.errno}'
+                        break
+                    with lock:
+                        counters['retries'] += 1
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                outcomes.append((op, result))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def verify(conn, students, fresh_student_ids, quota_size, requests_per_student, outcomes):
+    problems = []
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, sessions_used, max_sessions FROM students WHERE sessions_used > max_sessions")
+    for student_id, used, maximum in cursor.fetchall():
+        problems.append(f"student {student_id} over quota: {used}/{maximum}")
+
+    cursor.execute("""
+    SELECT st.id, st.sessions_used, COUNT(s.id)
+    FROM students st
+    LEFT JOIN sessions s ON s.student_id = st.id AND s.approval_status = 'approved'
+    GROUP BY st.id, st.sessions_used
+    """)
+    expected_approved = min(quota_size, requests_per_student)
+    for student_id, used, approved in cursor.fetchall():
+        if used != approved:
+            problems.append(f"student {student_id}: sessions_used={used} but {approved} approved sessions")
+        if student_id <= students and approved != expected_approved:
+            problems.append(f"student {student_id}: {approved} approved, expected {expected_approved}")
+
+    if fresh_student_ids:
+        cursor.execute(f"""
+        SELECT student_id, COUNT(*) FROM sessions
+        WHERE student_id IN ({', '.join(['%s'] * len(fresh_student_ids))}) AND approval_status = 'pending'
+        GROUP BY student_id
+        """, tuple(fresh_student_ids))
+        for student_id, pending in cursor.fetchall():
+            if pending > quota_size:
+                problems.append(f"student {student_id}: {pending} pending requests for a quota of {quota_size}")
+    cursor.close()
+
+    answers = collections.defaultdict(set)
+    for (kind, _, key), result in outcomes:
+        if kind == 'approve' and key is not None:
+            answers[key].add(result)
+    for key, results in answers.items():
+        if len(results) > 1:
+            problems.append(f"idempotency key {key} answered {sorted(results)}")
+
+    errors = [result for _, result in outcomes if result.startswith('error:')]
+    if errors:
+        problems.append(f"{len(errors)} operation(s) failed: {collections.Counter(errors)}")
+    return problems
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--fresh-students', type=int, default=50,
+                        help='students with no requests who submit new ones during the run')
+    parser.add_argument('--quota', type=int, default=5)
+    parser.add_argument('--requests-per-student', type=int, default=12)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--replay-ratio', type=float, default=0.3)
+    parser.add_argument('--bulk-size', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=os.environ.get('BENCH_DB_NAME', 'students_bench'))
+    args = parser.parse_args()
+
+    config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+    }
+    server = mysql.connector.connect(**config)
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.close()
+    server.close()
+
+    config['database'] = args.database
+    conn = mysql.connector.connect(**config)
+    migrations.upgrade(conn)
+    session_ids, fresh_student_ids = seed(conn, args.students, args.fresh_students, args.quota,
+                                          args.requests_per_student)
+
+    rng = random.Random(args.seed)
+    workload = build_workload(session_ids, fresh_student_ids, args.quota, args.replay_ratio,
+                              args.bulk_size, rng)
+    ops = queue.Queue()
+    for op in workload:
+        ops.put(op)
+
+    outcomes, latencies = [], []
+    counters = {'retries': 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(config, ops, outcomes, latencies, counters, lock))
+               for _ in range(args.threads)]
+    print(f"Running {len(workload)} operations on {args.threads} threads...")
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = collections.Counter(result if not result.startswith('bulk:') else 'bulk' for _, result in outcomes)
+    print(f"Finished in {elapsed:.2f}s ({len(outcomes) / elapsed:.0f} ops/s), "
+          f"p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms, "
+          f"{counters['retries']} deadlock retries")
+    for result, count in sorted(results.items()):
+        print(f"  {result}: {count}")
+
+    problems = verify(conn, args.students, fresh_student_ids, args.quota, args.requests_per_student, outcomes)
+    conn.close()
+    if problems:
+        print(f"\n{len(problems)} problem(s):")
+        for problem in problems[:50]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nNo quota violations")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Measure dashboard template compile and render time with and without caching.
+
+For admin_dashboard.html and student_dashboard.html this reports the time to
+compile the template from source, to load it from the bytecode cache in
+TEMPLATE_CACHE_DIR, and to render it with every cached fragment missing,
+with every fragment hit, and after a feedback change (one fragment
+re-rendered). The context is synthetic, sized by the options below, so the
+numbers are template cost only; importing the app still needs the MySQL
+server from the DB_* settings (the database is created if missing).
+
+    python benchmarks/template_render.py --students 50 --feedback 500 --rounds 50
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEMPLATES = ('admin_dashboard.html', 'student_dashboard.html')
+LANGUAGES = ['Python', 'Java', 'C', 'C#', 'PHP', 'JavaScript']
+PURPOSES = ['Lab exercise', 'Project work', 'Self study', 'Exam practice']
+
+
+def admin_context(rng, students, sessions, feedback, lab_rooms, now):
+    def session_row(i, status):
+        return {'id': i, 'student_id': i % students + 1, 'idno': f'2024{i:05d}', 'firstname': f'First{i}',
+                'lastname': f'Last{i}', 'course': str(i % 3 + 1), 'lab_room': rng.choice(list(lab_rooms)),
+                'date_time': now, 'duration': 1, 'programming_language': rng.choice(LANGUAGES),
+                'purpose': rng.choice(PURPOSES), 'status': status, 'check_in_time': now}
+
+    feedback_rows = [{'firstname': f'First{i}', 'lastname': f'Last{i}', 'lab_room': rng.choice(list(lab_rooms)),
+                      'rating': rng.randint(1, 5), 'comments': 'Good session ' * rng.randint(1, 8),
+                      'created_at': now} for i in range(feedback)]
+    lab_stats = [{'lab_room': lab, 'count': rng.randint(0, 500), 'percentage': rng.random() * 100,
+                  'total_hours': rng.randint(0, 900)} for lab in lab_rooms]
+    return {
+        'students': [{'id': i, 'idno': f'2024{i:05d}', 'firstname': f'First{i}', 'middlename': '',
+                      'lastname': f'Last{i}', 'course': str(i % 3 + 1), 'sessions_used': i % 30,
+                      'max_sessions': 30, 'profile_picture': None, 'profile_thumb': None}
+                     for i in range(1, students + 1)],
+        'students_next_cursor': None,
+        'student_counts': {'total': students, '1': students // 3, '2': students // 3, '3': students // 3,
+                           'other': 0},
+        'active_sessions': [session_row(i, 'approved') for i in range(sessions)],
+        'pending_sessions': [session_row(i, 'pending') for i in range(sessions)],
+        'current_sit_ins': [session_row(i, 'approved') for i in range(sessions)],
+        'recent_activity': [{'firstname': f'First{i}', 'lastname': f'Last{i}', 'lab_room': rng.choice(list(lab_rooms)),
+                             'action': 'check_in', 'timestamp': now} for i in range(10)],
+        'language_stats': [{'programming_language': lang, 'count': rng.randint(0, 500),
+                            'percentage': rng.random() * 100} for lang in LANGUAGES],
+        'lab_stats': lab_stats,
+        'feedback_stats': {'total_feedback': feedback, 'average_rating': 4.1,
+                           'positive_feedback': feedback // 2, 'negative_feedback': feedback // 10},
+        'load_feedback_list': lambda: feedback_rows,
+        'announcements': [{'id': i, 'title': f'Announcement {i}', 'content': 'Lab schedule update. ' * 10,
+                           'created_at': now, 'is_active': True} for i in range(10)],
+        'announcements_version': 'bench',
+        'lab_rooms': lab_rooms,
+    }
+
+
+def student_context(rng, sessions, feedback, labs, now):
+    return {
+        'student': {'id': 1, 'idno': '202400001', 'firstname': 'First1', 'lastname': 'Last1',
+                    'middlename': '', 'course': '1', 'year_level': '2', 'email': 'first1@example.com',
+                    'sessions_used': 5, 'max_sessions': 30, 'profile_picture': None},
+        'sessions': [{'id': i, 'lab_room': rng.choice(labs)['code'], 'date_time': now, 'duration': 1,
+                      'programming_language': rng.choice(LANGUAGES), 'purpose': rng.choice(PURPOSES),
+                      'status': 'approved'} for i in range(sessions)],
+        'page': 1,
+        'has_more_sessions': False,
+        'feedback_list': [{'lab_room': rng.choice(labs)['code'], 'rating': rng.randint(1, 5),
+                           'comments': 'Good session', 'created_at': now} for _ in range(min(feedback, 20))],
+        'announcements': [{'id': i, 'title': f'Announcement {i}', 'content': 'Lab schedule update. ' * 10,
+                           'created_at': now, 'is_active': True} for i in range(10)],
+        'announcements_version': 'bench',
+        'labs': labs,
+    }
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+def time_compile(app, name, rounds):
+    # Drop the in-memory template cache so each load goes to source or the bytecode cache
+    env = app.jinja_env
+    bytecode_cache = env.bytecode_cache
+    source, cached = [], []
+    for _ in range(rounds):
+        env.bytecode_cache = None
+        env.cache.clear()
+        started = time.perf_counter()
+        env.get_template(name)
+        source.append(time.perf_counter() - started)
+
+        env.bytecode_cache = bytecode_cache
+        env.cache.clear()
+        env.get_template(name)  # writes the bytecode file on the first round
+        env.cache.clear()
+        started = time.perf_counter()
+        env.get_template(name)
+        cached.append(time.perf_counter() - started)
+    return median_ms(source), median_ms(cached)
+
+
+def time_render(app, name, context, rounds, before):
+    import fragments
+    from flask import render_template
+
+    samples = []
+    for _ in range(rounds):
+        before(fragments)
+        started = time.perf_counter()
+        render_template(name, **context)
+        samples.append(time.perf_counter() - started)
+    return median_ms(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=50, help='roster rows on the admin dashboard')
+    parser.add_argument('--sessions', type=int, default=50, help='rows in each session table')
+    parser.add_argument('--feedback', type=int, default=500, help='rows in the admin feedback list')
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=os.environ.get('BENCH_DB_NAME', 'students_bench'))
+    args = parser.parse_args()
+
+    server = mysql.connector.connect(host=os.environ.get('DB_HOST', 'localhost'),
+                                     user=os.environ.get('DB_USER', 'root'),
+                                     password=os.environ.get('DB_PASSWORD', ''))
+    cursor = server.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+    cursor.close()
+    server.close()
+
+    # The app reads its settings at import time; keep its caches out of the way
+    template_cache_dir = tempfile.mkdtemp(prefix='template_cache_')
+    os.environ['DB_NAME'] = args.database
+    os.environ['SCHEDULER_INTERVAL'] = '0'
+    os.environ['AUTO_MIGRATE'] = '1'
+    os.environ['CACHE_BACKEND'] = 'memory'
+    os.environ['TEMPLATE_CACHE_DIR'] = template_cache_dir
+    from app import app
+    import labs
+
+    rng = random.Random(args.seed)
+    now = datetime.datetime(2024, 9, 2, 9, 30)
+    contexts = {
+        'admin_dashboard.html': (
+            {'user_type': 'admin', 'username': 'admin'},
+            admin_context(rng, args.students, args.sessions, args.feedback, labs.lab_labels(), now)),
+        'student_dashboard.html': (
+            {'user_type': 'student', 'user_id': 1, 'username': '202400001'},
+            student_context(rng, args.sessions, args.feedback, labs.get_labs(active_only=True), now)),
+    }
+
+    print(f"{args.rounds} rounds, {args.students} students, {args.sessions} sessions per table, "
+          f"{args.feedback} feedback rows; median ms\n")
+    print(f"{'template':<24} {'compile':>9} {'bytecode':>9} {'miss':>9} {'hit':>9} {'feedback':>9}")
+    try:
+        for name in TEMPLATES:
+            session_values, context = contexts[name]
+            with app.test_request_context():
+                from flask import session
+                session.update(session_values)
+                compile_ms, bytecode_ms = time_compile(app, name, args.rounds)
+                miss_ms = time_render(app, name, context, args.rounds, lambda f: f.invalidate_all())
+                hit_ms = time_render(app, name, context, args.rounds, lambda f: None)
+                feedback_ms = time_render(app, name, context, args.rounds, lambda f: f.bump('feedback'))
+            print(f"{name:<24} {compile_ms:>9.2f} {bytecode_ms:>9.2f} {miss_ms:>9.2f} {hit_ms:>9.2f} "
+                  f"{feedback_ms:>9.2f}")
+    finally:
+        shutil.rmtree(template_cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# Set-based session state changes for the admin bulk actions. Each call locks
+# the requested rows once, applies one UPDATE per table and reports a result
+# for every id; the caller owns the transaction.
+
+import quota
+
+MAX_BULK_IDS = 500
+
+# action -> live-monitor event state published for the sessions it changed
+BULK_EVENTS = {
+    'approve': 'approved',
+    'reject': 'rejected',
+    'check_out': 'checked_out',
+}
+
+
+def parse_ids(values):
+    # Accepts ints or numeric strings; keeps first-seen order and drops duplicates
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError('Session ids must be integers')
+    if not ids:
+        raise ValueError('No session ids given')
+    if len(ids) > MAX_BULK_IDS:
+        raise ValueError(f'At most {MAX_BULK_IDS} sessions can be updated at once')
+    return ids
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _lock_sessions(cursor, ids):
+    cursor.execute(f"""
+    SELECT id, student_id, status, approval_status
+    FROM sessions
+    WHERE id IN ({_placeholders(ids)})
+    FOR UPDATE
+    """, tuple(ids))
+    return {row['id']: row for row in cursor.fetchall()}
+
+
+def _results(ids, rows, eligible, reason):
+    results = []
+    for session_id in ids:
+        if session_id not in rows:
+            results.append({'id': session_id, 'ok': False, 'error': 'not_found'})
+        elif session_id in eligible:
+            results.append({'id': session_id, 'ok': True})
+        else:
+            results.append({'id': session_id, 'ok': False, 'error': reason})
+    return results
+
+
+def approve_sessions(cursor, ids):
+    rows = _lock_sessions(cursor, ids)
+    pending = [i for i in ids if i in rows and rows[i]['approval_status'] == 'pending'
+               and rows[i]['status'] != 'cancelled']
+
+    # Grant in request order per student; whatever doesn't fit the quota stays pending
+    sessions_by_student = {}
+    for session_id in pending:
+        sessions_by_student.setdefault(rows[session_id]['student_id'], []).append(session_id)
+    granted = quota.allocate(cursor, sessions_by_student)
+    approved = [i for i in pending if i in granted]
+
+    if approved:
+        cursor.execute(f"""
+        UPDATE sessions
+        SET approval_status = 'approved', status = 'active'
+        WHERE id IN ({_placeholders(approved)})
+        """, tuple(approved))
+
+    results = _results(ids, rows, approved, 'not_pending')
+    for result in results:
+        if result['id'] in pending and result['id'] not in granted:
+            result['error'] = 'quota_exceeded'
+    return approved, results
+
+
+def reject_sessions(cursor, ids):
+    rows = _lock_sessions(cursor, ids)
+    eligible = [i for i in ids if i in rows and rows[i]['approval_status'] == 'pending'
+                and rows[i]['status'] != 'cancelled']
+    if eligible:
+        cursor.execute(f"""
+        UPDATE sessions
+        SET approval_status = 'rejected', status = 'cancelled'
+        WHERE id IN ({_placeholders(eligible)})
+        """, tuple(eligible))
+    return eligible, _results(ids, rows, eligible, 'not_pending')
+
+
+def check_out_sessions(cursor, ids):
+    rows = _lock_sessions(cursor, ids)
+    eligible = [i for i in ids if i in rows and rows[i]['status'] == 'active'
+                and rows[i]['approval_status'] == 'approved']
+    if eligible:
+        cursor.execute(f"""
+        UPDATE sessions
+        SET check_out_time = NOW(), status = 'completed'
+        WHERE id IN ({_placeholders(eligible)})
+        """, tuple(eligible))
+    return eligible, _results(ids, rows, eligible, 'not_active')
+
+
+BULK_HANDLERS = {
+    'approve': approve_sessions,
+    'reject': reject_sessions,
+    'check_out': check_out_sessions,
+}
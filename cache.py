@@ -0,0 +1,127 @@
+import contextlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# Small key/value cache with TTLs. `memory` is per-process; `sqlite:///path`
+# stores entries in a local SQLite file so every worker process on the host
+# sees the same entries and invalidations.
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, expires_at) in self._data.items() if expires_at is not None and expires_at < now]:
+                del self._data[key]
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            )
+            """)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A connection per call keeps the backend safe to share between threads;
+        # it is committed (or rolled back) and closed when the block exits
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] < time.time():
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, pickle.dumps(value), expires_at))
+
+    def delete(self, *keys):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (escaped + '%',))
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+
+def create_backend(url):
+    if url == 'memory':
+        return MemoryBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    raise ValueError(f'Unknown cache backend: {url}')
+
+
+_backend = None
+
+
+def init_app(app):
+    global _backend
+    _backend = create_backend(app.config['CACHE_BACKEND'])
+    return _backend
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = MemoryBackend()
+    return _backend
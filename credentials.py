@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+import workers
+
+logger = logging.getLogger(__name__)
+
+# Password hashing for login and registration. PBKDF2 is deliberately slow,
+# so it runs in a small process pool instead of on the request thread; a
+# semaphore bounds how many hashes may be queued so a login burst gets a
+# quick "busy" answer instead of an ever-growing backlog.
+
+DEFAULT_HASH_ALGORITHM = 'sha256'
+
+
+class CredentialServiceBusy(Exception):
+    pass
+
+
+_config = {
+    'algorithm': DEFAULT_HASH_ALGORITHM,
+    'iterations': DEFAULT_PBKDF2_ITERATIONS,
+    'workers': os.cpu_count() or 1,
+    'queue_timeout': 5.0,
+}
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = None
+_dummy_hash = None
+
+
+def hash_method():
+    return f"pbkdf2:{_config['algorithm']}:{_config['iterations']}"
+
+
+def configure(iterations=None, workers=None, queue_limit=None, queue_timeout=None,
+              algorithm=None):
+    global _slots, _dummy_hash
+    if iterations is not None:
+        _config['iterations'] = iterations
+    if workers is not None:
+        _config['workers'] = workers
+    if algorithm is not None:
+        _config['algorithm'] = algorithm
+    if queue_timeout is not None:
+        _config['queue_timeout'] = queue_timeout
+    shutdown()
+    # Up to `queue_limit` hashes may be running or waiting at once
+    _slots = threading.BoundedSemaphore(queue_limit or max(_config['workers'], 1) * 4)
+    # Verified against when the username doesn't exist, so unknown users cost the same
+    _dummy_hash = generate_password_hash(os.urandom(16).hex(), method=hash_method())
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _config['workers'] <= 0:
+        return None
+    # A pool inherited through a preforking server's fork belongs to the parent process
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                # Not forked from here: a fork of this multithreaded process could inherit
+                # locks (DB pool, logging, the sweeper) held by other threads and deadlock
+                _executor = ProcessPoolExecutor(max_workers=_config['workers'],
+                                                mp_context=workers.mp_context())
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _run(fn, *args):
+    if _slots is None:
+        configure()
+    if not _slots.acquire(timeout=_config['queue_timeout']):
+        raise CredentialServiceBusy('Too many sign-ins right now, please try again in a moment')
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return fn(*args)
+        return executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(stored_hash, password):
+    """Check `password` against `stored_hash`; pass None for an unknown user.
+
+    Unknown users are checked against a dummy hash with the current cost so
+    the response time doesn't reveal whether the username exists.
+    """
+    if not stored_hash:
+        _run(check_password_hash, _dummy_hash, password)
+        return False
+    return _run(check_password_hash, stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    # Hashes look like "pbkdf2:sha256:260000$salt$hash"
+    method = stored_hash.split('$', 1)[0]
+    return method != hash_method()
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def init_app(app):
+    configure(
+        iterations=app.config['PASSWORD_HASH_ITERATIONS'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        queue_limit=app.config['PASSWORD_HASH_QUEUE'] or None,
+    )
@@ -0,0 +1,271 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+# Called as observer(statement, seconds) after every statement on a pooled cursor
+_query_observer = None
+
+
+def set_query_observer(observer):
+    global _query_observer
+    _query_observer = observer
+
+
+class InstrumentedCursor:
+    # Times execute()/executemany() and reports them to the query observer;
+    # everything else is passed through to the real cursor.
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, operation, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(operation, *args, **kwargs)
+        finally:
+            self._observer(operation, time.perf_counter() - start)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, *args, **kwargs)
+
+
+class PooledConnection:
+    # Thin proxy around a MySQL connection; close() hands it back to the pool
+    # instead of tearing down the socket, so existing `conn.close()` calls keep working.
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._connection.cursor(*args, **kwargs)
+        if _query_observer is None:
+            return cursor
+        return InstrumentedCursor(cursor, _query_observer)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.release(self._connection)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, config, size=10, timeout=10.0, ping_interval=30.0):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        # Connections idle for longer than this are pinged before being handed out
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._counters = {
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'checkouts': 0,
+            'checkout_timeouts': 0,
+            'health_check_failures': 0,
+            'in_use': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'checkout_seconds_total': 0.0,
+            'checkout_seconds_max': 0.0,
+        }
+
+    def connect(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._counters['checkout_timeouts'] += 1
+            raise PoolExhaustedError(
+                f"No database connection available after {self.timeout}s (pool size {self.size})")
+        waited = time.perf_counter() - start
+
+        try:
+            connection = self._take_idle() or self._new_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            counters = self._counters
+            counters['checkouts'] += 1
+            counters['in_use'] += 1
+            counters['wait_seconds_total'] += waited
+            counters['wait_seconds_max'] = max(counters['wait_seconds_max'], waited)
+            counters['checkout_seconds_total'] += elapsed
+            counters['checkout_seconds_max'] = max(counters['checkout_seconds_max'], elapsed)
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        try:
+            # A cursor abandoned mid-result (e.g. a streamed export whose client went away)
+            # leaves rows on the wire; reconnecting is cheaper than draining them
+            if connection.unread_result:
+                self._discard(connection)
+                return
+            # Never hand the next request an open transaction or a stale snapshot
+            if connection.in_transaction:
+                connection.rollback()
+            self._idle.put((connection, time.monotonic()))
+        except Exception as e:
+            logger.warning("Discarding broken database connection: %s", e)
+            self._discard(connection)
+        finally:
+            with self._lock:
+                self._counters['in_use'] -= 1
+            self._slots.release()
+
+    def _take_idle(self):
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if time.monotonic() - last_used < self.ping_interval:
+                return connection
+            try:
+                connection.ping(reconnect=False)
+                return connection
+            except Exception:
+                with self._lock:
+                    self._counters['health_check_failures'] += 1
+                self._discard(connection)
+
+    def _new_connection(self):
+        connection = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._counters['connections_created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self._counters['connections_discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+
+_pool = None
+
+
+def ensure_database(config):
+    # Create the database itself; runs once at startup, never on the request path
+    server_config = {k: v for k, v in config.items() if k != 'database'}
+    connection = mysql.connector.connect(**server_config)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{config['database']}`")
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def db_config_from_app(app):
+    return {
+        'host': app.config['DB_HOST'],
+        'user': app.config['DB_USER'],
+        'password': app.config['DB_PASSWORD'],
+        'database': app.config['DB_NAME'],
+    }
+
+
+def init_app(app):
+    global _pool
+    config = db_config_from_app(app)
+    ensure_database(config)
+    _pool = ConnectionPool(
+        config,
+        size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+    )
+    app.teardown_appcontext(close_request_connections)
+    return _pool
+
+
+def get_pool():
+    if _pool is None:
+        raise RuntimeError("Database pool is not initialised; call db.init_app(app) first")
+    return _pool
+
+
+def get_db_connection():
+    try:
+        connection = get_pool().connect()
+    except Exception as e:
+        logger.error("Database connection error: %s", e)
+        raise
+    # Track per-request checkouts so teardown can return anything a route forgot to close
+    if has_app_context():
+        g.setdefault('_db_connections', []).append(connection)
+    return connection
+
+
+@contextmanager
+def connection_cursor(dictionary=False):
+    # with connection_cursor() as (conn, cursor): ... -- both are released however the block exits
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=dictionary)
+    try:
+        yield conn, cursor
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def close_request_connections(exc=None):
+    for connection in g.pop('_db_connections', []):
+        connection.close()
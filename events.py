@@ -0,0 +1,176 @@
+import collections
+import json
+import os
+import queue
+import threading
+import time
+
+from db import get_db_connection
+
+# In-process publish/subscribe hub behind the admin live monitor. Each
+# connected admin page holds one subscriber, and with it one worker thread,
+# so streams are capped in number and end after SSE_MAX_STREAM_SECONDS; the
+# browser then reconnects with Last-Event-ID and is sent what it missed.
+# Events only reach pages connected to the same worker process that handled
+# the write.
+
+SESSION_EVENT_STATES = ('requested', 'approved', 'rejected', 'checked_in', 'checked_out',
+                        'completed', 'cancelled', 'no_show')
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, max_queue_size):
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.closed = False
+
+
+class EventHub:
+    def __init__(self, max_queue_size=100, max_subscribers=10, max_lifetime=300, history_size=200):
+        self.max_queue_size = max_queue_size
+        self.max_subscribers = max_subscribers
+        # Seconds before a stream is closed so its thread is returned to the server
+        self.max_lifetime = max_lifetime
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # Recent (sequence, message) pairs replayed to reconnecting clients
+        self._history = collections.deque(maxlen=history_size)
+        self._sequence = 0
+        # Event ids from another process (or before a restart) mean nothing here
+        self._epoch = os.urandom(4).hex()
+        self._ever_subscribed = False
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber; returns it with the messages it missed since last_event_id."""
+        missed_after = self._sequence_of(last_event_id)
+        subscriber = Subscriber(self.max_queue_size)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"{len(self._subscribers)} live streams already open")
+            self._subscribers.add(subscriber)
+            self._ever_subscribed = True
+            missed = [] if missed_after is None else [
+                message for sequence, message in self._history if sequence > missed_after]
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        subscriber.closed = True
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def needs_events(self):
+        # Once a page has connected it holds an id from this epoch and may reconnect
+        # (e.g. after max_lifetime) asking for a replay, so events keep going into the
+        # history even while nobody is connected; before that no replay is possible
+        return self._ever_subscribed
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _sequence_of(self, event_id):
+        epoch, _, sequence = (event_id or '').partition('-')
+        if epoch != self._epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, event, data):
+        with self._lock:
+            self._sequence += 1
+            message = format_sse(event, data, f'{self._epoch}-{self._sequence}')
+            self._history.append((self._sequence, message))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                # Client stopped reading; drop it and let the browser reconnect
+                self.unsubscribe(subscriber)
+
+    def stream(self, subscriber, missed=(), heartbeat=15):
+        deadline = time.monotonic() + self.max_lifetime
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield 'retry: 3000\n\n'
+            yield from missed
+            while not subscriber.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    yield subscriber.queue.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def format_sse(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id else ''
+    return f"{prefix}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+hub = EventHub()
+
+
+def init_app(app):
+    hub.max_subscribers = app.config['SSE_MAX_SUBSCRIBERS']
+    hub.max_lifetime = app.config['SSE_MAX_STREAM_SECONDS']
+
+
+def load_session_events(session_ids):
+    # One query for any number of sessions; returns {session_id: payload}
+    if not session_ids:
+        return {}
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+        SELECT s.id, s.student_id, s.lab_room, s.date_time, s.duration, s.programming_language, s.purpose,
+               s.status, s.approval_status, s.check_in_time, s.check_out_time,
+               st.firstname, st.lastname, st.idno, st.course
+        FROM sessions s
+        JOIN students st ON s.student_id = st.id
+        WHERE s.id IN ({', '.join(['%s'] * len(session_ids))})
+        """, tuple(session_ids))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    for row in rows:
+        for column in ('date_time', 'check_in_time', 'check_out_time'):
+            if row[column] is not None:
+                row[column] = row[column].strftime('%Y-%m-%d %H:%M')
+    return {row['id']: row for row in rows}
+
+
+def load_session_event(session_id):
+    return load_session_events([session_id]).get(session_id)
+
+
+def publish_session_event(state, session_id, force=False):
+    # Skips the lookup entirely while no page can ask for the event, unless the caller needs the payload
+    if not force and not hub.needs_events():
+        return None
+    payload = load_session_event(session_id)
+    if payload:
+        payload['state'] = state
+        hub.publish('session', payload)
+    return payload
+
+
+def publish_session_events(state, session_ids, force=False):
+    if not force and not hub.needs_events():
+        return []
+    payloads = load_session_events(session_ids)
+    published = []
+    for session_id in session_ids:
+        payload = payloads.get(session_id)
+        if payload:
+            payload['state'] = state
+            hub.publish('session', payload)
+            published.append(payload)
+    return published
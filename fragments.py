@@ -0,0 +1,102 @@
+import hashlib
+import os
+import pickle
+import time
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+import cache
+
+# Template fragment caching for the dashboards. Wrap a block in
+#
+#     {% cache 'name', data_version(rows), fragment_version('feedback') %} ... {% endcache %}
+#
+# and its rendered HTML is reused until one of the version values changes.
+# data_version() hashes data the view already loaded; fragment_version(name)
+# is a token that writers move on with bump(name), for data the template only
+# loads on a miss. Fragments live in the cache backend, so with per-process
+# memory caches a bump reaches other workers only after FRAGMENT_CACHE_TTL.
+# Compiled templates are kept in TEMPLATE_CACHE_DIR across restarts.
+
+CACHE_PREFIX = 'fragment:'
+VERSION_PREFIX = 'fragment_version:'
+_ttl = 300
+_next_purge = 0
+
+# Old fragments expire but memory backends only drop them when read; sweep this often
+PURGE_INTERVAL = 600
+
+
+def data_version(*values):
+    return hashlib.sha1(pickle.dumps(values)).hexdigest()[:16]
+
+
+def fragment_version(name):
+    backend = cache.get_backend()
+    version = backend.get(VERSION_PREFIX + name)
+    if version is None:
+        version = os.urandom(8).hex()
+        backend.set(VERSION_PREFIX + name, version, None)
+    return version
+
+
+def bump(name):
+    # Call after committing a change to the data behind fragments keyed on fragment_version(name)
+    cache.get_backend().delete(VERSION_PREFIX + name)
+
+
+def invalidate_all():
+    cache.get_backend().delete_prefix(CACHE_PREFIX)
+
+
+def _purge_expired(backend):
+    global _next_purge
+    if time.time() >= _next_purge:
+        _next_purge = time.time() + PURGE_INTERVAL
+        backend.purge_expired()
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_namespace='')
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render_fragment', [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, parts, caller):
+        name, versions = parts[0], parts[1:]
+        key = f'{CACHE_PREFIX}{self.environment.fragment_namespace}:{name}:{data_version(*versions)}'
+        backend = cache.get_backend()
+        html = backend.get(key)
+        if html is None:
+            _purge_expired(backend)
+            html = str(caller())
+            backend.set(key, html, _ttl)
+        # Rendered (and escaped) by this template on a miss, so it is safe markup
+        return Markup(html)
+
+
+def init_app(app):
+    global _ttl
+    _ttl = app.config['FRAGMENT_CACHE_TTL']
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    # Fragments rendered by older template code must not be reused after a deploy
+    app.jinja_env.fragment_namespace = data_version(
+        sorted((name, os.path.getmtime(os.path.join(app.root_path, app.template_folder, name)))
+               for name in os.listdir(os.path.join(app.root_path, app.template_folder))))
+    app.jinja_env.globals.update(data_version=data_version, fragment_version=fragment_version)
+
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
@@ -0,0 +1,241 @@
+import datetime
+
+import click
+
+import cache
+from db import get_db_connection
+
+# Lab rooms, their seat capacities and the availability engine behind
+# reservations. Availability is answered with one range scan on
+# sessions(lab_room, date_time) plus an in-memory sweep over the handful of
+# reservations it returns, so a check costs the same however long the history is.
+
+CACHE_KEY = 'labs:all'
+CACHE_TTL = 600
+
+# The longest session add_session accepts; bounds how far back the range scan looks
+MAX_DURATION_HOURS = 4
+SLOT_MINUTES = 30
+
+# Sessions in these states hold a seat for their whole booked time
+HOLDING_CONDITION = "status IN ('pending', 'active') AND approval_status IN ('pending', 'approved')"
+
+# (code, room number) for the rooms the app shipped with
+DEFAULT_LABS = [(f'Lab {n}', str(522 + 2 * n)) for n in range(1, 12)]
+
+
+class AvailabilityError(Exception):
+    pass
+
+
+def _time(value):
+    # MySQL TIME columns come back as timedelta
+    if isinstance(value, datetime.timedelta):
+        return (datetime.datetime.min + value).time()
+    return value
+
+
+def _load():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+        SELECT code, room, capacity, opens_at, closes_at, is_active
+        FROM labs
+        ORDER BY sort_order, code
+        """)
+        labs = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    for lab in labs:
+        lab['opens_at'] = _time(lab['opens_at'])
+        lab['closes_at'] = _time(lab['closes_at'])
+        lab['is_active'] = bool(lab['is_active'])
+        lab['name'] = f"Lab {lab['room']}"
+        lab['label'] = f"Lab {lab['room']} ({lab['code']})"
+    return labs
+
+
+def get_labs(active_only=False):
+    backend = cache.get_backend()
+    labs = backend.get(CACHE_KEY)
+    if labs is None:
+        labs = _load()
+        backend.set(CACHE_KEY, labs, CACHE_TTL)
+    if active_only:
+        return [lab for lab in labs if lab['is_active']]
+    return labs
+
+
+def get_lab(code):
+    for lab in get_labs():
+        if lab['code'] == code:
+            return lab
+    return None
+
+
+def lab_codes():
+    return [lab['code'] for lab in get_labs()]
+
+
+def lab_labels():
+    # code -> "Lab 524 (Lab 1)", for reports and the admin dashboard
+    return {lab['code']: lab['label'] for lab in get_labs()}
+
+
+def invalidate():
+    cache.get_backend().delete(CACHE_KEY)
+
+
+def _holding_sessions(cursor, code, start, end):
+    # Uses idx_sessions_lab_date: everything that could overlap [start, end) began
+    # at most MAX_DURATION_HOURS before `start`
+    cursor.execute(f"""
+    SELECT date_time, duration FROM sessions
+    WHERE lab_room = %s
+      AND date_time >= %s AND date_time < %s
+      AND date_time + INTERVAL duration HOUR > %s
+      AND {HOLDING_CONDITION}
+    """, (code, start - datetime.timedelta(hours=MAX_DURATION_HOURS), end, start))
+    return [(_value(row, 'date_time', 0), _value(row, 'duration', 1)) for row in cursor.fetchall()]
+
+
+def _value(row, column, index):
+    return row[column] if isinstance(row, dict) else row[index]
+
+
+def peak_occupancy(intervals, start, end):
+    """Most reservations overlapping at any instant inside [start, end).
+
+    Sweep line over the clipped intervals; ends sort before starts at the
+    same instant so back-to-back bookings don't count as overlapping.
+    """
+    points = []
+    for begin, hours in intervals:
+        finish = begin + datetime.timedelta(hours=hours)
+        begin, finish = max(begin, start), min(finish, end)
+        if begin < finish:
+            points.append((begin, 1))
+            points.append((finish, -1))
+    points.sort(key=lambda point: (point[0], point[1]))
+    current = peak = 0
+    for _, delta in points:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def _validate(lab, start, duration):
+    if lab is None or not lab['is_active']:
+        raise AvailabilityError('Unknown laboratory room')
+    if not 1 <= duration <= MAX_DURATION_HOURS:
+        raise AvailabilityError(f'Sessions can last between 1 and {MAX_DURATION_HOURS} hours')
+    end = start + datetime.timedelta(hours=duration)
+    if start.time() < lab['opens_at'] or end.date() != start.date() or end.time() > lab['closes_at']:
+        raise AvailabilityError(f"{lab['name']} is open from {lab['opens_at'].strftime('%H:%M')} "
+                                f"to {lab['closes_at'].strftime('%H:%M')}")
+    return end
+
+
+def free_seats(cursor, code, start, duration):
+    """Seats still free in lab `code` for the whole of [start, start + duration hours)."""
+    lab = get_lab(code)
+    end = _validate(lab, start, duration)
+    return lab['capacity'] - peak_occupancy(_holding_sessions(cursor, code, start, end), start, end)
+
+
+def reserve_seat(cursor, code, start, duration):
+    """Check a new booking fits, holding the lab's row lock until the caller commits.
+
+    The lock serialises bookings for one lab only, so two students can't both
+    take its last seat while other labs stay unaffected.
+    """
+    cursor.execute("SELECT capacity FROM labs WHERE code = %s FOR UPDATE", (code,))
+    if cursor.fetchone() is None:
+        raise AvailabilityError('Unknown laboratory room')
+    seats = free_seats(cursor, code, start, duration)
+    if seats <= 0:
+        raise AvailabilityError('No free seats in that lab for the selected time')
+    return seats
+
+
+def free_slots(cursor, code, day, duration=1, step_minutes=SLOT_MINUTES):
+    """Start times on `day` with at least one free seat for `duration` hours.
+
+    One range query fetches the day's reservations; each candidate slot is
+    then answered from memory.
+    """
+    lab = get_lab(code)
+    if lab is None or not lab['is_active']:
+        raise AvailabilityError('Unknown laboratory room')
+    opens = datetime.datetime.combine(day, lab['opens_at'])
+    closes = datetime.datetime.combine(day, lab['closes_at'])
+    intervals = _holding_sessions(cursor, code, opens, closes)
+
+    slots = []
+    start = opens
+    length = datetime.timedelta(hours=duration)
+    while start + length <= closes:
+        seats = lab['capacity'] - peak_occupancy(intervals, start, start + length)
+        if seats > 0:
+            slots.append({
+                'start': start.strftime('%Y-%m-%dT%H:%M'),
+                'label': f"{start.strftime('%I:%M %p')} - {(start + length).strftime('%I:%M %p')}",
+                'free_seats': seats
+            })
+        start += datetime.timedelta(minutes=step_minutes)
+    return {'lab': code, 'capacity': lab['capacity'], 'slots': slots}
+
+
+@click.group('labs')
+def labs_cli():
+    """Lab rooms and seat capacities."""
+
+
+@labs_cli.command('list')
+def list_command():
+    """Show every lab with its capacity and opening hours."""
+    for lab in _load():
+        state = '' if lab['is_active'] else ' (inactive)'
+        click.echo(f"{lab['code']:8} {lab['label']:20} {lab['capacity']:4} seats  "
+                   f"{lab['opens_at'].strftime('%H:%M')}-{lab['closes_at'].strftime('%H:%M')}{state}")
+
+
+@labs_cli.command('set')
+@click.argument('code')
+@click.option('--room', help='Room number shown to users, e.g. 524')
+@click.option('--capacity', type=int)
+@click.option('--opens', help='HH:MM')
+@click.option('--closes', help='HH:MM')
+@click.option('--active/--inactive', default=None)
+def set_command(code, room, capacity, opens, closes, active):
+    """Add a lab or change its settings."""
+    changes = {'room': room, 'capacity': capacity, 'opens_at': opens, 'closes_at': closes,
+               'is_active': active}
+    changes = {column: value for column, value in changes.items() if value is not None}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM labs WHERE code = %s", (code,))
+        if cursor.fetchone() is None:
+            if 'room' not in changes:
+                raise click.UsageError('--room is required when adding a lab')
+            cursor.execute("SELECT COALESCE(MAX(sort_order), 0) + 1 FROM labs")
+            changes['sort_order'] = cursor.fetchone()[0]
+            columns = ['code'] + list(changes)
+            cursor.execute(f"INSERT INTO labs ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                           (code,) + tuple(changes.values()))
+        elif changes:
+            assignments = ', '.join(f"{column} = %s" for column in changes)
+            cursor.execute(f"UPDATE labs SET {assignments} WHERE code = %s", tuple(changes.values()) + (code,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    invalidate()
+    click.echo(f"Saved {code}")
+
+
+def init_app(app):
+    app.cli.add_command(labs_cli)
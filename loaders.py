@@ -0,0 +1,71 @@
+# Batched read paths for the student pages: each loader costs a fixed number
+# of queries no matter how long a student's history is.
+
+STUDENT_COLUMNS = ['id', 'idno', 'lastname', 'firstname', 'middlename', 'course', 'year_level',
+                   'email', 'profile_picture', 'sessions_used', 'max_sessions']
+
+SESSION_PAGE_SIZE = 20
+RECENT_FEEDBACK_LIMIT = 10
+
+
+def load_student_with_feedback(cursor, student_id, feedback_limit=RECENT_FEEDBACK_LIMIT):
+    # One query: the student row joined to their most recent feedback (one row per feedback entry)
+    columns = ', '.join(f'st.{column}' for column in STUDENT_COLUMNS)
+    cursor.execute(f"""
+    SELECT {columns},
+           f.id AS feedback_id, f.rating, f.comments, f.created_at AS feedback_created_at, f.lab_room AS feedback_lab_room
+    FROM students st
+    LEFT JOIN (
+        SELECT f.id, f.student_id, f.rating, f.comments, f.created_at, s.lab_room
+        FROM feedback f
+        JOIN sessions s ON f.session_id = s.id
+        WHERE f.student_id = %s
+        ORDER BY f.created_at DESC
+        LIMIT %s
+    ) f ON f.student_id = st.id
+    WHERE st.id = %s
+    ORDER BY f.created_at DESC
+    """, (student_id, feedback_limit, student_id))
+    rows = cursor.fetchall()
+    if not rows:
+        return None, []
+
+    student = {column: rows[0][column] for column in STUDENT_COLUMNS}
+    feedback_list = [{
+        'id': row['feedback_id'],
+        'rating': row['rating'],
+        'comments': row['comments'],
+        'created_at': row['feedback_created_at'],
+        'lab_room': row['feedback_lab_room']
+    } for row in rows if row['feedback_id'] is not None]
+    return student, feedback_list
+
+
+def load_session_page(cursor, student_id, page=1, page_size=SESSION_PAGE_SIZE):
+    # One query per page; fetches an extra row to tell whether an older page exists
+    page = max(1, page)
+    cursor.execute("""
+    SELECT id, lab_room, date_time, duration, programming_language, purpose, status,
+           approval_status, check_in_time, check_out_time, created_at
+    FROM sessions
+    WHERE student_id = %s
+    ORDER BY date_time DESC, id DESC
+    LIMIT %s OFFSET %s
+    """, (student_id, page_size + 1, (page - 1) * page_size))
+    sessions = cursor.fetchall()
+    has_more = len(sessions) > page_size
+    return sessions[:page_size], has_more
+
+
+def load_student_dashboard(cursor, student_id, page=1):
+    student, feedback_list = load_student_with_feedback(cursor, student_id)
+    if not student:
+        return None
+    sessions, has_more = load_session_page(cursor, student_id, page)
+    return {
+        'student': student,
+        'feedback_list': feedback_list,
+        'sessions': sessions,
+        'page': page,
+        'has_more_sessions': has_more
+    }
@@ -0,0 +1,234 @@
+import ipaddress
+import logging
+import re
+import threading
+import time
+
+from flask import Response, abort, current_app, g, has_request_context, request, session
+
+import db
+import profiling
+import scheduler
+
+slow_query_logger = logging.getLogger('slow_queries')
+
+# Request and SQL instrumentation. Every pooled cursor reports each statement
+# here; the counts and time are kept on `g` for the current request and folded
+# into per-endpoint histograms when the response goes out. Everything is
+# exported as Prometheus text at /metrics. Counters are per worker process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_config = {'slow_query_seconds': 0.5}
+
+STATEMENT_VERB = re.compile(r'^\s*(\w+)')
+WHITESPACE = re.compile(r'\s+')
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for label_values, (counts, total, count) in series:
+            pairs = list(zip(self.labels, label_values))
+            labels = _labels(pairs)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_labels(pairs, le=_number(bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(pairs, le="+Inf")} {count}')
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_labels(list(zip(self.labels, label_values)))} {_number(value)}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, **extra):
+    items = [f'{name}="{_escape(value)}"' for name, value in pairs + list(extra.items())]
+    return '{' + ','.join(items) + '}' if items else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request', LATENCY_BUCKETS, ('endpoint', 'method'))
+request_queries = Histogram(
+    'http_request_queries', 'SQL statements run per request', QUERY_COUNT_BUCKETS, ('endpoint',))
+request_db_duration = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request', LATENCY_BUCKETS, ('endpoint',))
+requests_total = Counter('http_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+query_duration = Histogram('db_query_duration_seconds', 'SQL statement latency', LATENCY_BUCKETS, ('verb',))
+slow_queries_total = Counter('db_slow_queries_total', 'SQL statements slower than the slow-query threshold', ('endpoint',))
+
+REQUEST_METRICS = [request_duration, request_queries, request_db_duration, requests_total, query_duration,
+                   slow_queries_total]
+
+
+def record_query(statement, seconds):
+    """Called by db.InstrumentedCursor after every statement."""
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8', 'replace')
+    match = STATEMENT_VERB.match(statement or '')
+    query_duration.observe(seconds, match.group(1).upper() if match else 'OTHER')
+
+    endpoint = None
+    if has_request_context():
+        g._query_count = g.get('_query_count', 0) + 1
+        g._query_seconds = g.get('_query_seconds', 0.0) + seconds
+        profiling.record_query(seconds)
+        endpoint = request.endpoint or 'unmatched'
+
+    if seconds >= _config['slow_query_seconds']:
+        slow_queries_total.inc(endpoint or 'background')
+        # Statement text only; parameters can hold passwords and personal data
+        slow_query_logger.warning('%.3fs %s: %s', seconds, endpoint or 'background',
+                                  WHITESPACE.sub(' ', statement).strip()[:1000])
+
+
+def _start_timer():
+    g._request_started = time.perf_counter()
+    g._query_count = 0
+    g._query_seconds = 0.0
+
+
+def _record_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    queries = g.get('_query_count', 0)
+    db_seconds = g.get('_query_seconds', 0.0)
+
+    request_duration.observe(elapsed, endpoint, request.method)
+    request_queries.observe(queries, endpoint)
+    request_db_duration.observe(db_seconds, endpoint)
+    requests_total.inc(endpoint, request.method, str(response.status_code))
+
+    # Lets browser dev tools show the SQL share of each response
+    response.headers['Server-Timing'] = (
+        f'db;dur={db_seconds * 1000:.1f};desc="{queries} queries", app;dur={elapsed * 1000:.1f}')
+    return response
+
+
+def _gauge(name, help_text, value):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {_number(value)}']
+
+
+def _pool_lines():
+    try:
+        pool = db.get_pool().stats()
+    except RuntimeError:
+        return []
+    lines = []
+    lines += _gauge('db_pool_size', 'Configured connection pool size', pool['size'])
+    lines += _gauge('db_pool_in_use', 'Connections checked out', pool['in_use'])
+    lines += _gauge('db_pool_idle', 'Idle pooled connections', pool['idle'])
+    for key in ('connections_created', 'connections_discarded', 'checkouts', 'checkout_timeouts',
+                'health_check_failures', 'wait_seconds_total', 'checkout_seconds_total'):
+        name = f'db_pool_{key}' if key.endswith('_total') else f'db_pool_{key}_total'
+        lines += [f'# HELP {name} Connection pool {key.replace("_", " ")}', f'# TYPE {name} counter',
+                  f'{name} {_number(pool[key])}']
+    return lines
+
+
+def _scheduler_lines():
+    snapshot = scheduler.sweep_stats.snapshot()
+    lines = []
+    for key in ('sweeps', 'skipped', 'errors'):
+        name = f'scheduler_{key}_total'
+        lines += [f'# HELP {name} Background sweeps {key}', f'# TYPE {name} counter', f'{name} {snapshot[key]}']
+    lines += ['# HELP scheduler_rows_total Rows changed by the background sweep',
+              '# TYPE scheduler_rows_total counter']
+    for rule, count in sorted(snapshot['rows_total'].items()):
+        lines.append(f'scheduler_rows_total{_labels([("rule", rule)])} {count}')
+    return lines
+
+
+def render():
+    lines = []
+    for metric in REQUEST_METRICS:
+        lines += metric.render()
+    lines += _pool_lines()
+    lines += _scheduler_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def _allowed():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        return request.headers.get('Authorization') == f'Bearer {token}'
+    if session.get('user_type') == 'admin':
+        return True
+    # Without a token only scrapers on the same host may read the metrics
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def metrics_view():
+    if not _allowed():
+        abort(403)
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    _config['slow_query_seconds'] = app.config['SLOW_QUERY_SECONDS']
+    if app.config['SLOW_QUERY_LOG']:
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+    db.set_query_observer(record_query)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
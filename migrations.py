@@ -0,0 +1,453 @@
+import logging
+
+import click
+from werkzeug.security import generate_password_hash
+
+from db import get_db_connection
+from schema import schema_cache
+
+logger = logging.getLogger(__name__)
+
+# Ordered list of (version, description, function); each function receives a plain cursor
+MIGRATIONS = []
+
+# Advisory lock name so several workers booting at once don't migrate concurrently
+MIGRATION_LOCK = 'sitin_schema_migrations'
+
+
+def migration(version, description):
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def _existing_columns(cursor, table):
+    cursor.execute("""
+    SELECT COLUMN_NAME FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+@migration(1, 'Create base tables')
+def create_base_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS students (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        idno VARCHAR(20) UNIQUE NOT NULL,
+        lastname VARCHAR(50) NOT NULL,
+        firstname VARCHAR(50) NOT NULL,
+        middlename VARCHAR(50),
+        course VARCHAR(100) NOT NULL,
+        year_level VARCHAR(20) NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        profile_picture VARCHAR(255) DEFAULT 'default.jpg',
+        sessions_used INT DEFAULT 0,
+        max_sessions INT DEFAULT 25,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS admins (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id INT NOT NULL,
+        lab_room VARCHAR(50) NOT NULL,
+        date_time DATETIME NOT NULL,
+        duration INT NOT NULL,
+        programming_language VARCHAR(50),
+        purpose TEXT,
+        status VARCHAR(20) DEFAULT 'pending',
+        approval_status VARCHAR(20) DEFAULT 'pending',
+        check_in_time DATETIME,
+        check_out_time DATETIME,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        session_id INT NOT NULL,
+        student_id INT NOT NULL,
+        rating INT NOT NULL, /* 1-5 star rating */
+        comments TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
+        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS announcements (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        title VARCHAR(100) NOT NULL,
+        content TEXT NOT NULL,
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS programming_languages (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50) UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+@migration(2, 'Add columns missing from databases created before migrations')
+def add_legacy_columns(cursor):
+    legacy_columns = {
+        'students': [
+            ('sessions_used', 'INT DEFAULT 0'),
+            ('max_sessions', 'INT DEFAULT 25'),
+        ],
+        'sessions': [
+            ('approval_status', "VARCHAR(20) DEFAULT 'pending'"),
+            ('programming_language', 'VARCHAR(50)'),
+            ('purpose', 'TEXT'),
+            ('check_in_time', 'DATETIME'),
+            ('check_out_time', 'DATETIME'),
+        ],
+    }
+    for table, columns in legacy_columns.items():
+        existing = _existing_columns(cursor, table)
+        for name, definition in columns:
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+@migration(3, 'Seed default programming languages and admin account')
+def seed_defaults(cursor):
+    default_languages = ['PHP', 'Java', 'Python', 'JavaScript', 'C++', 'C#', 'Ruby', 'Swift']
+    cursor.executemany("INSERT IGNORE INTO programming_languages (name) VALUES (%s)",
+                       [(language,) for language in default_languages])
+
+    cursor.execute("SELECT id FROM admins WHERE username = 'admin'")
+    if not cursor.fetchone():
+        cursor.execute("INSERT INTO admins (username, password) VALUES (%s, %s)",
+                       ('admin', generate_password_hash('admin')))
+
+
+@migration(4, 'Set max_sessions from course for existing students')
+def normalise_max_sessions(cursor):
+    # BSIT (1), BSCS (2), BSCE (3) get 30 sessions, others get 25
+    cursor.execute("""
+    UPDATE students
+    SET max_sessions = CASE
+        WHEN course IN ('1', '2', '3') THEN 30
+        ELSE 25
+    END
+    WHERE max_sessions IS NULL OR (course IN ('1', '2', '3') AND max_sessions = 25) OR (course NOT IN ('1', '2', '3') AND max_sessions = 30)
+    """)
+
+
+# Migrations keep their own copies of DDL and backfills: a migration must do
+# the same thing on every database, however the live helpers change later.
+
+def _rebuild_stats(cursor):
+    # stats.rebuild as of migration 5
+    cursor.execute("DELETE FROM stats_language")
+    cursor.execute("""
+    INSERT INTO stats_language (programming_language, session_count)
+    SELECT programming_language, COUNT(*)
+    FROM sessions
+    WHERE programming_language IS NOT NULL
+    GROUP BY programming_language
+    """)
+    cursor.execute("DELETE FROM stats_lab")
+    cursor.execute("""
+    INSERT INTO stats_lab (lab_room, session_count, total_hours)
+    SELECT lab_room, COUNT(*), COALESCE(SUM(duration), 0)
+    FROM sessions
+    GROUP BY lab_room
+    """)
+    cursor.execute("DELETE FROM stats_feedback")
+    cursor.execute("""
+    INSERT INTO stats_feedback (id, total_feedback, rating_sum, positive_feedback, negative_feedback)
+    SELECT 1, COUNT(*), COALESCE(SUM(rating), 0),
+           COALESCE(SUM(CASE WHEN rating >= 4 THEN 1 ELSE 0 END), 0),
+           COALESCE(SUM(CASE WHEN rating <= 2 THEN 1 ELSE 0 END), 0)
+    FROM feedback
+    """)
+
+
+@migration(5, 'Add dashboard statistics summary tables')
+def add_stats_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stats_language (
+        programming_language VARCHAR(50) PRIMARY KEY,
+        session_count INT NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stats_lab (
+        lab_room VARCHAR(50) PRIMARY KEY,
+        session_count INT NOT NULL DEFAULT 0,
+        total_hours INT NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stats_feedback (
+        id TINYINT PRIMARY KEY,
+        total_feedback INT NOT NULL DEFAULT 0,
+        rating_sum INT NOT NULL DEFAULT 0,
+        positive_feedback INT NOT NULL DEFAULT 0,
+        negative_feedback INT NOT NULL DEFAULT 0
+    )
+    ''')
+    _rebuild_stats(cursor)
+
+
+# Indexes for the dashboard, export and feedback query patterns: (table, name, columns, unique)
+MANAGED_INDEXES = [
+    ('sessions', 'idx_sessions_status_approval_date', ['status', 'approval_status', 'date_time'], False),
+    ('sessions', 'idx_sessions_approval_date', ['approval_status', 'date_time'], False),
+    ('sessions', 'idx_sessions_student_date', ['student_id', 'date_time'], False),
+    ('sessions', 'idx_sessions_checkout_checkin', ['check_out_time', 'check_in_time'], False),
+    ('sessions', 'idx_sessions_checkin', ['check_in_time'], False),
+    ('sessions', 'idx_sessions_created', ['created_at'], False),
+    ('sessions', 'idx_sessions_date', ['date_time'], False),
+    ('feedback', 'uq_feedback_session_student', ['session_id', 'student_id'], True),
+    ('feedback', 'idx_feedback_created', ['created_at'], False),
+    ('students', 'idx_students_name', ['lastname', 'firstname'], False),
+    ('students', 'idx_students_course_name', ['course', 'lastname', 'firstname'], False),
+]
+
+
+def _existing_indexes(cursor, table):
+    cursor.execute("""
+    SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_indexes(cursor, indexes):
+    for table, name, columns, unique in indexes:
+        if name not in _existing_indexes(cursor, table):
+            kind = 'UNIQUE INDEX' if unique else 'INDEX'
+            cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+
+
+@migration(6, 'Add indexes for session and feedback query patterns')
+def add_query_indexes(cursor):
+    # Keep only the newest feedback per (session, student) so the unique index can be built
+    cursor.execute("""
+    DELETE f1 FROM feedback f1
+    JOIN feedback f2 ON f1.session_id = f2.session_id AND f1.student_id = f2.student_id AND f1.id < f2.id
+    """)
+    if cursor.rowcount:
+        _rebuild_stats(cursor)
+    ensure_indexes(cursor, MANAGED_INDEXES)
+
+
+@migration(7, 'Backfill session quotas and make them NOT NULL')
+def backfill_session_quotas(cursor):
+    # Replaces the per-request fixups that used to run on every dashboard load
+    cursor.execute("UPDATE students SET sessions_used = 0 WHERE sessions_used IS NULL")
+    cursor.execute("""
+    UPDATE students
+    SET max_sessions = CASE WHEN course IN ('1', '2', '3') THEN 30 ELSE 25 END
+    WHERE max_sessions IS NULL OR (course IN ('1', '2', '3') AND max_sessions != 30)
+    """)
+    cursor.execute("""
+    ALTER TABLE students
+    MODIFY sessions_used INT NOT NULL DEFAULT 0,
+    MODIFY max_sessions INT NOT NULL DEFAULT 25
+    """)
+
+
+@migration(8, 'Track when sessions last changed')
+def add_session_updated_at(cursor):
+    # Feeds Last-Modified on the JSON API; MySQL keeps it current on every UPDATE
+    if 'updated_at' not in _existing_columns(cursor, 'sessions'):
+        cursor.execute("""
+        ALTER TABLE sessions
+        ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """)
+        cursor.execute("UPDATE sessions SET updated_at = COALESCE(check_out_time, check_in_time, created_at)")
+
+
+@migration(9, 'Add approval idempotency keys')
+def add_idempotency_keys(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        idempotency_key VARCHAR(64) PRIMARY KEY,
+        action VARCHAR(32) NOT NULL,
+        session_id INT NOT NULL,
+        result VARCHAR(32),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_idempotency_keys_created (created_at)
+    )
+    """)
+    # Cancelling a pending session used to decrement sessions_used as well
+    cursor.execute("UPDATE students SET sessions_used = 0 WHERE sessions_used < 0")
+
+
+@migration(10, 'Add labs with seat capacities')
+def add_labs(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS labs (
+        code VARCHAR(50) PRIMARY KEY,
+        room VARCHAR(20) NOT NULL,
+        capacity INT NOT NULL DEFAULT 30,
+        opens_at TIME NOT NULL DEFAULT '07:30:00',
+        closes_at TIME NOT NULL DEFAULT '21:00:00',
+        is_active BOOLEAN NOT NULL DEFAULT TRUE,
+        sort_order INT NOT NULL DEFAULT 0
+    )
+    ''')
+    # The rooms the app shipped with, 30 seats each
+    cursor.executemany("""
+    INSERT IGNORE INTO labs (code, room, capacity, sort_order) VALUES (%s, %s, 30, %s)
+    """, [(f'Lab {n}', str(522 + 2 * n), n) for n in range(1, 12)])
+    # Availability checks scan one lab's bookings by start time
+    ensure_indexes(cursor, [('sessions', 'idx_sessions_lab_date', ['lab_room', 'date_time'], False)])
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        row = cursor.fetchone()
+        return row[0] or 0
+    except Exception as e:
+        # 1146: table doesn't exist yet, i.e. nothing has been migrated
+        if getattr(e, 'errno', None) == 1146:
+            return 0
+        raise
+    finally:
+        cursor.close()
+
+
+def pending_migrations(conn):
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def upgrade(conn, target=None):
+    cursor = conn.cursor()
+    applied = []
+    locked = False
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (MIGRATION_LOCK,))
+        locked = cursor.fetchone()[0] == 1
+        if not locked:
+            raise RuntimeError("Timed out waiting for another process to finish migrating")
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        conn.commit()
+
+        # Re-read under the lock in case another worker got there first
+        for version, description, fn in pending_migrations(conn):
+            if target is not None and version > target:
+                break
+            logger.info("Applying migration %s: %s", version, description)
+            # MySQL commits DDL implicitly, so each migration must be safe to re-run
+            fn(cursor)
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                           (version, description))
+            conn.commit()
+            applied.append(version)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Releasing a lock this session doesn't hold would be a no-op at best
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
+        cursor.close()
+        if applied:
+            schema_cache.invalidate()
+    return applied
+
+
+def check_on_startup(app):
+    """Refuse to start against a schema that doesn't match this code.
+
+    A single SELECT when the schema is current. Pending migrations are only
+    applied here when AUTO_MIGRATE is set; otherwise run `flask db upgrade`.
+    """
+    conn = get_db_connection()
+    try:
+        version = current_version(conn)
+        if version == latest_version():
+            return
+        if version < latest_version() and app.config['AUTO_MIGRATE']:
+            upgrade(conn)
+            return
+    finally:
+        conn.close()
+    if version > latest_version():
+        raise RuntimeError(f"Database schema is at version {version}, newer than this code "
+                           f"({latest_version()}); deploy the matching release")
+    raise RuntimeError(f"Database schema is at version {version} but this code needs {latest_version()}; "
+                       "run `flask db upgrade` (or set AUTO_MIGRATE=1)")
+
+
+@click.group('db')
+def db_cli():
+    """Database schema management."""
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help='Stop after this version.')
+def upgrade_command(target):
+    """Apply pending schema migrations."""
+    conn = get_db_connection()
+    try:
+        applied = upgrade(conn, target)
+    finally:
+        conn.close()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        click.echo("Database schema is up to date")
+
+
+@db_cli.command('status')
+def status_command():
+    """Show the current schema version and pending migrations."""
+    conn = get_db_connection()
+    try:
+        click.echo(f"Current version: {current_version(conn)} (latest: {latest_version()})")
+        for version, description, _ in pending_migrations(conn):
+            click.echo(f"  pending {version}: {description}")
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
+    # CLI commands such as `flask db upgrade` load the app too and must work on an outdated schema
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.info_name == 'run':
+        check_on_startup(app)
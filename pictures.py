@@ -0,0 +1,350 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask.cli import with_appcontext
+
+import profiles
+import workers
+from db import connection_cursor, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Profile picture storage. Uploads are named by the hash of their contents,
+# so the same image uploaded twice is stored once. Each upload is decoded with
+# Pillow, re-encoded without its metadata and stored as a capped JPEG plus a
+# square thumbnail and a WebP copy; decoding runs in a small process pool,
+# bounded like the password hashing in credentials.py.
+
+DEFAULT_PICTURE = 'default.jpg'
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+MAX_PIXELS = 40_000_000  # refuse decompression bombs before decoding
+MAX_SIZE = 512  # longest side of the stored picture
+THUMB_SIZE = 128
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Files written less than this ago are not collected yet, so a picture being
+# saved for one student can't be removed by another student's cleanup; their
+# release is retried once the grace period is over
+GC_GRACE_SECONDS = 300
+
+PILLOW_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+STORED_NAME = re.compile(r'^([0-9a-f]{32})\.jpg$')
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+class PictureError(Exception):
+    pass
+
+
+_config = {
+    'folder': 'static/profile_pictures',
+    'workers': 1,
+    'queue_timeout': 10.0,
+}
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(4)
+_deferred = {}  # filename -> timer that releases it after the grace period
+_deferred_lock = threading.Lock()
+
+
+def configure(folder=None, workers=None, queue_limit=None):
+    global _slots
+    if folder is not None:
+        _config['folder'] = folder
+    if workers is not None:
+        _config['workers'] = workers
+    shutdown()
+    _slots = threading.BoundedSemaphore(queue_limit or max(_config['workers'], 1) * 4)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _config['workers'] <= 0:
+        return None
+    # Forkserver workers, recreated after a fork, for the same reasons as the credentials pool
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(max_workers=_config['workers'],
+                                                mp_context=workers.mp_context())
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def variant_names(filename):
+    """All files stored for a picture: the picture itself, its thumbnail and WebP copy."""
+    match = STORED_NAME.match(filename or '')
+    if not match:
+        return [filename]
+    digest = match.group(1)
+    return [filename, f'{digest}_thumb.jpg', f'{digest}.webp']
+
+
+def _path(filename):
+    return os.path.join(_config['folder'], filename)
+
+
+def _write(path, save):
+    # Write to a temporary name and rename so a half-written file is never served
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            save(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _process(data, folder, digest):
+    # Runs in a worker process; returns the stored filename
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in PILLOW_FORMATS:
+                raise PictureError('Profile picture must be a JPEG, PNG, GIF or WebP image')
+            if image.width * image.height > MAX_PIXELS:
+                raise PictureError('Profile picture is too large')
+            # Let the JPEG decoder scale down while decoding, then apply the
+            # EXIF rotation before the metadata is dropped
+            image.draft('RGB', (MAX_SIZE, MAX_SIZE))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            else:
+                image = image.convert('RGB')
+            image.thumbnail((MAX_SIZE, MAX_SIZE), Image.LANCZOS)
+            thumb = ImageOps.fit(image, (THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    except PictureError:
+        raise
+    except Exception:
+        raise PictureError('Profile picture could not be read as an image')
+
+    # No exif/icc arguments, so none of the upload's metadata is written back
+    filename = f'{digest}.jpg'
+    _write(os.path.join(folder, filename),
+           lambda f: image.save(f, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True))
+    _write(os.path.join(folder, f'{digest}_thumb.jpg'),
+           lambda f: thumb.save(f, 'JPEG', quality=JPEG_QUALITY, optimize=True))
+    _write(os.path.join(folder, f'{digest}.webp'),
+           lambda f: image.save(f, 'WEBP', quality=WEBP_QUALITY, method=4))
+    return filename
+
+
+def _find_stored(digest):
+    filename = f'{digest}.jpg'
+    return filename if os.path.exists(_path(filename)) else None
+
+
+def _store_bytes(data):
+    if not data:
+        raise PictureError('Profile picture is empty')
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise PictureError(f'Profile picture must be smaller than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB')
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    # Already stored: refresh its timestamps so a concurrent gc leaves it alone
+    existing = _find_stored(digest)
+    if existing:
+        now = time.time()
+        for name in variant_names(existing):
+            try:
+                os.utime(_path(name), (now, now))
+            except FileNotFoundError:
+                pass
+        return existing
+
+    if not _slots.acquire(timeout=_config['queue_timeout']):
+        raise PictureError('Too many uploads right now, please try again in a moment')
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return _process(data, _config['folder'], digest)
+        return executor.submit(_process, data, _config['folder'], digest).result()
+    finally:
+        _slots.release()
+
+
+def save_upload(file):
+    """Store an uploaded picture (a werkzeug FileStorage) and return its filename."""
+    # Read one byte past the limit so oversized uploads are refused without buffering them
+    return _store_bytes(file.stream.read(MAX_UPLOAD_BYTES + 1))
+
+
+def thumbnail(filename):
+    """Filename of the small avatar for a picture, falling back to the picture itself."""
+    names = variant_names(filename)
+    if len(names) > 1 and os.path.exists(_path(names[1])):
+        return names[1]
+    return filename or DEFAULT_PICTURE
+
+
+def webp(filename):
+    names = variant_names(filename)
+    if len(names) > 2 and os.path.exists(_path(names[2])):
+        return names[2]
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+
+
+def release(cursor, filename):
+    """Delete a picture's files once no student references it any more.
+
+    Call after the change that dropped the reference has been committed.
+    Files still inside the grace period are released later instead.
+    """
+    if not filename or filename == DEFAULT_PICTURE or os.path.basename(filename) != filename:
+        return 0
+    cursor.execute("SELECT 1 FROM students WHERE profile_picture = %s LIMIT 1", (filename,))
+    if cursor.fetchone():
+        return 0
+    paths = [_path(name) for name in variant_names(filename)]
+    mtimes = [m for m in map(_mtime, paths) if m is not None]
+    if not mtimes:
+        return 0
+    wait = max(mtimes) + GC_GRACE_SECONDS - time.time()
+    if wait > 0:
+        release_later(filename, wait)
+        return 0
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning('Could not remove picture %s', path, exc_info=True)
+    return removed
+
+
+def release_later(filename, delay=GC_GRACE_SECONDS):
+    """Run release() for a picture after `delay` seconds on a timer thread.
+
+    For pictures stored moments ago, e.g. by an update that then failed. The
+    references are checked again when the timer fires; `flask pictures gc`
+    catches anything a restart dropped.
+    """
+    with _deferred_lock:
+        if filename in _deferred:
+            return
+        timer = threading.Timer(delay, _release_deferred, (filename,))
+        timer.daemon = True
+        _deferred[filename] = timer
+    timer.start()
+
+
+def _release_deferred(filename):
+    with _deferred_lock:
+        _deferred.pop(filename, None)
+    try:
+        with connection_cursor() as (conn, cursor):
+            release(cursor, filename)
+    except Exception:
+        logger.warning('Deferred release of picture %s failed', filename, exc_info=True)
+
+
+def collect_garbage(cursor):
+    """Remove every stored picture file that no student references."""
+    cursor.execute("SELECT DISTINCT profile_picture FROM students WHERE profile_picture IS NOT NULL")
+    keep = {DEFAULT_PICTURE}
+    for (filename,) in cursor.fetchall():
+        keep.update(variant_names(filename))
+    removed = 0
+    cutoff = time.time() - GC_GRACE_SECONDS
+    for name in os.listdir(_config['folder']):
+        path = _path(name)
+        if name in keep or not os.path.isfile(path) or os.path.getmtime(path) > cutoff:
+            continue
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+@click.group('pictures')
+def pictures_cli():
+    """Profile picture storage."""
+
+
+@pictures_cli.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Re-store pictures saved before this pipeline or unresized, as capped JPEGs with thumbnails."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT profile_picture FROM students WHERE profile_picture IS NOT NULL")
+        legacy = [name for (name,) in cursor.fetchall()
+                  if name != DEFAULT_PICTURE and not STORED_NAME.match(name)]
+        for name in legacy:
+            try:
+                with open(_path(name), 'rb') as f:
+                    stored = _store_bytes(f.read())
+            except (OSError, PictureError) as e:
+                click.echo(f'{name}: skipped ({e})')
+                continue
+            cursor.execute("UPDATE students SET profile_picture = %s WHERE profile_picture = %s", (stored, name))
+            conn.commit()
+            click.echo(f'{name} -> {stored} ({cursor.rowcount} students)')
+            release(cursor, name)
+    finally:
+        cursor.close()
+        conn.close()
+    profiles.invalidate_all()
+
+
+@pictures_cli.command('gc')
+@with_appcontext
+def gc_command():
+    """Delete picture files no student references."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        removed = collect_garbage(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    click.echo(f'Removed {removed} unreferenced picture files')
+
+
+def init_app(app):
+    if Image is None:
+        raise RuntimeError('Profile pictures need the Pillow package (pip install -r requirements.txt)')
+    configure(
+        folder=app.config['UPLOAD_FOLDER'],
+        workers=app.config['PICTURE_WORKERS'],
+    )
+    app.add_template_filter(thumbnail, 'picture_thumb')
+    app.add_template_filter(webp, 'picture_webp')
+    app.cli.add_command(pictures_cli)
@@ -0,0 +1,34 @@
+import cache
+from db import connection_cursor
+
+# Cached student identity fields (no session counters, which change with every
+# approval). Only edit_profile and delete_student change these columns, and both
+# call invalidate(); the TTL bounds staleness for per-process memory caches.
+
+PROFILE_COLUMNS = ['id', 'idno', 'username', 'lastname', 'firstname', 'middlename', 'course',
+                   'year_level', 'email', 'profile_picture']
+
+CACHE_PREFIX = 'student_profile:'
+CACHE_TTL = 600
+
+
+def get_profile(student_id):
+    key = f'{CACHE_PREFIX}{student_id}'
+    backend = cache.get_backend()
+    profile = backend.get(key)
+    if profile is None:
+        with connection_cursor(dictionary=True) as (conn, cursor):
+            cursor.execute(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM students WHERE id = %s", (student_id,))
+            profile = cursor.fetchone()
+        if profile is None:
+            return None
+        backend.set(key, profile, CACHE_TTL)
+    return profile
+
+
+def invalidate(student_id):
+    cache.get_backend().delete(f'{CACHE_PREFIX}{student_id}')
+
+
+def invalidate_all():
+    cache.get_backend().delete_prefix(CACHE_PREFIX)
@@ -0,0 +1,159 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import flask.templating
+from flask import g, request, session
+
+# Opt-in request profiling for admins. A request is profiled with cProfile
+# when an admin sends the X-Profile header or a _profile=1 query flag, or is
+# picked by PROFILE_SAMPLE_RATE. The .prof file and a JSON summary (total, SQL,
+# template and remaining Python time) are written to PROFILE_DIR; open the
+# .prof with snakeviz or `python -m pstats`, or turn it into a flame graph
+# with flameprof.
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_FLAG = '_profile'
+PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+# Endpoints never profiled: static files and the profile downloads themselves
+SKIP_ENDPOINTS = {'static', 'list_profiles', 'download_profile'}
+
+# Flask's template rendering; its cumulative time is the summary's template time
+_RENDER_CODE = flask.templating._render.__code__
+
+_config = {
+    'dir': 'profile_artifacts',
+    'sample_rate': 0.0,
+    'keep': 50,
+}
+
+
+def _requested():
+    if request.endpoint in SKIP_ENDPOINTS or session.get('user_type') != 'admin':
+        return False
+    if request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_FLAG) == '1':
+        return True
+    return _config['sample_rate'] > 0 and random.random() < _config['sample_rate']
+
+
+def _start():
+    if not _requested():
+        return
+    g._profile_started = time.perf_counter()
+    g._profile_queries = g.get('_query_count', 0)
+    g._profile_query_seconds = g.get('_query_seconds', 0.0)
+    g._profile_template_query_seconds = 0.0
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return  # another profiler is already running (one at a time on Python 3.12+)
+    g._profiler = profiler
+
+
+def _rendering_template():
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code is _RENDER_CODE:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def record_query(seconds):
+    """Called by metrics.record_query for every statement run during a request."""
+    # SQL run while a template renders (a lazy loader behind a fragment cache miss)
+    # is already DB time; remember it so it isn't counted as template time as well
+    if g.get('_profiler') is not None and _rendering_template():
+        g._profile_template_query_seconds += seconds
+
+
+def _template_seconds(stats):
+    # Cumulative time under Flask's template rendering, however many templates were rendered
+    key = (_RENDER_CODE.co_filename, _RENDER_CODE.co_firstlineno, _RENDER_CODE.co_name)
+    return stats.stats[key][3] if key in stats.stats else 0.0
+
+
+def _finish(response):
+    profiler = g.pop('_profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    elapsed = time.perf_counter() - g._profile_started
+    # SQL time as counted by metrics.py's cursor wrapper for this request
+    db_seconds = g.get('_query_seconds', 0.0) - g._profile_query_seconds
+    queries = g.get('_query_count', 0) - g._profile_queries
+    template_seconds = max(_template_seconds(pstats.Stats(profiler)) - g._profile_template_query_seconds, 0.0)
+
+    profile_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    summary = {
+        'id': profile_id,
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': response.status_code,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'total_ms': round(elapsed * 1000, 2),
+        'db_ms': round(db_seconds * 1000, 2),
+        'template_ms': round(template_seconds * 1000, 2),
+        'python_ms': round(max(elapsed - db_seconds - template_seconds, 0) * 1000, 2),
+        'queries': queries,
+    }
+    profiler.dump_stats(profile_path(profile_id))
+    with open(_summary_path(profile_id), 'w') as f:
+        json.dump(summary, f)
+    _prune()
+
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def _summary_path(profile_id):
+    return os.path.join(_config['dir'], f'{profile_id}.json')
+
+
+def profile_path(profile_id):
+    return os.path.join(_config['dir'], f'{profile_id}.prof')
+
+
+def get_profile(profile_id):
+    if not PROFILE_ID.match(profile_id or ''):
+        return None
+    try:
+        with open(_summary_path(profile_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles():
+    """Summaries of the kept profiles, newest first (ids sort by time)."""
+    ids = sorted((name[:-5] for name in os.listdir(_config['dir']) if name.endswith('.json')), reverse=True)
+    return [summary for summary in map(get_profile, ids) if summary]
+
+
+def _prune():
+    ids = sorted(name[:-5] for name in os.listdir(_config['dir']) if name.endswith('.json'))
+    for profile_id in ids[:max(len(ids) - _config['keep'], 0)]:
+        for path in (_summary_path(profile_id), profile_path(profile_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def init_app(app):
+    _config['dir'] = os.path.abspath(app.config['PROFILE_DIR'])
+    _config['sample_rate'] = app.config['PROFILE_SAMPLE_RATE']
+    _config['keep'] = app.config['PROFILE_KEEP']
+    os.makedirs(_config['dir'], exist_ok=True)
+    app.before_request(_start)
+    app.after_request(_finish)
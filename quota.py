@@ -0,0 +1,277 @@
+import click
+
+from db import get_db_connection
+
+# Session quota rules. A student's sessions_used only moves inside the same
+# transaction as the session state change that justifies it, and every check
+# either locks that one student's row or is folded into a conditional UPDATE,
+# so concurrent requests for different students never wait on each other.
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# Results that mean the session ends up approved
+APPROVED_RESULTS = ('approved', 'already_approved')
+
+
+class QuotaError(Exception):
+    pass
+
+
+def reserve(cursor, student_id, count=1):
+    # Atomic check-and-increment; InnoDB locks only this student's row for the UPDATE
+    cursor.execute("""
+    UPDATE students
+    SET sessions_used = sessions_used + %s
+    WHERE id = %s AND sessions_used + %s <= max_sessions
+    """, (count, student_id, count))
+    return cursor.rowcount == 1
+
+
+def release(cursor, student_id, count=1):
+    cursor.execute("""
+    UPDATE students
+    SET sessions_used = GREATEST(sessions_used - %s, 0)
+    WHERE id = %s
+    """, (count, student_id))
+
+
+def check_request(cursor, student_id):
+    # Locks the student's row so two simultaneous requests can't both take the last slot.
+    # Pending requests count against the quota; they become used sessions once approved.
+    cursor.execute("SELECT sessions_used, max_sessions FROM students WHERE id = %s FOR UPDATE",
+                   (student_id,))
+    student = cursor.fetchone()
+    if student is None:
+        raise QuotaError('Student not found')
+    sessions_used, max_sessions = _values(student, 'sessions_used', 'max_sessions')
+    cursor.execute("""
+    SELECT COUNT(*) AS pending FROM sessions
+    WHERE student_id = %s AND approval_status = 'pending' AND status != 'cancelled'
+    """, (student_id,))
+    pending = _values(cursor.fetchone(), 'pending')[0]
+    return remaining_for_request(sessions_used, pending, max_sessions)
+
+
+def remaining_for_request(sessions_used, pending, max_sessions):
+    # Sessions left once the new request is counted; raises if there is no room for it
+    if sessions_used >= max_sessions:
+        raise QuotaError('You have used all your available sessions')
+    if sessions_used + pending >= max_sessions:
+        raise QuotaError('Your pending requests already cover your remaining sessions')
+    return max_sessions - sessions_used - pending
+
+
+def fit_within_quota(session_ids, sessions_used, max_sessions):
+    # The leading session ids that still fit in a student's quota
+    return session_ids[:max(max_sessions - sessions_used, 0)]
+
+
+def _values(row, *columns):
+    # Works with both plain and dictionary cursors
+    if isinstance(row, dict):
+        return [row[column] for column in columns]
+    return list(row)
+
+
+def _claim_key(cursor, key, action, session_id):
+    # Returns the stored result if this key was already used, else None after claiming it.
+    # A concurrent request with the same key blocks on the primary key until the first commits.
+    if key is None:
+        return None
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise QuotaError(f'Idempotency key longer than {IDEMPOTENCY_KEY_MAX_LENGTH} characters')
+    cursor.execute("""
+    INSERT IGNORE INTO idempotency_keys (idempotency_key, action, session_id)
+    VALUES (%s, %s, %s)
+    """, (key, action, session_id))
+    if cursor.rowcount == 1:
+        return None
+    # Locking read: sees the other request's committed row rather than this transaction's snapshot
+    cursor.execute("""
+    SELECT action, session_id, result FROM idempotency_keys
+    WHERE idempotency_key = %s
+    FOR UPDATE
+    """, (key,))
+    stored_action, stored_session_id, result = _values(cursor.fetchone(), 'action', 'session_id', 'result')
+    return replayed_result(stored_action, stored_session_id, result, action, session_id)
+
+
+def replayed_result(stored_action, stored_session_id, stored_result, action, session_id):
+    # A key may only be replayed for the request it was first used for
+    if stored_action != action or stored_session_id != session_id:
+        raise QuotaError('Idempotency key was already used for a different request')
+    return stored_result
+
+
+def _store_result(cursor, key, result):
+    if key is not None:
+        cursor.execute("UPDATE idempotency_keys SET result = %s WHERE idempotency_key = %s", (result, key))
+
+
+def approve_session(cursor, session_id, idempotency_key=None):
+    """Approve one pending session if the student still has quota.
+
+    Returns 'approved', 'already_approved', 'not_found', 'not_pending' or
+    'quota_exceeded'. Replaying an idempotency key returns the first result.
+    The caller commits.
+    """
+    replay = _claim_key(cursor, idempotency_key, 'approve', session_id)
+    if replay is not None:
+        return replay
+
+    cursor.execute("SELECT student_id, status, approval_status FROM sessions WHERE id = %s FOR UPDATE",
+                   (session_id,))
+    row = cursor.fetchone()
+    if row is None:
+        result = 'not_found'
+    else:
+        student_id, status, approval_status = _values(row, 'student_id', 'status', 'approval_status')
+        if approval_status == 'approved':
+            result = 'already_approved'
+        elif approval_status != 'pending' or status == 'cancelled':
+            result = 'not_pending'
+        elif not reserve(cursor, student_id):
+            result = 'quota_exceeded'
+        else:
+            cursor.execute("""
+            UPDATE sessions
+            SET approval_status = 'approved', status = 'active'
+            WHERE id = %s AND approval_status = 'pending'
+            """, (session_id,))
+            result = 'approved'
+
+    _store_result(cursor, idempotency_key, result)
+    return result
+
+
+def allocate(cursor, sessions_by_student):
+    """Reserve quota for many sessions at once.
+
+    `sessions_by_student` maps student_id -> session ids in the order they
+    should be granted. Locks the students' rows (in id order, to avoid
+    deadlocks), applies one grouped increment and returns the set of session
+    ids that fit within each student's remaining quota.
+    """
+    if not sessions_by_student:
+        return set()
+    student_ids = sorted(sessions_by_student)
+    cursor.execute(f"""
+    SELECT id, sessions_used, max_sessions FROM students
+    WHERE id IN ({', '.join(['%s'] * len(student_ids))})
+    ORDER BY id
+    FOR UPDATE
+    """, tuple(student_ids))
+
+    granted = set()
+    increments = []
+    for row in cursor.fetchall():
+        student_id, sessions_used, max_sessions = _values(row, 'id', 'sessions_used', 'max_sessions')
+        fits = fit_within_quota(sessions_by_student[student_id], sessions_used, max_sessions)
+        if fits:
+            granted.update(fits)
+            increments.append((student_id, len(fits)))
+
+    if increments:
+        cases = ' '.join(['WHEN %s THEN %s'] * len(increments))
+        params = [value for pair in increments for value in pair]
+        cursor.execute(f"""
+        UPDATE students
+        SET sessions_used = sessions_used + CASE id {cases} END
+        WHERE id IN ({', '.join(['%s'] * len(increments))})
+        """, tuple(params) + tuple(student_id for student_id, _ in increments))
+    return granted
+
+
+def reject_session(cursor, session_id):
+    """Reject one pending session.
+
+    Pending sessions hold no quota, so sessions_used is left alone; an
+    approved session has to be cancelled instead, which gives its quota
+    back. Returns 'rejected', 'not_found' or 'not_pending'.
+    """
+    cursor.execute("""
+    UPDATE sessions
+    SET approval_status = 'rejected', status = 'cancelled'
+    WHERE id = %s AND approval_status = 'pending' AND status != 'cancelled'
+    """, (session_id,))
+    if cursor.rowcount == 1:
+        return 'rejected'
+    cursor.execute("SELECT id FROM sessions WHERE id = %s", (session_id,))
+    return 'not_pending' if cursor.fetchone() else 'not_found'
+
+
+def cancel_session(cursor, session_id, student_id):
+    """Cancel a student's own pending or active session.
+
+    Gives the quota back only if the session had been approved. Returns
+    'cancelled', 'not_found' or 'not_cancellable'.
+    """
+    cursor.execute("""
+    SELECT status, approval_status FROM sessions
+    WHERE id = %s AND student_id = %s
+    FOR UPDATE
+    """, (session_id, student_id))
+    row = cursor.fetchone()
+    if row is None:
+        return 'not_found'
+    status, approval_status = _values(row, 'status', 'approval_status')
+    if status not in ('pending', 'active'):
+        return 'not_cancellable'
+    cursor.execute("UPDATE sessions SET status = 'cancelled' WHERE id = %s", (session_id,))
+    if approval_status == 'approved':
+        release(cursor, student_id)
+    return 'cancelled'
+
+
+def purge_idempotency_keys(cursor, max_age_hours=IDEMPOTENCY_KEY_TTL_HOURS):
+    cursor.execute("""
+    DELETE FROM idempotency_keys
+    WHERE created_at < NOW() - INTERVAL %s HOUR
+    """, (max_age_hours,))
+    return cursor.rowcount
+
+
+@click.group('quota')
+def quota_cli():
+    """Session quota maintenance."""
+
+
+@quota_cli.command('check')
+def check_command():
+    """List students whose used sessions exceed their quota."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT idno, lastname, firstname, sessions_used, max_sessions
+        FROM students
+        WHERE sessions_used > max_sessions
+        ORDER BY lastname, firstname
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    for idno, lastname, firstname, used, maximum in rows:
+        click.echo(f"{idno}  {lastname}, {firstname}: {used}/{maximum}")
+    click.echo(f"{len(rows)} student(s) over quota")
+
+
+@quota_cli.command('purge-keys')
+@click.option('--hours', type=int, default=IDEMPOTENCY_KEY_TTL_HOURS, show_default=True)
+def purge_keys_command(hours):
+    """Delete approval idempotency keys older than --hours."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        removed = purge_idempotency_keys(cursor, hours)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    click.echo(f"Removed {removed} idempotency key(s)")
+
+
+def init_app(app):
+    app.cli.add_command(quota_cli)
@@ -0,0 +1,293 @@
+import csv
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from db import get_db_connection
+import labs
+
+logger = logging.getLogger(__name__)
+
+REPORT_HEADER = ['ID', 'Student ID', 'Student Name', 'Course', 'Lab Room', 'Date & Time',
+                 'Duration', 'Programming Language', 'Purpose', 'Status']
+
+COURSE_NAMES = {'1': 'BSIT', '2': 'BSCS', '3': 'BSCE'}
+
+FETCH_BATCH_SIZE = 500
+
+
+def parse_report_filters(args):
+    # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD&lab=Lab+N; raises ValueError on bad dates
+    filters = {}
+    if args.get('start'):
+        filters['start'] = datetime.datetime.strptime(args['start'], '%Y-%m-%d')
+    if args.get('end'):
+        # Inclusive end date
+        filters['end'] = datetime.datetime.strptime(args['end'], '%Y-%m-%d') + datetime.timedelta(days=1)
+    if args.get('lab'):
+        filters['lab'] = args['lab']
+    return filters
+
+
+def iter_report_rows(conn, filters=None, batch_size=FETCH_BATCH_SIZE):
+    # Unbuffered cursor: rows stream from the server in batches instead of being loaded all at once
+    filters = filters or {}
+    conditions = []
+    params = []
+    if 'start' in filters:
+        conditions.append('s.date_time >= %s')
+        params.append(filters['start'])
+    if 'end' in filters:
+        conditions.append('s.date_time < %s')
+        params.append(filters['end'])
+    if 'lab' in filters:
+        conditions.append('s.lab_room = %s')
+        params.append(filters['lab'])
+    where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(f"""
+        SELECT s.id, s.lab_room, s.date_time, s.duration, s.programming_language, s.purpose, s.status,
+               st.firstname, st.lastname, st.idno, st.course
+        FROM sessions s
+        JOIN students st ON s.student_id = st.id
+        {where}
+        ORDER BY s.date_time DESC
+        """, tuple(params))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            # Abandoned mid-stream (e.g. client disconnected): "Unread result found". The pool
+            # sees connection.unread_result on release and discards the connection
+            pass
+
+
+def format_report_row(session, lab_labels):
+    purpose = session.get('purpose')
+    if purpose and len(purpose) > 50:
+        purpose = purpose[:50] + '...'
+    date_time = session['date_time']
+    return [
+        session['id'],
+        session['idno'],
+        f"{session['firstname']} {session['lastname']}",
+        COURSE_NAMES.get(session['course'], session['course']),
+        lab_labels.get(session['lab_room'], session['lab_room']),
+        date_time.strftime('%Y-%m-%d %H:%M') if isinstance(date_time, datetime.datetime) else date_time,
+        session['duration'],
+        session.get('programming_language', 'Not specified'),
+        purpose if 'purpose' in session else 'Not specified',
+        session['status']
+    ]
+
+
+def stream_csv(conn, filters=None):
+    # Yields CSV text one batch at a time and releases the connection when done
+    output = StringIO()
+    writer = csv.writer(output)
+    try:
+        lab_labels = labs.lab_labels()
+        writer.writerow(REPORT_HEADER)
+        for rows in iter_report_rows(conn, filters):
+            for row in rows:
+                writer.writerow(format_report_row(row, lab_labels))
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+        if output.tell():
+            yield output.getvalue()
+    finally:
+        conn.close()
+
+
+# Background report jobs: XLSX and PDF files are built off the request thread
+# and written to REPORT_DIR, with a small JSON status file per job so any
+# worker process can answer status/download requests.
+
+REPORT_FORMATS = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+}
+
+_executor = None
+_report_dir = None
+_report_ttl = None
+
+
+def init_app(app):
+    global _executor, _report_dir, _report_ttl
+    _report_dir = os.path.abspath(app.config['REPORT_DIR'])
+    _report_ttl = app.config['REPORT_TTL']
+    os.makedirs(_report_dir, exist_ok=True)
+    _executor = ThreadPoolExecutor(max_workers=app.config['REPORT_WORKERS'],
+                                   thread_name_prefix='report-job')
+
+
+def _job_path(job_id, extension):
+    return os.path.join(_report_dir, f"{job_id}.{extension}")
+
+
+def _save_job(job):
+    # Write-then-rename so readers never see a half-written status file
+    path = _job_path(job['id'], 'json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(job, f)
+    os.replace(path + '.tmp', path)
+
+
+def get_job(job_id):
+    try:
+        uuid.UUID(job_id)
+        with open(_job_path(job_id, 'json')) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+
+def artifact_path(job):
+    return _job_path(job['id'], REPORT_FORMATS[job['format']][0])
+
+
+def purge_expired_jobs():
+    cutoff = time.time() - _report_ttl
+    for name in os.listdir(_report_dir):
+        path = os.path.join(_report_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def submit_job(format, filters):
+    if format not in REPORT_FORMATS:
+        raise ValueError(f'Unsupported report format: {format}')
+    purge_expired_jobs()
+    job = {
+        'id': uuid.uuid4().hex,
+        'format': format,
+        'filters': {key: value.isoformat() if isinstance(value, datetime.datetime) else value
+                    for key, value in filters.items()},
+        'status': 'queued',
+        'rows': 0,
+        'error': None,
+        'created_at': time.time(),
+        'finished_at': None,
+    }
+    _save_job(job)
+    _executor.submit(_run_job, job, filters)
+    return job
+
+
+def _run_job(job, filters):
+    job['status'] = 'running'
+    _save_job(job)
+    path = artifact_path(job)
+    try:
+        writer = write_xlsx if job['format'] == 'excel' else write_pdf
+        job['rows'] = writer(path + '.part', filters)
+        os.replace(path + '.part', path)
+        job['status'] = 'done'
+    except Exception as e:
+        logger.exception("Report job %s failed", job['id'])
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        try:
+            os.remove(path + '.part')
+        except OSError:
+            pass
+    job['finished_at'] = time.time()
+    _save_job(job)
+
+
+def _report_rows(filters):
+    lab_labels = labs.lab_labels()
+    conn = get_db_connection()
+    try:
+        for rows in iter_report_rows(conn, filters):
+            for row in rows:
+                yield format_report_row(row, lab_labels)
+    finally:
+        conn.close()
+
+
+def write_xlsx(path, filters):
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise RuntimeError('Excel reports need the xlsxwriter package (pip install xlsxwriter)')
+
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        worksheet = workbook.add_worksheet('Sit-in Sessions')
+        bold = workbook.add_format({'bold': True})
+        widths = [8, 14, 28, 10, 18, 18, 10, 20, 50, 12]
+        for column, width in enumerate(widths):
+            worksheet.set_column(column, column, width)
+        worksheet.write_row(0, 0, REPORT_HEADER, bold)
+        count = 0
+        for count, row in enumerate(_report_rows(filters), start=1):
+            worksheet.write_row(count, 0, ['' if value is None else value for value in row])
+        return count
+    finally:
+        workbook.close()
+
+
+def write_pdf(path, filters):
+    try:
+        from reportlab.lib.pagesizes import landscape, letter
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        raise RuntimeError('PDF reports need the reportlab package (pip install reportlab)')
+
+    page_width, page_height = landscape(letter)
+    margin = 36
+    line_height = 14
+    # Column x offsets and character limits for the fixed-width table
+    columns = [(0, 6), (40, 12), (110, 24), (250, 6), (290, 16), (385, 16), (480, 4),
+               (515, 14), (600, 24), (740, 10)]
+    pdf = canvas.Canvas(path, pagesize=(page_width, page_height))
+    pdf.setTitle('Sit-in Sessions Report')
+    page = 0
+    y = 0
+
+    def start_page():
+        nonlocal page, y
+        page += 1
+        pdf.setFont('Helvetica-Bold', 12)
+        pdf.drawString(margin, page_height - margin, 'CSS Sit-in Sessions Report')
+        pdf.setFont('Helvetica', 8)
+        pdf.drawRightString(page_width - margin, page_height - margin, f'Page {page}')
+        y = page_height - margin - 2 * line_height
+        pdf.setFont('Helvetica-Bold', 8)
+        for (x, limit), title in zip(columns, REPORT_HEADER):
+            pdf.drawString(margin + x, y, title[:limit])
+        y -= line_height
+        pdf.setFont('Helvetica', 8)
+
+    start_page()
+    count = 0
+    for row in _report_rows(filters):
+        if y < margin:
+            pdf.showPage()
+            start_page()
+        for (x, limit), value in zip(columns, row):
+            text = '' if value is None else str(value)
+            pdf.drawString(margin + x, y, text if len(text) <= limit else text[:limit - 3] + '...')
+        y -= line_height
+        count += 1
+    pdf.save()
+    return count
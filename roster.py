@@ -0,0 +1,116 @@
+import base64
+import json
+
+# Columns the roster needs; never the password hash
+ROSTER_COLUMNS = ['id', 'idno', 'lastname', 'firstname', 'middlename', 'course', 'year_level',
+                  'email', 'profile_picture', 'sessions_used', 'max_sessions']
+
+# Sort key -> ordered columns; `id` is always last so the keyset is unique
+ROSTER_SORTS = {
+    'name': ['lastname', 'firstname', 'id'],
+    'idno': ['idno', 'id'],
+    'course': ['course', 'lastname', 'firstname', 'id'],
+}
+
+# Course names admins type into the search box map to the stored course codes
+COURSE_CODES = {'BSIT': '1', 'BSCS': '2', 'BSCE': '3'}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def fetch_roster_page(cursor, search='', course=None, sort='name', direction='asc',
+                      after=None, limit=DEFAULT_PAGE_SIZE):
+    # cursor must be a dictionary cursor; returns (students, next_cursor)
+    if sort not in ROSTER_SORTS:
+        raise ValueError(f'Unknown sort: {sort}')
+    if direction not in ('asc', 'desc'):
+        raise ValueError(f'Unknown direction: {direction}')
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    sort_columns = ROSTER_SORTS[sort]
+
+    conditions = []
+    params = []
+
+    search = (search or '').strip()
+    if search:
+        # Prefix matches so the idno/name indexes can be used
+        like = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        search_conditions = ['idno LIKE %s', 'lastname LIKE %s', 'firstname LIKE %s']
+        params.extend([like, like, like])
+        course_code = COURSE_CODES.get(search.upper())
+        if course_code:
+            search_conditions.append('course = %s')
+            params.append(course_code)
+        conditions.append('(' + ' OR '.join(search_conditions) + ')')
+
+    if course:
+        conditions.append('course = %s')
+        params.append(COURSE_CODES.get(course.upper(), course))
+
+    if after:
+        values = decode_cursor(after)
+        if len(values) != len(sort_columns):
+            raise ValueError('Invalid cursor')
+        comparison = '>' if direction == 'asc' else '<'
+        conditions.append(f"({', '.join(sort_columns)}) {comparison} ({', '.join(['%s'] * len(values))})")
+        params.extend(values)
+
+    where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+    order = ', '.join(f'{column} {direction.upper()}' for column in sort_columns)
+    outer_order = ', '.join(f'p.{column} {direction.upper()}' for column in sort_columns)
+
+    # Fetch one extra row to know whether there is a next page; active-session
+    # counts come from a single grouped join instead of a subquery per student
+    cursor.execute(f"""
+    SELECT p.*, COALESCE(a.active_sessions, 0) AS active_sessions
+    FROM (
+        SELECT {', '.join(ROSTER_COLUMNS)}
+        FROM students
+        {where}
+        ORDER BY {order}
+        LIMIT %s
+    ) p
+    LEFT JOIN (
+        SELECT student_id, COUNT(*) AS active_sessions
+        FROM sessions
+        WHERE status = 'active'
+        GROUP BY student_id
+    ) a ON a.student_id = p.id
+    ORDER BY {outer_order}
+    """, tuple(params) + (limit + 1,))
+    students = cursor.fetchall()
+
+    next_cursor = None
+    if len(students) > limit:
+        students = students[:limit]
+        last = students[-1]
+        next_cursor = encode_cursor([last[column] for column in sort_columns])
+    return students, next_cursor
+
+
+def fetch_course_counts(cursor):
+    # Totals for the dashboard cards and course chart without loading every student
+    cursor.execute("SELECT course, COUNT(*) AS count FROM students GROUP BY course")
+    counts = {'total': 0, '1': 0, '2': 0, '3': 0, 'other': 0}
+    for row in cursor.fetchall():
+        counts['total'] += row['count']
+        if row['course'] in ('1', '2', '3'):
+            counts[row['course']] += row['count']
+        else:
+            counts['other'] += row['count']
+    return counts
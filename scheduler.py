@@ -0,0 +1,244 @@
+import logging
+import threading
+import time
+
+import click
+
+import events
+from db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Periodic housekeeping for sessions nobody closed by hand:
+# - approved sessions that were checked in and are past their booked end are completed,
+# - approved sessions never checked in are marked no_show once the grace period passes,
+# - pending requests whose booked time is already over are rejected.
+# Each rule picks ids through an index in batches of at most `batch_size`
+# and commits per batch, so a sweep never holds locks on more than one batch.
+
+SWEEP_LOCK = 'sitin_session_sweep'
+
+# (metric name, live-monitor event state, SELECT for one batch of ids, UPDATE applied to them)
+SWEEP_RULES = [
+    ('expired', 'checked_out', """
+    SELECT id FROM sessions
+    WHERE status = 'active' AND approval_status = 'approved' AND date_time < %(now)s
+      AND check_in_time IS NOT NULL AND check_out_time IS NULL
+      AND date_time + INTERVAL duration HOUR <= %(now)s
+    ORDER BY date_time
+    LIMIT %(limit)s
+    FOR UPDATE
+    """, """
+    UPDATE sessions
+    SET status = 'completed', check_out_time = date_time + INTERVAL duration HOUR
+    WHERE id IN ({ids}) AND status = 'active'
+    """),
+    ('no_shows', 'no_show', """
+    SELECT id FROM sessions
+    WHERE status = 'active' AND approval_status = 'approved' AND date_time < %(no_show_cutoff)s
+      AND check_in_time IS NULL
+    ORDER BY date_time
+    LIMIT %(limit)s
+    FOR UPDATE
+    """, """
+    UPDATE sessions
+    SET status = 'no_show'
+    WHERE id IN ({ids}) AND status = 'active' AND check_in_time IS NULL
+    """),
+    ('stale_requests', 'rejected', """
+    SELECT id FROM sessions
+    WHERE approval_status = 'pending' AND date_time < %(now)s
+      AND status = 'pending'
+      AND date_time + INTERVAL duration HOUR <= %(now)s
+    ORDER BY date_time
+    LIMIT %(limit)s
+    FOR UPDATE
+    """, """
+    UPDATE sessions
+    SET approval_status = 'rejected', status = 'cancelled'
+    WHERE id IN ({ids}) AND approval_status = 'pending'
+    """),
+]
+
+
+class SweepStats:
+    """Rows touched by the last sweep and since startup, for /admin/scheduler-stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.skipped = 0
+        self.errors = 0
+        self.totals = {name: 0 for name, _, _, _ in SWEEP_RULES}
+        self.last = None
+
+    def record(self, result):
+        with self._lock:
+            self.sweeps += 1
+            for name, count in result['rows'].items():
+                self.totals[name] += count
+            self.last = result
+
+    def record_skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'sweeps': self.sweeps,
+                'skipped': self.skipped,
+                'errors': self.errors,
+                'rows_total': dict(self.totals),
+                'last_sweep': self.last
+            }
+
+
+sweep_stats = SweepStats()
+
+_config = {'interval': 60, 'batch_size': 500, 'no_show_grace_minutes': 30}
+_thread = None
+_stop = threading.Event()
+
+
+def _run_rule(conn, select_sql, update_sql, params, batch_size):
+    cursor = conn.cursor()
+    changed = []
+    batches = 0
+    try:
+        while True:
+            cursor.execute(select_sql, dict(params, limit=batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                conn.rollback()
+                break
+            cursor.execute(update_sql.format(ids=', '.join(['%s'] * len(ids))), tuple(ids))
+            conn.commit()
+            changed.extend(ids)
+            batches += 1
+            if len(ids) < batch_size:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return changed, batches
+
+
+def sweep(batch_size=None, no_show_grace_minutes=None):
+    """Run every rule once. Returns None if another process holds the sweep lock."""
+    batch_size = batch_size or _config['batch_size']
+    grace = _config['no_show_grace_minutes'] if no_show_grace_minutes is None else no_show_grace_minutes
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # Only one worker process sweeps at a time
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (SWEEP_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            sweep_stats.record_skip()
+            return None
+        try:
+            cursor.execute("SELECT NOW(), NOW() - INTERVAL %s MINUTE", (grace,))
+            now, no_show_cutoff = cursor.fetchone()
+            params = {'now': now, 'no_show_cutoff': no_show_cutoff}
+
+            started = time.perf_counter()
+            result = {'started_at': now.isoformat(), 'rows': {}, 'batches': {}}
+            for name, state, select_sql, update_sql in SWEEP_RULES:
+                changed, batches = _run_rule(conn, select_sql, update_sql, params, batch_size)
+                result['rows'][name] = len(changed)
+                result['batches'][name] = batches
+                if changed:
+                    events.publish_session_events(state, changed)
+            result['seconds'] = round(time.perf_counter() - started, 3)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SWEEP_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+    sweep_stats.record(result)
+    if any(result['rows'].values()):
+        logger.info("Session sweep touched %s in %.3fs", result['rows'], result['seconds'])
+    return result
+
+
+def _loop(interval):
+    while not _stop.wait(interval):
+        try:
+            sweep()
+        except Exception:
+            sweep_stats.record_error()
+            logger.exception("Session sweep failed")
+
+
+def start(interval=None):
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(interval or _config['interval'],),
+                               name='session-sweeper', daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop():
+    _stop.set()
+
+
+@click.group('sessions')
+def sessions_cli():
+    """Session housekeeping."""
+
+
+@sessions_cli.command('sweep')
+@click.option('--batch-size', type=int, default=None, help='Rows per UPDATE batch')
+def sweep_command(batch_size):
+    """Close expired sessions, mark no-shows and reject stale requests once."""
+    result = sweep(batch_size=batch_size)
+    if result is None:
+        click.echo("Another process is sweeping; try again later")
+        return
+    for name, count in result['rows'].items():
+        click.echo(f"{name}: {count} row(s) in {result['batches'][name]} batch(es)")
+
+
+@sessions_cli.command('run-scheduler')
+@click.option('--interval', type=float, default=None, help='Seconds between sweeps')
+def run_scheduler_command(interval):
+    """Sweep forever in this process (use with SCHEDULER_INTERVAL=0 on the web workers)."""
+    interval = interval or _config['interval']
+    click.echo(f"Sweeping every {interval:g}s; Ctrl+C to stop")
+    while True:
+        try:
+            result = sweep()
+            if result is not None:
+                click.echo(f"{result['started_at']} {result['rows']}")
+        except Exception:
+            sweep_stats.record_error()
+            logger.exception("Session sweep failed")
+        time.sleep(interval)
+
+
+def init_app(app):
+    _config['interval'] = app.config['SCHEDULER_INTERVAL']
+    _config['batch_size'] = app.config['SWEEP_BATCH_SIZE']
+    _config['no_show_grace_minutes'] = app.config['NO_SHOW_GRACE_MINUTES']
+    app.cli.add_command(sessions_cli)
+
+    # Started by the first request a process serves rather than on import, so CLI
+    # commands, benchmarks and tests don't get a sweeper, and a preforking server
+    # starts the thread in each worker after the fork instead of in the parent
+    @app.before_first_request
+    def start_sweeper():
+        # 0 disables the in-process sweeper, e.g. when `flask sessions run-scheduler` runs separately
+        if _config['interval'] > 0 and not app.testing:
+            start()
@@ -0,0 +1,57 @@
+import threading
+
+from db import get_db_connection
+
+
+class SchemaCache:
+    # Process-wide view of which tables/columns exist, loaded with one
+    # information_schema query instead of per-request SHOW COLUMNS probes
+    def __init__(self):
+        self._columns = None
+        self._lock = threading.Lock()
+
+    def load(self, conn=None):
+        own_connection = conn is None
+        if own_connection:
+            conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            columns = {}
+            for table, column in cursor.fetchall():
+                columns.setdefault(table, []).append(column)
+        finally:
+            cursor.close()
+            if own_connection:
+                conn.close()
+        with self._lock:
+            self._columns = columns
+        return columns
+
+    def invalidate(self):
+        with self._lock:
+            self._columns = None
+
+    def columns(self, table):
+        columns = self._columns
+        if columns is None:
+            columns = self.load()
+        return columns.get(table, [])
+
+    def has_column(self, table, column):
+        return column in self.columns(table)
+
+    def build_insert(self, table, values):
+        # Only insert the columns this database actually has
+        available = self.columns(table)
+        names = [name for name in values if name in available]
+        placeholders = ', '.join(['%s'] * len(names))
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})"
+        return sql, tuple(values[name] for name in names)
+
+
+schema_cache = SchemaCache()
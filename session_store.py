@@ -0,0 +1,112 @@
+import os
+import re
+import secrets
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import cache
+
+# Server-side sessions: the cookie only carries a random session id and the
+# data lives in one of the cache.py backends. The default is a SQLite file
+# shared by every worker process on the host; `memory` keeps sessions in one
+# process and is only usable when there is just one.
+
+KEY_PREFIX = 'session:'
+SID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+
+# Unchanged sessions are re-saved (to push their expiry out) at most this often
+REFRESH_INTERVAL = 60
+
+# How often abandoned sessions are swept out of the backend
+PURGE_INTERVAL = 600
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, saved_at=0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid or _new_sid()
+        self.new = new
+        self.modified = False
+        self.saved_at = saved_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        # New id for the same data, e.g. after login, so a pre-login id can't be reused
+        self.previous_sid = self.previous_sid or self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+class CacheSessionInterface(SessionInterface):
+    def __init__(self, backend):
+        self.backend = backend
+        self._next_purge = time.time() + PURGE_INTERVAL
+
+    def _lifetime(self, app, session):
+        if session.permanent:
+            return int(app.permanent_session_lifetime.total_seconds())
+        return 24 * 60 * 60  # browser-session cookies still expire server-side
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid and SID_PATTERN.match(sid):
+            entry = self.backend.get(KEY_PREFIX + sid)
+            if entry is not None:
+                return ServerSideSession(entry['data'], sid=sid, saved_at=entry['saved_at'])
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.backend.delete(KEY_PREFIX + session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            if not session.new:
+                self.backend.delete(KEY_PREFIX + session.sid)
+            if session.modified:
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        if not session.modified and now - session.saved_at < REFRESH_INTERVAL:
+            return
+
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL
+            self.backend.purge_expired()
+
+        lifetime = self._lifetime(app, session)
+        self.backend.set(KEY_PREFIX + session.sid, {'data': dict(session), 'saved_at': now}, lifetime)
+        response.set_cookie(
+            app.session_cookie_name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_app(app):
+    # Each worker would only know the sessions it created and log everyone else out
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    if app.config['SESSION_BACKEND'] == 'memory' and workers > 1:
+        raise RuntimeError(f"SESSION_BACKEND=memory can't be shared by {workers} worker processes "
+                           "(WEB_CONCURRENCY); use a sqlite:/// backend")
+    backend = cache.create_backend(app.config['SESSION_BACKEND'])
+    app.session_interface = CacheSessionInterface(backend)
+    return backend
@@ -0,0 +1,183 @@
+import click
+
+from db import get_db_connection
+import labs
+
+# Summary tables kept in step with sessions/feedback so the admin dashboard
+# reads a handful of rows instead of scanning the whole history.
+# Every write helper takes the caller's cursor so counters commit (or roll
+# back) in the same transaction as the change they describe.
+
+DEFAULT_LANGUAGES = ['PHP', 'Java', 'Python', 'JavaScript', 'C++', 'C#', 'Ruby', 'Swift']
+
+
+def rebuild(cursor):
+    # Recompute every counter from the base tables (`flask stats rebuild` and the benchmarks)
+    cursor.execute("DELETE FROM stats_language")
+    cursor.execute("""
+    INSERT INTO stats_language (programming_language, session_count)
+    SELECT programming_language, COUNT(*)
+    FROM sessions
+    WHERE programming_language IS NOT NULL
+    GROUP BY programming_language
+    """)
+    cursor.execute("DELETE FROM stats_lab")
+    cursor.execute("""
+    INSERT INTO stats_lab (lab_room, session_count, total_hours)
+    SELECT lab_room, COUNT(*), COALESCE(SUM(duration), 0)
+    FROM sessions
+    GROUP BY lab_room
+    """)
+    cursor.execute("DELETE FROM stats_feedback")
+    cursor.execute("""
+    INSERT INTO stats_feedback (id, total_feedback, rating_sum, positive_feedback, negative_feedback)
+    SELECT 1, COUNT(*), COALESCE(SUM(rating), 0),
+           COALESCE(SUM(CASE WHEN rating >= 4 THEN 1 ELSE 0 END), 0),
+           COALESCE(SUM(CASE WHEN rating <= 2 THEN 1 ELSE 0 END), 0)
+    FROM feedback
+    """)
+
+
+def record_session_added(cursor, lab_room, programming_language, duration):
+    if programming_language is not None:
+        cursor.execute("""
+        INSERT INTO stats_language (programming_language, session_count) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE session_count = session_count + 1
+        """, (programming_language,))
+    cursor.execute("""
+    INSERT INTO stats_lab (lab_room, session_count, total_hours) VALUES (%s, 1, %s)
+    ON DUPLICATE KEY UPDATE session_count = session_count + 1, total_hours = total_hours + VALUES(total_hours)
+    """, (lab_room, int(duration)))
+
+
+def _feedback_delta(rating, sign):
+    rating = int(rating)
+    return (sign, sign * rating, sign if rating >= 4 else 0, sign if rating <= 2 else 0)
+
+
+def record_feedback(cursor, rating, previous_rating=None):
+    # New feedback adds one row; an edit swaps the old rating's contribution for the new one.
+    # Read previous_rating with SELECT ... FOR UPDATE in the same transaction, or two
+    # concurrent edits both subtract the same old rating
+    total, rating_sum, positive, negative = _feedback_delta(rating, 1)
+    if previous_rating is not None:
+        old = _feedback_delta(previous_rating, -1)
+        total, rating_sum, positive, negative = (total + old[0], rating_sum + old[1],
+                                                 positive + old[2], negative + old[3])
+    cursor.execute("""
+    INSERT INTO stats_feedback (id, total_feedback, rating_sum, positive_feedback, negative_feedback)
+    VALUES (1, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        total_feedback = total_feedback + VALUES(total_feedback),
+        rating_sum = rating_sum + VALUES(rating_sum),
+        positive_feedback = positive_feedback + VALUES(positive_feedback),
+        negative_feedback = negative_feedback + VALUES(negative_feedback)
+    """, (total, rating_sum, positive, negative))
+
+
+def record_student_deleted(cursor, student_id):
+    # Must run before the student's sessions and feedback are deleted
+    cursor.execute("""
+    UPDATE stats_language l
+    JOIN (SELECT programming_language, COUNT(*) AS c
+          FROM sessions
+          WHERE student_id = %s AND programming_language IS NOT NULL
+          GROUP BY programming_language) d ON d.programming_language = l.programming_language
+    SET l.session_count = l.session_count - d.c
+    """, (student_id,))
+    cursor.execute("""
+    UPDATE stats_lab l
+    JOIN (SELECT lab_room, COUNT(*) AS c, COALESCE(SUM(duration), 0) AS h
+          FROM sessions
+          WHERE student_id = %s
+          GROUP BY lab_room) d ON d.lab_room = l.lab_room
+    SET l.session_count = l.session_count - d.c, l.total_hours = l.total_hours - d.h
+    """, (student_id,))
+    cursor.execute("""
+    UPDATE stats_feedback sf
+    JOIN (SELECT COUNT(*) AS c, COALESCE(SUM(rating), 0) AS r,
+                 COALESCE(SUM(CASE WHEN rating >= 4 THEN 1 ELSE 0 END), 0) AS p,
+                 COALESCE(SUM(CASE WHEN rating <= 2 THEN 1 ELSE 0 END), 0) AS n
+          FROM feedback
+          WHERE student_id = %s) d
+    SET sf.total_feedback = sf.total_feedback - d.c,
+        sf.rating_sum = sf.rating_sum - d.r,
+        sf.positive_feedback = sf.positive_feedback - d.p,
+        sf.negative_feedback = sf.negative_feedback - d.n
+    WHERE sf.id = 1
+    """, (student_id,))
+
+
+def load_dashboard_stats(cursor):
+    # cursor must be a dictionary cursor; returns (language_stats, lab_stats, feedback_stats)
+    cursor.execute("""
+    SELECT programming_language, session_count AS count
+    FROM stats_language
+    WHERE session_count > 0
+    ORDER BY session_count DESC
+    """)
+    language_stats = cursor.fetchall()
+    language_total = sum(lang['count'] for lang in language_stats)
+    for lang in language_stats:
+        lang['percentage'] = lang['count'] * 100.0 / language_total
+
+    # Ensure we have data for all default languages
+    existing_languages = {lang['programming_language'] for lang in language_stats}
+    for lang in DEFAULT_LANGUAGES:
+        if lang not in existing_languages:
+            language_stats.append({'programming_language': lang, 'count': 0, 'percentage': 0})
+
+    cursor.execute("""
+    SELECT lab_room, session_count AS count, total_hours
+    FROM stats_lab
+    WHERE session_count > 0
+    ORDER BY session_count DESC
+    """)
+    lab_stats = cursor.fetchall()
+    lab_total = sum(lab['count'] for lab in lab_stats)
+    for lab in lab_stats:
+        lab['percentage'] = lab['count'] * 100.0 / lab_total
+
+    # Ensure we have data for all lab rooms
+    existing_labs = {lab['lab_room'] for lab in lab_stats}
+    for lab in labs.lab_codes():
+        if lab not in existing_labs:
+            lab_stats.append({'lab_room': lab, 'count': 0, 'percentage': 0, 'total_hours': 0})
+
+    cursor.execute("""
+    SELECT total_feedback, rating_sum, positive_feedback, negative_feedback
+    FROM stats_feedback
+    WHERE id = 1
+    """)
+    row = cursor.fetchone() or {'total_feedback': 0, 'rating_sum': 0,
+                                'positive_feedback': 0, 'negative_feedback': 0}
+    feedback_stats = {
+        'total_feedback': row['total_feedback'],
+        'average_rating': round(row['rating_sum'] / row['total_feedback'], 4) if row['total_feedback'] else None,
+        'positive_feedback': row['positive_feedback'],
+        'negative_feedback': row['negative_feedback']
+    }
+    return language_stats, lab_stats, feedback_stats
+
+
+@click.group('stats')
+def stats_cli():
+    """Dashboard statistics maintenance."""
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recompute the summary tables from sessions and feedback."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rebuild(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    click.echo("Statistics rebuilt")
+
+
+def init_app(app):
+    app.cli.add_command(stats_cli)
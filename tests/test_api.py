@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+from flask import Flask
+
+import api
+
+UPDATED = datetime.datetime(2024, 9, 2, 9, 30)
+
+
+class RowsCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, statement, params=()):
+        self.statements.append(statement)
+
+    def fetchall(self):
+        return [dict(row) for row in self.rows]
+
+    def fetchone(self):
+        return dict(self.rows[0]) if self.rows else None
+
+    def close(self):
+        pass
+
+
+class RowsConnection:
+    def __init__(self, rows):
+        self.cursor_ = RowsCursor(rows)
+
+    def cursor(self, dictionary=False):
+        return self.cursor_
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    rows = [{'id': 1, 'date_time': UPDATED, 'status': 'pending', 'updated_at': UPDATED}]
+    monkeypatch.setattr(api, 'get_db_connection', lambda: RowsConnection(rows))
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(api.bp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, user_type='admin')
+    return client
+
+
+def test_lists_revalidate_by_etag_only(client):
+    response = client.get('/api/v1/sessions/pending?fields=id,status')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    # A session leaving the list doesn't change the newest updated_at of the rows left in it
+    assert 'Last-Modified' not in response.headers
+
+    cached = client.get('/api/v1/sessions/pending?fields=id,status',
+                        headers={'If-Modified-Since': 'Mon, 02 Sep 2024 09:30:00 GMT'})
+    assert cached.status_code == 200
+
+    etag = response.headers['ETag']
+    assert client.get('/api/v1/sessions/pending?fields=id,status',
+                      headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_single_session_has_last_modified(client):
+    response = client.get('/api/v1/sessions/1?fields=id,status')
+    assert response.status_code == 200
+    assert response.headers['Last-Modified'] == 'Mon, 02 Sep 2024 09:30:00 GMT'
+    assert client.get('/api/v1/sessions/1?fields=id,status',
+                      headers={'If-Modified-Since': 'Mon, 02 Sep 2024 09:30:00 GMT'}).status_code == 304
@@ -0,0 +1,69 @@
+import auth
+
+
+def test_allows_up_to_limit_within_window():
+    limiter = auth.SlidingWindowLimiter(limit=3, window=60)
+    for t in (0, 1, 2):
+        assert limiter.retry_after('ana', now=t) == 0
+        limiter.hit('ana', now=t)
+    assert limiter.retry_after('ana', now=3) == 57
+
+
+def test_hits_expire_after_window():
+    limiter = auth.SlidingWindowLimiter(limit=2, window=60)
+    limiter.hit('ana', now=0)
+    limiter.hit('ana', now=30)
+    assert limiter.retry_after('ana', now=59.5) == 1  # rounded up, never 0 while blocked
+    # The window slides: the first hit drops out at exactly t=60
+    assert limiter.retry_after('ana', now=60) == 0
+    limiter.hit('ana', now=60)
+    assert limiter.retry_after('ana', now=61) == 29
+
+
+def test_keys_are_independent():
+    limiter = auth.SlidingWindowLimiter(limit=1, window=60)
+    limiter.hit('ana', now=0)
+    assert limiter.retry_after('ana', now=1) == 59
+    assert limiter.retry_after('ben', now=1) == 0
+
+
+def test_reset_clears_a_key():
+    limiter = auth.SlidingWindowLimiter(limit=1, window=60)
+    limiter.hit('ana', now=0)
+    limiter.reset('ana')
+    assert limiter.retry_after('ana', now=1) == 0
+    limiter.reset('never-seen')
+
+
+def test_idle_keys_are_pruned():
+    limiter = auth.SlidingWindowLimiter(limit=5, window=60)
+    limiter.hit('ana', now=0)
+    limiter.hit('ben', now=100)
+    assert set(limiter._hits) == {'ben'}
+
+
+def test_prune_when_too_many_keys():
+    limiter = auth.SlidingWindowLimiter(limit=5, window=60, max_keys=2)
+    limiter.hit('a', now=0)
+    limiter.hit('b', now=1)
+    limiter.hit('c', now=60.5)  # 'a' is out of its window and makes room
+    assert set(limiter._hits) == {'b', 'c'}
+
+
+def test_login_limiter_counts_failures_per_username_and_address():
+    limiter = auth.LoginRateLimiter(per_username=2, per_ip=3, window=60)
+    limiter.failed('Ana ', '10.0.0.1')
+    limiter.failed('ana', '10.0.0.1')
+    # Usernames are normalised, so both failures count against the same account
+    assert limiter.check('ANA', '10.0.0.2') > 0
+    assert limiter.check('ben', '10.0.0.1') == 0
+    limiter.failed('ben', '10.0.0.1')
+    assert limiter.check('carl', '10.0.0.1') > 0
+
+
+def test_successful_login_clears_username_but_not_address():
+    limiter = auth.LoginRateLimiter(per_username=1, per_ip=1, window=60)
+    limiter.failed('ana', '10.0.0.1')
+    limiter.succeeded('ana')
+    assert limiter.usernames.retry_after('ana') == 0
+    assert limiter.check('ana', '10.0.0.1') > 0
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+import cache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return cache.create_backend('memory')
+    return cache.create_backend(f'sqlite:///{tmp_path}/cache.sqlite3')
+
+
+def test_get_set_delete(backend):
+    assert backend.get('missing') is None
+    backend.set('a', {'value': 1})
+    backend.set('prefix:1', 1)
+    backend.set('prefix:2', 2)
+    backend.set('prefix_other', 3)
+    assert backend.get('a') == {'value': 1}
+
+    backend.delete('a')
+    backend.delete_prefix('prefix:')
+    assert backend.get('a') is None
+    assert backend.get('prefix:1') is None
+    assert backend.get('prefix_other') == 3
+
+
+def test_expired_entries_are_not_returned(backend, monkeypatch):
+    backend.set('a', 1, ttl=10)
+    now = cache.time.time()
+    monkeypatch.setattr(cache.time, 'time', lambda: now + 11)
+    assert backend.get('a') is None
+
+
+def test_sqlite_connections_are_closed(tmp_path, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        opened.append(connect(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(cache.sqlite3, 'connect', tracking_connect)
+    backend = cache.create_backend(f'sqlite:///{tmp_path}/cache.sqlite3')
+    backend.set('a', 1)
+    backend.get('a')
+    backend.get('missing')
+    backend.delete('a')
+    backend.delete_prefix('a')
+    backend.purge_expired()
+
+    assert len(opened) == 7
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+
+def test_sqlite_entries_are_shared_between_backends(tmp_path):
+    url = f'sqlite:///{tmp_path}/cache.sqlite3'
+    cache.create_backend(url).set('a', 1)
+    assert cache.create_backend(url).get('a') == 1
@@ -0,0 +1,39 @@
+import pytest
+
+import credentials
+
+
+@pytest.fixture
+def pool():
+    credentials.configure(iterations=1000, workers=1, queue_limit=4)
+    yield
+    credentials.shutdown()
+
+
+def test_hash_and_verify_in_pool_worker(pool):
+    stored = credentials.hash_password('correct horse')
+    assert stored.startswith('pbkdf2:sha256:1000$')
+    assert credentials.verify_password(stored, 'correct horse')
+    assert not credentials.verify_password(stored, 'wrong')
+    assert not credentials.verify_password(None, 'correct horse')
+
+
+def test_pool_inherited_through_fork_is_replaced(pool, monkeypatch):
+    parent_executor = credentials._get_executor()
+    monkeypatch.setattr(credentials, '_executor_pid', -1)
+    assert credentials._get_executor() is not parent_executor
+    parent_executor.shutdown(wait=False)
+
+
+def test_hashing_on_request_thread_without_workers():
+    credentials.configure(iterations=1000, workers=0)
+    assert credentials._get_executor() is None
+    assert credentials.verify_password(credentials.hash_password('pw'), 'pw')
+
+
+def test_busy_when_queue_is_full(pool):
+    credentials.configure(iterations=1000, workers=0, queue_limit=1, queue_timeout=0.01)
+    credentials._slots.acquire()
+    with pytest.raises(credentials.CredentialServiceBusy):
+        credentials.hash_password('pw')
+    credentials._slots.release()
@@ -0,0 +1,65 @@
+import pytest
+
+import db
+
+
+class FakeConnection:
+    def __init__(self):
+        self.unread_result = False
+        self.in_transaction = False
+        self.rolled_back = False
+        self.closed = False
+
+    def rollback(self):
+        self.rolled_back = True
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+    def ping(self, reconnect=False):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = db.ConnectionPool({}, size=2, timeout=0.1)
+    created = []
+
+    def new_connection():
+        created.append(FakeConnection())
+        return created[-1]
+
+    monkeypatch.setattr(pool, '_new_connection', new_connection)
+    pool.created = created
+    return pool
+
+
+def test_released_connection_is_reused(pool):
+    first = pool.connect()
+    first.close()
+    second = pool.connect()
+    assert second._connection is pool.created[0]
+    assert len(pool.created) == 1
+
+
+def test_open_transaction_is_rolled_back_on_release(pool):
+    conn = pool.connect()
+    conn._connection.in_transaction = True
+    conn.close()
+    assert pool.created[0].rolled_back
+    assert pool.stats()['idle'] == 1
+
+
+def test_connection_with_unread_result_is_discarded(pool):
+    # e.g. a streamed export abandoned when the client disconnected
+    conn = pool.connect()
+    conn._connection.unread_result = True
+    conn.close()
+    assert pool.created[0].closed
+    assert pool.stats()['idle'] == 0
+    assert pool.stats()['connections_discarded'] == 1
+
+    # The slot is free again and the next request gets a fresh connection
+    assert pool.connect()._connection is pool.created[1]
+    assert pool.stats()['in_use'] == 1
@@ -0,0 +1,98 @@
+import pytest
+
+import events
+
+
+def read_events(stream, count):
+    return [next(stream) for _ in range(count)]
+
+
+def test_publish_reaches_subscribers_with_ids():
+    hub = events.EventHub()
+    subscriber, missed = hub.subscribe()
+    assert missed == []
+    hub.publish('session', {'id': 1, 'state': 'approved'})
+    message = subscriber.queue.get_nowait()
+    assert message.startswith(f'id: {hub._epoch}-1\nevent: session\n')
+    assert '"state": "approved"' in message
+
+
+def test_subscriber_limit():
+    hub = events.EventHub(max_subscribers=2)
+    first, _ = hub.subscribe()
+    hub.subscribe()
+    with pytest.raises(events.TooManySubscribers):
+        hub.subscribe()
+    hub.unsubscribe(first)
+    hub.subscribe()
+    assert hub.subscriber_count() == 2
+
+
+def test_stream_ends_after_max_lifetime_and_frees_its_slot():
+    hub = events.EventHub(max_subscribers=1, max_lifetime=0.05)
+    subscriber, missed = hub.subscribe()
+    messages = list(hub.stream(subscriber, missed, heartbeat=0.01))
+    assert messages[0] == 'retry: 3000\n\n'
+    assert hub.subscriber_count() == 0
+
+
+def test_reconnect_replays_missed_events():
+    hub = events.EventHub()
+    hub.publish('session', {'id': 1})
+    first_id = f'{hub._epoch}-1'
+    hub.publish('session', {'id': 2})
+    hub.publish('session', {'id': 3})
+
+    _, missed = hub.subscribe(last_event_id=first_id)
+    assert [m.split('\n')[0] for m in missed] == [f'id: {hub._epoch}-2', f'id: {hub._epoch}-3']
+
+    # Ids from another process or an older run can't be matched up; nothing is replayed
+    _, missed = hub.subscribe(last_event_id='deadbeef-1')
+    assert missed == []
+    _, missed = hub.subscribe(last_event_id='garbage')
+    assert missed == []
+
+
+def test_stream_sends_missed_events_before_live_ones():
+    hub = events.EventHub(max_lifetime=5)
+    hub.publish('session', {'id': 1})
+    subscriber, missed = hub.subscribe(last_event_id=f'{hub._epoch}-0')
+    stream = hub.stream(subscriber, missed, heartbeat=0.01)
+    hub.publish('session', {'id': 2})
+    retry, replayed, live = read_events(stream, 3)
+    assert '"id": 1' in replayed
+    assert '"id": 2' in live
+    stream.close()
+    assert hub.subscriber_count() == 0
+
+
+def test_events_published_between_streams_are_replayed(monkeypatch):
+    hub = events.EventHub(max_lifetime=0.01)
+    monkeypatch.setattr(events, 'hub', hub)
+    lookups = []
+
+    def load_session_events(session_ids):
+        lookups.append(session_ids)
+        return {session_id: {'id': session_id} for session_id in session_ids}
+
+    monkeypatch.setattr(events, 'load_session_events', load_session_events)
+
+    # Nobody has ever connected, so no page can ask for these; no lookup is made
+    assert events.publish_session_event('requested', 1) is None
+    assert lookups == []
+
+    subscriber, missed = hub.subscribe()
+    hub.publish('session', {'id': 0})
+    last_id = subscriber.queue.get_nowait().split('\n')[0][len('id: '):]
+    list(hub.stream(subscriber, missed, heartbeat=0.01))
+    assert hub.subscriber_count() == 0
+
+    # The stream hit its lifetime; these land in the gap before the browser reconnects
+    events.publish_session_event('requested', 2)
+    events.publish_session_events('approved', [3, 4])
+
+    _, missed = hub.subscribe(last_event_id=last_id)
+    assert len(missed) == 3
+    for message, session_id in zip(missed, (2, 3, 4)):
+        assert f'"id": {session_id},' in message
+    assert '"state": "requested"' in missed[0]
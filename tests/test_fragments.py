@@ -0,0 +1,106 @@
+import os
+
+import pytest
+from flask import Flask, render_template
+
+import cache
+import fragments
+
+PAGE = """\
+{% cache 'rows', data_version(rows), fragment_version('feedback') %}
+{% for row in load_rows() %}<li>{{ row }}</li>{% endfor %}
+{% endcache %}
+<p>{{ title }}</p>"""
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_backend', cache.MemoryBackend())
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'page.html').write_text(PAGE)
+    app = Flask(__name__, root_path=str(tmp_path))
+    app.config.update(FRAGMENT_CACHE_TTL=300, TEMPLATE_CACHE_DIR=str(tmp_path / 'template_cache'))
+    fragments.init_app(app)
+    return app
+
+
+@pytest.fixture
+def render(app):
+    calls = []
+
+    def render(rows, title='Dashboard'):
+        def load_rows():
+            calls.append(1)
+            return rows
+        with app.test_request_context():
+            return render_template('page.html', rows=rows, load_rows=load_rows, title=title)
+
+    render.calls = calls
+    return render
+
+
+def test_miss_then_hit(render):
+    first = render(['a', 'b'])
+    assert '<li>a</li><li>b</li>' in first
+    assert render(['a', 'b']) == first
+    # The block's data is only loaded on the miss
+    assert len(render.calls) == 1
+
+
+def test_uncached_parts_still_render(render):
+    render(['a'])
+    assert '<p>Other</p>' in render(['a'], title='Other')
+    assert len(render.calls) == 1
+
+
+def test_changed_data_version_misses(render):
+    render(['a'])
+    assert '<li>c</li>' in render(['c'])
+    assert len(render.calls) == 2
+
+
+def test_bump_invalidates(render):
+    render(['a'])
+    fragments.bump('feedback')
+    render(['a'])
+    assert len(render.calls) == 2
+    render(['a'])
+    assert len(render.calls) == 2
+
+
+def test_invalidate_all(render):
+    render(['a'])
+    fragments.invalidate_all()
+    render(['a'])
+    assert len(render.calls) == 2
+
+
+def test_output_is_escaped_once(render):
+    rows = ['<script>alert(1)</script>']
+    miss = render(rows)
+    hit = render(rows)
+    assert '<li>&lt;script&gt;alert(1)&lt;/script&gt;</li>' in miss
+    assert hit == miss
+
+
+def test_data_version_is_stable_and_order_sensitive():
+    assert fragments.data_version([1, 2], {'a': 1}) == fragments.data_version([1, 2], {'a': 1})
+    assert fragments.data_version([1, 2]) != fragments.data_version([2, 1])
+    assert len(fragments.data_version()) == 16
+
+
+def test_template_change_gets_a_new_namespace(app, tmp_path):
+    before = app.jinja_env.fragment_namespace
+    page = tmp_path / 'templates' / 'page.html'
+    page.write_text(PAGE + '\n<footer></footer>')
+    os.utime(page, (1, 1))
+    other = Flask(__name__, root_path=str(tmp_path))
+    other.config.update(FRAGMENT_CACHE_TTL=300, TEMPLATE_CACHE_DIR='')
+    fragments.init_app(other)
+    assert other.jinja_env.fragment_namespace != before
+    assert other.jinja_env.bytecode_cache is None
+
+
+def test_compiled_templates_are_written_to_the_cache_dir(render, tmp_path):
+    render(['a'])
+    assert list((tmp_path / 'template_cache').iterdir())
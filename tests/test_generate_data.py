@@ -0,0 +1,141 @@
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import generate_data  # noqa: E402
+
+NOW = datetime.datetime(2025, 3, 3)
+PASSWORD_HASH = 'pbkdf2:sha256:1$salt$hash'
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+        self.closed = False
+
+    def add(self, row):
+        self.rows.append(row)
+
+    def close(self):
+        self.closed = True
+
+
+def generate(seed, students=200, sessions=3000, feedback=500, future_days=14):
+    # The same steps as main(), minus the database
+    rng = random.Random(seed)
+    clock = generate_data.Clock(NOW + datetime.timedelta(days=future_days - generate_data.SEMESTER_DAYS))
+    tables = {name: ListWriter() for name in ('students', 'sessions', 'feedback')}
+    generate_data.generate_students(tables['students'], students, rng, clock, PASSWORD_HASH)
+    completed = generate_data.generate_sessions(tables['sessions'], sessions, students, rng, clock, NOW, 500)
+    generate_data.generate_feedback(tables['feedback'], feedback, completed, rng, clock)
+    return {name: writer.rows for name, writer in tables.items()}
+
+
+def test_same_seed_gives_same_rows():
+    assert generate(42) == generate(42)
+
+
+def test_different_seed_gives_different_rows():
+    first, second = generate(42), generate(43)
+    assert first['sessions'] != second['sessions']
+    assert first['students'] != second['students']
+
+
+def test_row_shapes_and_ids():
+    data = generate(7)
+    assert all(len(row) == len(generate_data.STUDENT_COLUMNS) for row in data['students'])
+    assert all(len(row) == len(generate_data.SESSION_COLUMNS) for row in data['sessions'])
+    assert all(len(row) == len(generate_data.FEEDBACK_COLUMNS) for row in data['feedback'])
+    assert [row[0] for row in data['sessions']] == list(range(1, 3001))
+    assert {row[1] for row in data['sessions']} <= set(range(1, 201))
+    assert len({row[1] for row in data['students']}) == 200  # idno is unique
+
+
+def test_sessions_are_consistent():
+    data = generate(7)
+    lab_codes = {code for code, _ in generate_data.labs.DEFAULT_LABS}
+    now = f'{NOW:%Y-%m-%d %H:%M:%S}'
+    for (_, _, lab, begins, duration, _, _, status, approval, check_in, check_out, created_at) in data['sessions']:
+        assert lab in lab_codes
+        assert created_at < begins
+        hour = int(begins[11:13])
+        assert 8 <= hour <= 19 and hour + duration <= 21  # labs close at 21:00
+        if begins > now:
+            assert (status, approval) in {('pending', 'pending'), ('active', 'approved')}
+        if status == 'completed':
+            assert check_in < check_out
+        else:
+            assert check_in is None and check_out is None
+
+
+def test_feedback_only_on_completed_sessions():
+    data = generate(7)
+    completed = {row[0]: row for row in data['sessions'] if row[7] == 'completed'}
+    session_ids = [row[1] for row in data['feedback']]
+    assert len(session_ids) == len(set(session_ids)) == 500
+    for _, session_id, student_id, rating, _, created_at in data['feedback']:
+        session = completed[session_id]
+        assert student_id == session[1]
+        assert created_at > session[10]
+        assert 1 <= rating <= 5
+
+
+def test_feedback_capped_by_completed_sessions():
+    data = generate(7, sessions=50, feedback=1000)
+    assert len(data['feedback']) == sum(1 for row in data['sessions'] if row[7] == 'completed')
+
+
+def test_activity_is_skewed_but_capped():
+    counts = {}
+    for row in generate(3, students=500, sessions=20000)['sessions']:
+        counts[row[1]] = counts.get(row[1], 0) + 1
+    average = 20000 / 500
+    assert max(counts.values()) < 12 * average
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+
+def test_insert_writer_batches_and_quotes():
+    conn = RecordingConnection()
+    writer = generate_data.InsertWriter(conn, 'feedback', ['id', 'comments'], batch_size=2)
+    for row in [(1, "Lab's aircon"), (2, None), (3, 'back\\slash')]:
+        writer.add(row)
+    writer.close()
+    assert [statement for statement, _ in conn.statements] == [
+        "INSERT INTO feedback (id, comments) VALUES (1,'Lab''s aircon'),(2,NULL)",
+        "INSERT INTO feedback (id, comments) VALUES (3,'back\\\\slash')",
+    ]
+    assert conn.commits == 2
+
+
+def test_infile_writer_escapes_fields():
+    conn = RecordingConnection()
+    writer = generate_data.InfileWriter(conn, 'feedback', ['id', 'comments'], batch_size=2)
+    for row in [(1, 'tab\there'), (2, None), (3, 'two\nlines')]:
+        writer.add(row)
+    with open(writer.file.name) as f:
+        writer.file.flush()
+        content = f.read()
+    writer.close()
+    assert content == '1\ttab\\there\n2\t\\N\n3\ttwo\\nlines\n'
+    assert 'LOAD DATA LOCAL INFILE' in conn.statements[0][0]
+    assert not os.path.exists(writer.file.name)
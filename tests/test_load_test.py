@@ -0,0 +1,116 @@
+import os
+import random
+import sys
+import threading
+
+import pytest
+from flask import Flask, redirect, request, session
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import load_test  # noqa: E402
+
+
+def make_app():
+    # Stands in for the real app: the harness only relies on the login redirect,
+    # the session cookie and the Server-Timing header
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        if request.form['password'] != load_test.PASSWORD and request.form['username'] != 'admin':
+            return 'bad', 200
+        session['user'] = request.form['username']
+        return redirect('/')
+
+    @app.route('/admin-dashboard')
+    def admin_dashboard():
+        if session.get('user') != 'admin':
+            return 'login first', 403
+        return 'ok'
+
+    @app.route('/admin/approve-session/<int:session_id>', methods=['POST'])
+    def approve(session_id):
+        return {'ok': True}
+
+    @app.after_request
+    def timing(response):
+        response.headers['Server-Timing'] = 'db;dur=1.5;desc="3 queries", app;dur=4.0'
+        return response
+
+    return app
+
+
+@pytest.fixture
+def scenarios():
+    return load_test.Scenarios(10, [101, 102, 103], ['Lab 1'], random.Random(1))
+
+
+@pytest.fixture
+def http_port():
+    server = make_server('127.0.0.1', 0, make_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+
+
+def test_percentile():
+    values = [0.001 * n for n in range(1, 101)]
+    assert load_test.percentile(values, 50) == pytest.approx(51)
+    assert load_test.percentile(values, 99) == pytest.approx(100)
+    assert load_test.percentile([0.002], 95) == pytest.approx(2)
+
+
+def test_test_client_driver_scenario(scenarios):
+    app = make_app()
+    result = load_test.run_scenario(lambda: load_test.FlaskClientDriver(app), scenarios,
+                                    'admin_dashboard', 'admin', 20, 1)
+    assert result['requests'] == 20
+    assert result['errors'] == 0
+    assert result['queries_per_request'] == 3
+    assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+
+
+def test_http_driver_keeps_the_session_cookie(scenarios, http_port):
+    result = load_test.run_scenario(lambda: load_test.HttpDriver(http_port), scenarios,
+                                    'admin_dashboard', 'admin', 12, 3)
+    assert result['requests'] == 12
+    assert result['errors'] == 0
+    assert result['threads'] == 3
+
+
+def test_errors_are_counted(scenarios):
+    app = make_app()
+    # No login first, so every request is refused
+    result = load_test.run_scenario(lambda: load_test.FlaskClientDriver(app), scenarios,
+                                    'admin_dashboard', None, 5, 1)
+    assert result['errors'] == 5
+
+
+def test_approvals_stop_when_pending_sessions_run_out(scenarios):
+    app = make_app()
+    result = load_test.run_scenario(lambda: load_test.FlaskClientDriver(app), scenarios,
+                                    'approve_session', 'admin', 10, 1)
+    assert result['requests'] == 3
+
+
+def test_failed_login_raises():
+    driver = load_test.FlaskClientDriver(make_app())
+    with pytest.raises(RuntimeError, match='login as student1 failed'):
+        load_test.login(driver, 'student1', 'wrong')
+
+
+def results(p95_by_scenario):
+    return {'drivers': {'http': {name: {'requests': 10, 'p95_ms': p95} for name, p95 in p95_by_scenario.items()}}}
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance():
+    earlier = results({'login': 100.0, 'admin_dashboard': 50.0, 'export_csv': 10.0})
+    current = results({'login': 115.0, 'admin_dashboard': 70.0, 'export_csv': 5.0})
+    assert load_test.compare(earlier, current, 0.2) == ['http/admin_dashboard']
+
+
+def test_compare_skips_scenarios_missing_from_earlier_run():
+    assert load_test.compare({'drivers': {}}, results({'login': 100.0}), 0.2) == []
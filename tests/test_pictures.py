@@ -0,0 +1,148 @@
+import contextlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import pictures
+
+
+class LookupCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, statement, params=()):
+        pass
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    pictures.configure(folder=str(tmp_path), workers=0)
+    yield tmp_path
+    pictures.configure(folder='static/profile_pictures', workers=1)
+
+
+def png(width, height, color='red'):
+    buf = io.BytesIO()
+    pictures.Image.new('RGB', (width, height), color).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_variant_names():
+    digest = 'a' * 32
+    assert pictures.variant_names(f'{digest}.jpg') == [f'{digest}.jpg', f'{digest}_thumb.jpg', f'{digest}.webp']
+    # Pictures from before content-hash naming, or stored unresized, have no variants
+    assert pictures.variant_names('legacy_upload.png') == ['legacy_upload.png']
+    assert pictures.variant_names(f'{digest}.png') == [f'{digest}.png']
+
+
+def test_empty_and_oversized_uploads_are_refused(folder):
+    with pytest.raises(pictures.PictureError, match='empty'):
+        pictures._store_bytes(b'')
+    with pytest.raises(pictures.PictureError, match='smaller than'):
+        pictures._store_bytes(b'x' * (pictures.MAX_UPLOAD_BYTES + 1))
+
+
+def test_upload_is_resized_with_thumbnail_and_webp(folder):
+    filename = pictures._store_bytes(png(1600, 900))
+    assert pictures.STORED_NAME.match(filename)
+    with pictures.Image.open(folder / filename) as image:
+        assert image.format == 'JPEG'
+        assert max(image.size) == pictures.MAX_SIZE
+    with pictures.Image.open(folder / pictures.thumbnail(filename)) as thumb:
+        assert thumb.size == (pictures.THUMB_SIZE, pictures.THUMB_SIZE)
+    assert pictures.webp(filename).endswith('.webp')
+
+
+def test_same_image_is_stored_once(folder):
+    data = png(300, 300)
+    assert pictures._store_bytes(data) == pictures._store_bytes(data)
+    assert len(os.listdir(folder)) == 3
+    assert pictures._store_bytes(png(300, 300, 'blue')) != pictures._store_bytes(data)
+
+
+def test_non_image_is_refused(folder):
+    with pytest.raises(pictures.PictureError):
+        pictures._store_bytes(b'GIF89a but not really a gif')
+    with pytest.raises(pictures.PictureError):
+        pictures._store_bytes(b'<?php echo 1; ?>')
+    assert os.listdir(folder) == []
+
+
+def test_metadata_is_stripped(folder):
+    image = pictures.Image.new('RGB', (64, 64), 'green')
+    exif = image.getexif()
+    exif[0x010F] = 'Camera maker'
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG', exif=exif.tobytes())
+    filename = pictures._store_bytes(buf.getvalue())
+    with pictures.Image.open(folder / filename) as stored:
+        assert not stored.getexif()
+        assert 'exif' not in stored.info
+
+
+def test_app_refuses_to_start_without_pillow(monkeypatch):
+    monkeypatch.setattr(pictures, 'Image', None)
+    with pytest.raises(RuntimeError, match='Pillow'):
+        pictures.init_app(None)
+
+
+def test_thumbnail_falls_back_to_picture(folder):
+    assert pictures.thumbnail(None) == pictures.DEFAULT_PICTURE
+    assert pictures.thumbnail('legacy_upload.png') == 'legacy_upload.png'
+    assert pictures.webp('legacy_upload.png') is None
+
+
+def test_release_keeps_referenced_and_defers_recent_files(folder, monkeypatch):
+    deferred = []
+    monkeypatch.setattr(pictures, 'release_later', lambda name, delay: deferred.append((name, delay)))
+    filename = pictures._store_bytes(png(200, 200))
+    # Still used by another student
+    assert pictures.release(LookupCursor([(1,)]), filename) == 0
+    assert deferred == []
+    # Unused but inside the grace period, e.g. being saved for someone else right now
+    assert pictures.release(LookupCursor([]), filename) == 0
+    assert [name for name, _ in deferred] == [filename]
+    assert 0 < deferred[0][1] <= pictures.GC_GRACE_SECONDS
+    assert len(os.listdir(folder)) == 3
+    for name in pictures.variant_names(filename):
+        age(folder / name, pictures.GC_GRACE_SECONDS + 1)
+    assert pictures.release(LookupCursor([]), filename) == 3
+    assert os.listdir(folder) == []
+
+
+def test_release_ignores_default_and_paths(folder):
+    assert pictures.release(LookupCursor([]), pictures.DEFAULT_PICTURE) == 0
+    assert pictures.release(LookupCursor([]), '../app.py') == 0
+
+
+def test_release_later_collects_after_the_delay(folder, monkeypatch):
+    filename = pictures._store_bytes(png(200, 200))
+    for name in pictures.variant_names(filename):
+        age(folder / name, pictures.GC_GRACE_SECONDS + 1)
+    released = threading.Event()
+
+    @contextlib.contextmanager
+    def connection_cursor():
+        yield None, LookupCursor([])
+        released.set()
+
+    monkeypatch.setattr(pictures, 'connection_cursor', connection_cursor)
+    pictures.release_later(filename, 0.01)
+    pictures.release_later(filename, 0.01)  # already scheduled
+    assert released.wait(5)
+    assert os.listdir(folder) == []
+    assert pictures._deferred == {}
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+from flask import Flask, render_template_string
+
+import metrics
+import profiling
+
+
+def run_query(seconds):
+    # Stands in for a lazy loader's SQL: time passes, and the cursor wrapper reports it
+    time.sleep(seconds)
+    metrics.record_query('SELECT 1', seconds)
+    return []
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config.update(PROFILE_DIR=str(tmp_path), PROFILE_SAMPLE_RATE=0, PROFILE_KEEP=50)
+    profiling.init_app(app)
+
+    @app.route('/dashboard')
+    def dashboard():
+        run_query(0.05)
+        return render_template_string('{% for row in load() %}{{ row }}{% endfor %}',
+                                      load=lambda: run_query(0.2))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_type'] = 'admin'
+    return client
+
+
+def test_sql_run_inside_templates_is_not_template_time(client):
+    response = client.get('/dashboard', headers={'X-Profile': '1'})
+    summary = profiling.get_profile(response.headers['X-Profile-Id'])
+
+    assert summary['queries'] == 2
+    assert summary['db_ms'] == pytest.approx(250, abs=1)
+    # The 200ms query ran during rendering; it is only counted as DB time
+    assert summary['template_ms'] < 100
+    parts = summary['db_ms'] + summary['template_ms'] + summary['python_ms']
+    assert parts == pytest.approx(summary['total_ms'], abs=1)
+
+
+def test_requests_without_the_flag_are_not_profiled(client):
+    response = client.get('/dashboard')
+    assert 'X-Profile-Id' not in response.headers
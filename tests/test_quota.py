@@ -0,0 +1,158 @@
+import pytest
+
+import quota
+
+
+class ScriptedCursor:
+    """Plays back one (rowcount, rows) reply per execute() and records the statements."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.statements = []
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, statement, params=()):
+        self.statements.append((' '.join(statement.split()), params))
+        self.rowcount, self._rows = self.replies.pop(0)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def executed(self, prefix):
+        return [params for statement, params in self.statements if statement.startswith(prefix)]
+
+
+@pytest.mark.parametrize('used, pending, maximum, remaining', [
+    (0, 0, 30, 30),
+    (10, 5, 30, 15),
+    (28, 1, 30, 1),
+])
+def test_request_allowed_while_used_plus_pending_is_below_quota(used, pending, maximum, remaining):
+    assert quota.remaining_for_request(used, pending, maximum) == remaining
+
+
+@pytest.mark.parametrize('used, pending, maximum, message', [
+    (30, 0, 30, 'used all'),
+    (31, 0, 30, 'used all'),
+    (29, 1, 30, 'pending requests'),
+    (20, 15, 30, 'pending requests'),
+])
+def test_request_rejected_once_used_plus_pending_reaches_quota(used, pending, maximum, message):
+    with pytest.raises(quota.QuotaError, match=message):
+        quota.remaining_for_request(used, pending, maximum)
+
+
+def test_check_request_counts_pending_sessions():
+    cursor = ScriptedCursor((1, [(25, 30)]), (1, [(5,)]))
+    with pytest.raises(quota.QuotaError):
+        quota.check_request(cursor, 7)
+    assert 'FOR UPDATE' in cursor.statements[0][0]
+
+    cursor = ScriptedCursor((1, [{'sessions_used': 25, 'max_sessions': 30}]), (1, [{'pending': 4}]))
+    assert quota.check_request(cursor, 7) == 1
+
+
+def test_check_request_unknown_student():
+    with pytest.raises(quota.QuotaError, match='not found'):
+        quota.check_request(ScriptedCursor((0, [])), 7)
+
+
+@pytest.mark.parametrize('used, maximum, granted', [
+    (0, 30, [1, 2, 3]),
+    (28, 30, [1, 2]),
+    (30, 30, []),
+    (32, 30, []),
+])
+def test_fit_within_quota(used, maximum, granted):
+    assert quota.fit_within_quota([1, 2, 3], used, maximum) == granted
+
+
+def test_allocate_grants_only_what_fits_and_increments_once():
+    cursor = ScriptedCursor(
+        (2, [{'id': 1, 'sessions_used': 29, 'max_sessions': 30},
+             {'id': 2, 'sessions_used': 30, 'max_sessions': 30}]),
+        (1, []),
+    )
+    granted = quota.allocate(cursor, {2: [20, 21], 1: [10, 11, 12]})
+    assert granted == {10}
+    # Student rows are locked in id order, then one grouped increment for the students that got sessions
+    assert cursor.statements[0][1] == (1, 2)
+    assert cursor.executed('UPDATE students') == [(1, 1, 1)]
+
+
+def test_allocate_nothing_fits():
+    cursor = ScriptedCursor((1, [{'id': 1, 'sessions_used': 30, 'max_sessions': 30}]))
+    assert quota.allocate(cursor, {1: [10]}) == set()
+    assert cursor.executed('UPDATE') == []
+
+
+def test_approve_session_reserves_quota():
+    cursor = ScriptedCursor(
+        (1, []),                              # claim the idempotency key
+        (1, [(7, 'pending', 'pending')]),     # lock the session
+        (1, []),                              # reserve quota
+        (1, []),                              # approve
+        (1, []),                              # store the result
+    )
+    assert quota.approve_session(cursor, 42, 'key-1') == 'approved'
+    assert cursor.executed('UPDATE students SET sessions_used = sessions_used +') == [(1, 7, 1)]
+    assert cursor.executed('UPDATE idempotency_keys') == [('approved', 'key-1')]
+
+
+def test_approve_session_out_of_quota():
+    cursor = ScriptedCursor((1, [(7, 'pending', 'pending')]), (0, []))
+    assert quota.approve_session(cursor, 42) == 'quota_exceeded'
+    assert cursor.executed('UPDATE sessions') == []
+
+
+def test_replayed_idempotency_key_returns_stored_result():
+    cursor = ScriptedCursor(
+        (0, []),                              # key already claimed
+        (1, [('approve', 42, 'approved')]),   # the first request's stored result
+    )
+    assert quota.approve_session(cursor, 42, 'key-1') == 'approved'
+    # Nothing else runs: no second quota reservation
+    assert len(cursor.statements) == 2
+
+
+def test_replayed_key_for_another_request_is_refused():
+    cursor = ScriptedCursor((0, []), (1, [('approve', 41, 'approved')]))
+    with pytest.raises(quota.QuotaError, match='different request'):
+        quota.approve_session(cursor, 42, 'key-1')
+
+    with pytest.raises(quota.QuotaError):
+        quota.replayed_result('approve', 42, 'approved', 'reject', 42)
+
+
+def test_overlong_idempotency_key():
+    with pytest.raises(quota.QuotaError, match='longer than'):
+        quota.approve_session(ScriptedCursor(), 42, 'k' * (quota.IDEMPOTENCY_KEY_MAX_LENGTH + 1))
+
+
+def test_reject_only_pending_sessions():
+    cursor = ScriptedCursor((1, []))
+    assert quota.reject_session(cursor, 42) == 'rejected'
+    assert "approval_status = 'pending'" in cursor.statements[0][0]
+
+    assert quota.reject_session(ScriptedCursor((0, []), (1, [(42,)])), 42) == 'not_pending'
+    assert quota.reject_session(ScriptedCursor((0, []), (0, [])), 42) == 'not_found'
+
+
+def test_reject_never_touches_quota():
+    cursor = ScriptedCursor((0, []), (1, [(42,)]))
+    quota.reject_session(cursor, 42)
+    assert cursor.executed('UPDATE students') == []
+
+
+def test_cancel_approved_session_gives_quota_back():
+    cursor = ScriptedCursor((1, [('active', 'approved')]), (1, []), (1, []))
+    assert quota.cancel_session(cursor, 42, 7) == 'cancelled'
+    assert cursor.executed('UPDATE students SET sessions_used = GREATEST') == [(1, 7)]
+
+    cursor = ScriptedCursor((1, [('pending', 'pending')]), (1, []))
+    assert quota.cancel_session(cursor, 42, 7) == 'cancelled'
+    assert cursor.executed('UPDATE students') == []
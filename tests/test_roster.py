@@ -0,0 +1,77 @@
+import pytest
+
+import roster
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statement = None
+        self.params = None
+
+    def execute(self, statement, params=()):
+        self.statement = ' '.join(statement.split())
+        self.params = params
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+def student(id, lastname, firstname='A', idno=None, course='1'):
+    return {'id': id, 'lastname': lastname, 'firstname': firstname, 'idno': idno or f'{id:05d}',
+            'course': course}
+
+
+@pytest.mark.parametrize('values', [
+    ['Dela Cruz', 'Juan', 42],
+    ['2024-00001', 7],
+    ['1', 'Ñuñez', 'José', 3],
+    [],
+])
+def test_cursor_round_trip(values):
+    token = roster.encode_cursor(values)
+    assert not set(token) & set('+/')  # safe to put in a query string
+    assert roster.decode_cursor(token) == values
+
+
+@pytest.mark.parametrize('token', ['', 'not base64!', roster.encode_cursor({'id': 1})[:-2], 'NQ=='])
+def test_invalid_cursor(token):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        roster.decode_cursor(token)
+
+
+def test_next_cursor_points_after_last_row_of_page():
+    rows = [student(1, 'Abad'), student(2, 'Bautista'), student(3, 'Cruz')]
+    cursor = RecordingCursor(rows)
+    students, next_cursor = roster.fetch_roster_page(cursor, limit=2)
+    assert [s['id'] for s in students] == [1, 2]
+    assert roster.decode_cursor(next_cursor) == ['Bautista', 'A', 2]
+    # One extra row is fetched to detect the next page
+    assert cursor.params[-1] == 3
+
+
+def test_last_page_has_no_next_cursor():
+    students, next_cursor = roster.fetch_roster_page(RecordingCursor([student(1, 'Abad')]), limit=2)
+    assert len(students) == 1
+    assert next_cursor is None
+
+
+@pytest.mark.parametrize('direction, comparison', [('asc', '>'), ('desc', '<')])
+def test_after_cursor_becomes_a_row_comparison(direction, comparison):
+    cursor = RecordingCursor([])
+    after = roster.encode_cursor(['2024-00001', 7])
+    roster.fetch_roster_page(cursor, sort='idno', direction=direction, after=after, limit=10)
+    assert f'(idno, id) {comparison} (%s, %s)' in cursor.statement
+    assert cursor.params == ('2024-00001', 7, 11)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    after = roster.encode_cursor(['Bautista', 'A', 2])
+    with pytest.raises(ValueError):
+        roster.fetch_roster_page(RecordingCursor([]), sort='idno', after=after)
+
+
+def test_search_escapes_like_wildcards():
+    cursor = RecordingCursor([])
+    roster.fetch_roster_page(cursor, search='50%_off')
+    assert cursor.params[:3] == ('50\\%\\_off%',) * 3
@@ -0,0 +1,38 @@
+import pytest
+from flask import Flask
+
+import scheduler
+
+
+def make_app(interval=60, testing=False):
+    app = Flask(__name__)
+    app.config.update(SCHEDULER_INTERVAL=interval, SWEEP_BATCH_SIZE=500, NO_SHOW_GRACE_MINUTES=30,
+                      TESTING=testing)
+    app.add_url_rule('/', 'index', lambda: 'ok')
+    return app
+
+
+@pytest.fixture
+def starts(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduler, 'start', lambda *args: calls.append(args))
+    return calls
+
+
+def test_sweeper_starts_on_first_request_not_on_setup(starts):
+    app = make_app()
+    scheduler.init_app(app)
+    assert starts == []
+
+    client = app.test_client()
+    client.get('/')
+    client.get('/')
+    assert len(starts) == 1
+
+
+@pytest.mark.parametrize('interval, testing', [(0, False), (60, True)])
+def test_sweeper_not_started_when_disabled_or_testing(starts, interval, testing):
+    app = make_app(interval, testing)
+    scheduler.init_app(app)
+    app.test_client().get('/')
+    assert starts == []
@@ -0,0 +1,86 @@
+import pytest
+from flask import Flask, session
+
+import session_store
+
+
+def session_id(client):
+    return next(cookie.value for cookie in client.cookie_jar if cookie.name == 'session')
+
+
+def make_app(backend):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['SESSION_BACKEND'] = backend
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 7
+        session.regenerate()
+        return 'ok'
+
+    @app.route('/visit')
+    def visit():
+        session['seen'] = True
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return str(session.get('user_id'))
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f'sqlite:///{tmp_path / "sessions.sqlite3"}'
+
+
+def test_sessions_are_shared_between_processes(sqlite_url):
+    # Two apps stand in for two worker processes using the same SQLite file
+    first, second = make_app(sqlite_url), make_app(sqlite_url)
+    session_store.init_app(first)
+    session_store.init_app(second)
+
+    client = first.test_client()
+    client.get('/login')
+    other = second.test_client()
+    other.set_cookie('localhost', 'session', session_id(client))
+    assert other.get('/whoami').data == b'7'
+
+
+def test_session_is_stored_server_side_and_cleared_on_logout(sqlite_url):
+    app = make_app(sqlite_url)
+    backend = session_store.init_app(app)
+    client = app.test_client()
+    client.get('/login')
+    key = session_store.KEY_PREFIX + session_id(client)
+    assert backend.get(key)['data'] == {'user_id': 7}
+    client.get('/logout')
+    assert backend.get(key) is None
+    assert client.get('/whoami').data == b'None'
+
+
+def test_login_regenerates_the_session_id(sqlite_url):
+    app = make_app(sqlite_url)
+    backend = session_store.init_app(app)
+    client = app.test_client()
+    client.get('/visit')
+    before = session_id(client)
+    client.get('/login')
+    assert session_id(client) != before
+    assert backend.get(session_store.KEY_PREFIX + before) is None
+    assert backend.get(session_store.KEY_PREFIX + session_id(client))['data'] == {'seen': True, 'user_id': 7}
+
+
+def test_memory_backend_refused_with_several_workers(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    with pytest.raises(RuntimeError, match='WEB_CONCURRENCY'):
+        session_store.init_app(make_app('memory'))
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    session_store.init_app(make_app('memory'))
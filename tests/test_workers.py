@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import credentials
+import pictures
+import workers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What a pool worker does on startup when the app runs as `python app.py`: it
+# re-imports app.py as __mp_main__ (multiprocessing.spawn.prepare). MySQL is
+# made unreachable, so any database work fails the import.
+WORKER_STARTUP = f"""
+import multiprocessing.spawn
+import sys
+
+import mysql.connector
+
+
+def refuse(*args, **kwargs):
+    raise AssertionError('pool worker connected to MySQL')
+
+
+mysql.connector.connect = refuse
+multiprocessing.spawn.prepare({{'init_main_from_path': {os.path.join(ROOT, 'app.py')!r},
+                                'sys_path': sys.path}})
+
+import db
+import session_store
+app = sys.modules['__mp_main__'].app
+assert db._pool is None
+assert not isinstance(app.session_interface, session_store.CacheSessionInterface)
+"""
+
+
+def test_worker_startup_skips_app_setup():
+    result = subprocess.run([sys.executable, '-c', WORKER_STARTUP], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT))
+    assert result.returncode == 0, result.stderr
+
+
+def test_pools_fork_from_a_preloaded_forkserver():
+    context = workers.mp_context()
+    assert context.get_start_method() == 'forkserver'
+    assert {'credentials', 'pictures'} <= set(workers.PRELOAD)
+
+    credentials.configure(iterations=1000, workers=1)
+    pictures.configure(workers=1)
+    try:
+        assert credentials._get_executor()._mp_context.get_start_method() == 'forkserver'
+        assert pictures._get_executor()._mp_context.get_start_method() == 'forkserver'
+    finally:
+        credentials.shutdown()
+        pictures.shutdown()
@@ -0,0 +1,18 @@
+import multiprocessing
+
+# Process pools for CPU-bound work (password hashing, picture processing).
+# Workers are forked from a forkserver, a clean single-threaded process that
+# imports the modules below once, so they neither inherit this process's
+# locks and threads nor import the app and its database setup themselves.
+# Where forkserver isn't available (Windows) they are spawned instead.
+
+PRELOAD = ['credentials', 'pictures']
+
+
+def mp_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # Only takes effect before the forkserver starts; every pool shares the same list
+    context.set_forkserver_preload(PRELOAD)
+    return context